@@ -0,0 +1,34 @@
+'''
+Bars per second of utils.backtest on an Ultimate oscillator policy
+
+    python -m benchmarks.bench_backtest --rows 1000000
+'''
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.bench_parallel import synthetic
+from utils import technical
+from utils.backtest import backtest, PercentSlippage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10**6)
+    args = parser.parse_args()
+    close, low, high = synthetic(args.rows)
+    bars = pd.DataFrame({"open": close, "high": high, "low": low, "close": close}, index=pd.date_range("2021-02-15", periods=args.rows, freq="min"))
+    policy = technical.ultimate(bars.close, bars.low, bars.high, days=7, strategy=True)
+    rows = []
+    for name, kwargs in [("policy", {}), ("slippage + stoploss", {"slippage": PercentSlippage(), "stoploss": 0.01}), ("next open", {"fill": "open"})]:
+        begin = time.perf_counter()
+        equity, trades = backtest(bars, policy=policy, **kwargs)
+        elapsed = time.perf_counter() - begin
+        rows.append((name, len(trades), elapsed, args.rows/elapsed))
+    print(f"{args.rows} rows")
+    print(pd.DataFrame(rows, columns=["run", "fills", "seconds", "bars/s"]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+'''
+Steps per second of StockTradingEnv against the former pandas observation path
+
+    python -m benchmarks.bench_env --rows 20000 --steps 20000
+'''
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_parallel import synthetic
+from cryptogym.cryptogym import StockTradingEnv, FEATURES, MAX_ACCOUNT_BALANCE, MAX_NUM_SHARES
+
+
+class LegacyStockTradingEnv(StockTradingEnv):
+    '''
+    StockTradingEnv reading observations and prices with df.loc, as before the feature matrix
+    '''
+
+    def __init__(self, df):
+        super().__init__(df)
+        self.df = pd.DataFrame(self.features.T, columns=FEATURES)
+        self.df["close"] = self.prices
+
+    def _next_observation(self):
+        frame = np.array([self.df.loc[self.current_step: self.current_step + 5, col].values for col in FEATURES])
+        return np.append(frame, [[
+            self.balance / MAX_ACCOUNT_BALANCE,
+            self.max_net_worth / MAX_ACCOUNT_BALANCE,
+            self.shares_held / MAX_NUM_SHARES,
+            self.cost_basis,
+            self.total_shares_sold / MAX_NUM_SHARES,
+            self.total_sales_value / MAX_NUM_SHARES,
+        ]], axis=0)
+
+    def _take_action(self, action):
+        self.prices = self.df.close
+        super()._take_action(action)
+
+
+def frame(rows):
+    close, low, high = synthetic(rows)
+    return pd.DataFrame({"open": close, "high": high, "low": low, "close": close, "volume": 1.0}, index=pd.date_range("2021-02-15", periods=rows, freq="min"))
+
+
+def run(env, actions):
+    np.random.seed(0)
+    observations = [env.reset()]
+    begin = time.perf_counter()
+    for action in actions:
+        observations.append(env.step(action)[0])
+    return observations, time.perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--steps", type=int, default=20000)
+    args = parser.parse_args()
+    df = frame(args.rows)
+    actions = np.random.default_rng(0).uniform([0, 0], [3, 1], (args.steps, 2))
+    rows = []
+    results = {}
+    for name, env_class in (("legacy", LegacyStockTradingEnv), ("array", StockTradingEnv)):
+        begin = time.perf_counter()
+        env = env_class(df.copy())
+        setup = time.perf_counter() - begin
+        results[name], elapsed = run(env, actions)
+        rows.append((name, setup, args.steps/elapsed))
+    for legacy, array in zip(results["legacy"], results["array"]):
+        np.testing.assert_array_equal(legacy.astype(np.float32), array)
+    table = pd.DataFrame(rows, columns=["env", "setup s", "steps/s"])
+    table["speedup"] = table["steps/s"]/table["steps/s"].iloc[0]
+    print(f"{args.rows} rows, {args.steps} steps")
+    print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
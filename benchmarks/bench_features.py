@@ -0,0 +1,43 @@
+'''
+Start up time of StockTradingEnv computing the features against attaching to the feature cache
+
+    python -m benchmarks.bench_features --rows 1000000 --envs 8
+'''
+import argparse
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_env import frame
+from cryptogym.cryptogym import StockTradingEnv
+from cryptogym.features import FeatureCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10**6)
+    parser.add_argument("--envs", type=int, default=8)
+    args = parser.parse_args()
+    df = frame(args.rows)
+    rows = []
+    begin = time.perf_counter()
+    for _ in range(args.envs):
+        StockTradingEnv(df)
+    rows.append(("compute", (time.perf_counter() - begin)/args.envs))
+    with tempfile.TemporaryDirectory() as root:
+        cache = FeatureCache(root)
+        begin = time.perf_counter()
+        key = cache.key(df)
+        StockTradingEnv(df, cache=cache)
+        rows.append(("cache first", time.perf_counter() - begin))
+        begin = time.perf_counter()
+        for _ in range(args.envs):
+            StockTradingEnv(key, cache=cache)
+        rows.append(("cache attach", (time.perf_counter() - begin)/args.envs))
+    print(f"{args.rows} rows, {args.envs} envs")
+    print(pd.DataFrame(rows, columns=["setup", "seconds/env"]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
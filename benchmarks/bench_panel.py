@@ -0,0 +1,62 @@
+'''
+Indicators of many pairs computed column-wise over a panel against one pair at a time
+
+    python -m benchmarks.bench_panel --rows 100000 --pairs 32
+'''
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_parallel import synthetic
+from utils import technical
+from utils.panel import Panel
+
+INDICATORS = {
+    "macd": lambda close, low, high: technical.macd(close, 10000, 1000),
+    "ultimate": lambda close, low, high: technical.ultimate(close, low, high),
+    "bollinger": lambda close, low, high: technical.bollinger_bands(close)[0],
+    "williams": lambda close, low, high: technical.williams(close, low, high),
+    "momentum": lambda close, low, high: technical.momentum(close),
+}
+
+
+def best(function, repeat):
+    '''
+    Return the result of function and its best time
+    '''
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - begin)
+    return result, min(times)
+
+
+def panel(rows, pairs):
+    close, low, high = (np.column_stack(arrays) for arrays in zip(*(synthetic(rows, seed) for seed in range(pairs))))
+    return Panel(60*np.arange(rows), [f"pair{i}" for i in range(pairs)], {"close": close, "low": low, "high": high})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--pairs", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    data = panel(args.rows, args.pairs)
+    close, low, high = data.close, data.low, data.high
+    rows = []
+    for name, indicator in INDICATORS.items():
+        loop, elapsed_loop = best(lambda: {pair: indicator(close[pair], low[pair], high[pair]) for pair in data.pairs}, args.repeat)
+        columns, elapsed = best(lambda: indicator(close, low, high), args.repeat)
+        for pair, values in loop.items():
+            pd.testing.assert_series_equal(columns[pair], values, check_names=False)
+        rows.append((name, elapsed_loop, elapsed, elapsed_loop/elapsed))
+    print(f"{args.rows} rows, {args.pairs} pairs")
+    print(pd.DataFrame(rows, columns=["indicator", "per pair s", "panel s", "speedup"]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+'''
+Throughput of parallel strategy evaluation against the number of workers
+
+    python -m benchmarks.bench_parallel --rows 1000000 --workers 1 2 4 8
+'''
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import parallel
+
+
+def synthetic(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100*np.exp(np.cumsum(rng.normal(0, 0.002, rows)))
+    spread = np.abs(rng.normal(0, 0.001, (2, rows)))*close
+    return close, close - spread[1], close + spread[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10**6)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+    close, low, high = synthetic(args.rows)
+    params = [{"days": d, "buylevel": b, "selllevel": s} for d, b, s in itertools.product((5, 7, 10, 14), (20, 30), (70, 80))]
+    reference = None
+    rows = []
+    for workers in args.workers:
+        begin = time.perf_counter()
+        results = parallel.parallel_evaluate("ultimate", params, close, low, high, workers=workers)
+        elapsed = time.perf_counter() - begin
+        if reference is None:
+            reference = results
+        pd.testing.assert_frame_equal(results, reference)
+        rows.append((workers, elapsed, len(params)/elapsed, rows[0][1]/elapsed if rows else 1.0))
+    print(f"{args.rows} rows, {len(params)} parameter sets, {os.cpu_count()} cores")
+    print(pd.DataFrame(rows, columns=["workers", "seconds", "evaluations/s", "speedup"]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
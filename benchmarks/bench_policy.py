@@ -0,0 +1,45 @@
+'''
+Time of technical.getpolicy with the utils.policy state machines against the pandas loop
+
+    python -m benchmarks.bench_policy --rows 100000
+'''
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_parallel import synthetic
+from utils import technical
+
+
+def timed(function, *args, **kwargs):
+    begin = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10**5)
+    args = parser.parse_args()
+    close, low, high = synthetic(args.rows)
+    index = pd.date_range("2021-02-15", periods=args.rows, freq="min")
+    close, low, high = (pd.Series(values, index=index) for values in (close, low, high))
+    ult = technical.ultimate(close, low, high, days=7)
+    buy, sell = ult < 30, ult > 70
+    rows = []
+    for name, kwargs in [("plain", {}), ("mingain", {"mingain": 0.002})]:
+        accelerated, fast = timed(technical.getpolicy, buy, sell, close, **kwargs)
+        loop, slow = timed(technical.getpolicy, buy, sell, close, accelerate=False, **kwargs)
+        pd.testing.assert_series_equal(accelerated, loop)
+        rows.append((name, int(accelerated.sum()), slow, fast, slow/fast))
+    for name, kwargs in [("firstopportunity", {"mingain": 0.002, "firstopportunity": True}), ("stoploss", {"mingain": 0.002, "stoploss": 0.002})]:
+        accelerated, fast = timed(technical.getpolicy, buy, sell, close, **kwargs)
+        rows.append((name, int(accelerated.sum()), np.nan, fast, np.nan))
+    print(f"{args.rows} rows")
+    print(pd.DataFrame(rows, columns=["variant", "trades", "loop s", "policy s", "speedup"]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+'''
+Steps per second of VecStockTradingEnv against num_envs separate StockTradingEnv
+
+    python -m benchmarks.bench_vec_env --rows 20000 --steps 2000 --envs 16 64 256
+'''
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_env import frame
+from cryptogym.cryptogym import StockTradingEnv
+from cryptogym.vec_env import VecStockTradingEnv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--envs", type=int, nargs="+", default=[16, 64, 256])
+    args = parser.parse_args()
+    df = frame(args.rows)
+    rows = []
+    for num_envs in args.envs:
+        actions = np.random.default_rng(0).uniform([0, 0], [3, 1], (args.steps, num_envs, 2))
+        envs = [StockTradingEnv(df.copy()) for _ in range(num_envs)]
+        for env in envs:
+            env.reset()
+        begin = time.perf_counter()
+        for action in actions:
+            for env, single in zip(envs, action):
+                env.step(single)
+        single = args.steps*num_envs/(time.perf_counter() - begin)
+        vec = VecStockTradingEnv(df.copy(), num_envs, seed=0)
+        vec.reset()
+        begin = time.perf_counter()
+        for action in actions:
+            vec.step(action)
+        batched = args.steps*num_envs/(time.perf_counter() - begin)
+        rows.append((num_envs, single, batched, batched/single))
+    print(f"{args.rows} rows, {args.steps} steps")
+    print(pd.DataFrame(rows, columns=["envs", "single steps/s", "vec steps/s", "speedup"]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
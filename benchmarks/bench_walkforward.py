@@ -0,0 +1,56 @@
+'''
+Walk-forward optimization slicing the indicators of the whole history against a sweep
+computing them again on every train window
+
+    python -m benchmarks.bench_walkforward --rows 500000 --train 100000 --test 20000 --step 5000
+'''
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_parallel import synthetic
+from utils import sweep, walkforward
+
+GRID = {"days": [5, 7, 10, 14], "buylevel": [20, 30, 40], "selllevel": [60, 70, 80]}
+
+
+def resweep(close, low, high, windows):
+    '''
+    Best parameters of every train window with sweep.sweep on the window alone
+    '''
+    best = []
+    for train_start, train_end, _, _ in windows:
+        window = slice(train_start, train_end)
+        results = sweep.sweep("ultimate", close[window], GRID, low=low[window], high=high[window])
+        best.append(results.winning.max())
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--train", type=int, default=100000)
+    parser.add_argument("--test", type=int, default=20000)
+    parser.add_argument("--step", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    close, low, high = synthetic(args.rows)
+    windows = walkforward.splits(args.rows, args.train, args.test, step=args.step)
+    rows = []
+    begin = time.perf_counter()
+    resweep(close, low, high, windows)
+    rows.append(("sweep per window", time.perf_counter() - begin))
+    for workers in sorted({1, args.workers or 1}) if args.workers else (1, None):
+        begin = time.perf_counter()
+        walkforward.walk_forward("ultimate", GRID, close, low, high, train=args.train, test=args.test, step=args.step, workers=workers)
+        rows.append((f"walk_forward workers={workers or 'all'}", time.perf_counter() - begin))
+    table = pd.DataFrame(rows, columns=["method", "seconds"])
+    table["speedup"] = table.seconds.iloc[0]/table.seconds
+    print(f"{args.rows} rows, {len(windows)} windows, {int(np.prod([len(v) for v in GRID.values()]))} combinations")
+    print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+'''
+Benchmark suite of the indicators, policies, loaders and environment over synthetic minute
+candles. Throughput and peak memory of every case are appended to a JSON history and
+compared to the previous runs on the same machine.
+
+    python -m benchmarks.suite --rows 100000 1000000
+    python -m benchmarks.suite --rows 100000000 --filter technical.macd
+    python -m benchmarks.suite --threshold 0.1 --no-save
+
+Exits with status 1, without saving the run, when a case is slower or takes more memory than
+the median of the previous runs by more than threshold.
+'''
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os, os.path
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_parallel import synthetic
+from cryptogym.cryptogym import StockTradingEnv, WINDOW
+from cryptogym.features import PARAMETERS
+from utils import technical
+from utils.ingest import OHLCBuffer
+from utils.store import OHLCStore
+
+# Kept out of git, see .gitignore
+HISTORY = os.path.join(os.path.dirname(__file__), "history.json")
+# Maximum relative loss of throughput or growth of peak memory
+THRESHOLD = 0.2
+# Previous runs the baseline is the median of
+BASELINE_RUNS = 5
+# Peak memory differences below it are noise (MB)
+MEMORY_SLACK = 1
+# Steps timed by the environment cases
+ENV_STEPS = 10000
+# Fewest candles the environment has an observation with, past the MACD warmup
+ENV_MIN_ROWS = PARAMETERS["long"] + WINDOW
+# Candles per page of the loader cases, like a Bitstamp response
+PAGE_ROWS = 1000
+
+MODES = {"raw": {}, "strategy": {"strategy": True}, "getgains": {"getgains": True}, "winning": {"winning": True}}
+
+
+def dataset(rows: int, seed=0) -> pd.DataFrame:
+    '''
+    Return rows synthetic minute candles with open, high, low, close and volume
+    '''
+    close, low, high = synthetic(rows, seed)
+    return pd.DataFrame({"open": close, "high": high, "low": low, "close": close, "volume": 1.0}, index=pd.date_range("2021-02-15", periods=rows, freq="min"))
+
+
+def _indicator(name, mode):
+    calls = {
+        "macd": lambda df, kwargs: technical.macd(df.close, 10000, 1000, **kwargs),
+        "ultimate": lambda df, kwargs: technical.ultimate(df.close, df.low, df.high, **kwargs),
+        "bollinger_bands": lambda df, kwargs: technical.bollinger_bands(df.close, **kwargs),
+        "williams": lambda df, kwargs: technical.williams(df.close, df.low, df.high, **kwargs),
+        "momentum": lambda df, kwargs: technical.momentum(df.close, **kwargs),
+    }
+
+    @contextlib.contextmanager
+    def case(df):
+        yield (lambda: calls[name](df, MODES[mode])), len(df)
+    return case
+
+
+def _getpolicy(accelerate):
+    @contextlib.contextmanager
+    def case(df):
+        ult = technical.ultimate(df.close, df.low, df.high)
+        prices = df.close.loc[ult.index]
+
+        def run():
+            # the loop of accelerate=False has a progress bar
+            with contextlib.redirect_stderr(io.StringIO()):
+                technical.getpolicy(buy=ult < 30, sell=ult > 70, prices=prices, accelerate=accelerate)
+        yield run, len(df)
+    return case
+
+
+@contextlib.contextmanager
+def _loaders(df):
+    '''
+    Parse Bitstamp pages into an OHLCBuffer and merge them into a new store
+    '''
+    candles = pd.DataFrame({column: df[column].astype(str) for column in ("high", "volume", "low", "close", "open")})
+    candles.insert(1, "timestamp", (df.index.asi8//10**9).astype(str))
+    records = candles.to_dict("records")
+    pages = [json.dumps({"data": {"pair": "BTC/USD", "ohlc": records[i:i + PAGE_ROWS]}}).encode() for i in range(0, len(records), PAGE_ROWS)]
+    del candles, records
+    runs = iter(range(10**9))
+    with tempfile.TemporaryDirectory() as root:
+        def run():
+            buffer = OHLCBuffer(capacity=len(df))
+            for page in pages:
+                buffer.add_response(page)
+            OHLCStore(os.path.join(root, str(next(runs)))).append("btcusd", buffer.arrays())
+        yield run, len(df)
+
+
+@contextlib.contextmanager
+def _env_step(df):
+    if len(df) < ENV_MIN_ROWS:
+        # the steps timed don't depend on the rows
+        df = dataset(ENV_MIN_ROWS)
+    np.random.seed(0)
+    env = StockTradingEnv(df)
+    env.reset()
+    actions = np.random.default_rng(0).uniform([0, 0], [3, 1], (ENV_STEPS, 2))
+
+    def run():
+        for action in actions:
+            env.step(action)
+    yield run, ENV_STEPS
+
+
+def cases() -> dict:
+    '''
+    Return the name, the context manager preparing the function to time and the number of
+    units it processes, and the largest number of rows of every case
+    '''
+    out = {}
+    for name in ("macd", "ultimate", "bollinger_bands", "williams", "momentum"):
+        for mode in MODES:
+            out[f"technical.{name}[{mode}]"] = (_indicator(name, mode), 10**8)
+    out["technical.getpolicy[accelerate]"] = (_getpolicy(True), 10**8)
+    # a pandas loop over every buy and sell
+    out["technical.getpolicy[loop]"] = (_getpolicy(False), 10**5)
+    out["loaders.parse_merge"] = (_loaders, 10**7)
+    out["StockTradingEnv.step"] = (_env_step, 10**7)
+    return out
+
+
+def measure(function, repeat=3) -> (float, float):
+    '''
+    Return the best time of function over repeat calls and its peak memory in MB, traced on a first call
+    '''
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - begin)
+    return min(times), peak/2**20
+
+
+def run(rows: list, names=None, repeat=3) -> dict:
+    '''
+    Return seconds, throughput (units per second) and peak memory (MB) of every case and number of rows
+
+    :param list rows: Numbers of rows of the datasets
+    :param list names: Cases to run, all if None
+    :param int repeat: Timed calls of every case
+    '''
+    results = {}
+    selected = {name: case for name, case in cases().items() if names is None or name in names}
+    for n in rows:
+        df = dataset(n)
+        for name, (case, max_rows) in selected.items():
+            if n > max_rows:
+                continue
+            with case(df) as (function, units):
+                seconds, peak = measure(function, repeat=repeat)
+            results[f"{name}@{n}"] = {"seconds": seconds, "throughput": units/seconds, "peak_mb": peak}
+        del df
+    return results
+
+
+def _machine():
+    return f"{platform.node()} {platform.machine()} {os.cpu_count()} cpus"
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path=HISTORY) -> list:
+    if not os.path.isfile(path):
+        return []
+    with open(path) as f:
+        return json.load(f)["runs"]
+
+
+def save_history(runs: list, path=HISTORY):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"runs": runs}, f, indent=1)
+    os.replace(tmp, path)
+
+
+def compare(results: dict, runs: list, machine: str, threshold=THRESHOLD, baseline_runs=BASELINE_RUNS) -> list:
+    '''
+    Return the regressions of results against the median of the last baseline_runs runs of machine
+
+    :param dict results: Results of run
+    :param list runs: Previous runs of the history
+    :param str machine: Only the runs of this machine are compared
+    :param float threshold: Maximum relative loss of throughput or growth of peak memory
+    :param int baseline_runs: Previous runs the baseline is the median of
+    '''
+    regressions = []
+    for key, result in results.items():
+        previous = [r["results"][key] for r in runs if r["machine"] == machine and key in r["results"]][-baseline_runs:]
+        if not previous:
+            continue
+        throughput = statistics.median(p["throughput"] for p in previous)
+        peak = statistics.median(p["peak_mb"] for p in previous)
+        if result["throughput"] < throughput*(1 - threshold):
+            regressions.append(f"{key} throughput {result['throughput']:.4g}/s, baseline {throughput:.4g}/s")
+        if result["peak_mb"] > peak*(1 + threshold) + MEMORY_SLACK:
+            regressions.append(f"{key} peak memory {result['peak_mb']:.1f} MB, baseline {peak:.1f} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10**5, 10**6])
+    parser.add_argument("--filter", nargs="+", default=None, help="Substrings of the cases to run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--history", default=HISTORY)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+    names = None
+    if args.filter:
+        names = [name for name in cases() if any(part in name for part in args.filter)]
+    results = run(args.rows, names=names, repeat=args.repeat)
+    table = pd.DataFrame.from_dict(results, orient="index")
+    print(table.to_string(float_format=lambda value: f"{value:.4g}"))
+    runs = load_history(args.history)
+    machine = _machine()
+    regressions = compare(results, runs, machine, threshold=args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regressions over {args.threshold:.0%}:")
+        print("\n".join(regressions))
+        return 1
+    if not args.no_save:
+        runs.append({
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "machine": machine,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "results": results,
+        })
+        save_history(runs, args.history)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import importlib
+
+# The environments need gym and are imported on first access, cryptogym.features and its
+# FeatureCache work without it.
+
+SUBMODULES = ["cryptogym", "features", "portfolio_env", "vec_env"]
+# Class: submodule defining it
+EXPORTS = {
+    "StockTradingEnv": "cryptogym",
+    "VecStockTradingEnv": "vec_env",
+    "PortfolioTradingEnv": "portfolio_env",
+    "FeatureCache": "features",
+}
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    if name in EXPORTS:
+        return getattr(importlib.import_module(f"{__name__}.{EXPORTS[name]}"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(SUBMODULES) | set(EXPORTS))
@@ -2,12 +2,31 @@ import gym
 from gym import spaces
 import numpy as np
 
-from utils import technical
+from cryptogym.features import compute, FEATURES
+from utils import instrument
 
 INITIAL_ACCOUNT_BALANCE = 100
 MAX_ACCOUNT_BALANCE = 1000
 MAX_NUM_SHARES = 10
 MAX_STEPS = 10000
+# Candles in every observation
+WINDOW = 6
+
+
+def prepare(df, cache=None):
+    '''
+    Return the feature matrix (one contiguous row per feature) and the close prices used by
+    the environments
+
+    :param df: Data frame with high, low and close, or the key of a dataset in cache
+    :param FeatureCache cache: Cache of the features, computed in memory if None
+    '''
+    if isinstance(df, str):
+        return cache.attach(df)
+    if cache is not None:
+        return cache.get(df)
+    return compute(df)
+
 
 class StockTradingEnv(gym.Env):
     """Custom Environment that follows gym interface,
@@ -15,25 +34,22 @@ class StockTradingEnv(gym.Env):
     https://towardsdatascience.com/creating-a-custom-openai-gym-environment-for-stock-trading-be532be3910e"""
     metadata = {'render.modes': ['human']}
 
-    def __init__(self, df):
+    def __init__(self, df, cache=None):
         super(StockTradingEnv, self).__init__()
-        self.df = df
-        self.df["MACD"] = technical.macd(df.close, 10000, 1000)
-        self.df["Ultimate"] = technical.ultimate(df.close, df.low, df.high, buylevel=30, selllevel=70, days=7)
-        self.df["Bollinger"] = df.close.std()
-        self.df = self.df.loc[~self.df.MACD.isna()]
-        self.df = self.df.reset_index(drop=True)
+        # observations are filled from a window view of the features
+        self.features, self.prices = prepare(df, cache)
         self.reward_range = (0, MAX_ACCOUNT_BALANCE)
         # Actions of the format Buy x%, Sell x%, Hold, etc.
         self.action_space = spaces.Box(low=np.array([0, 0]), high=np.array([3, 1]), dtype=np.float16)
-        # High, Close, Low, MACD, Ultimate, Bollinger for last 5 values
-        self.observation_space = spaces.Box(low=0, high=1, shape=(6, 6), dtype=np.float16)
+        # High, Low, Close, MACD, Ultimate, Bollinger for the last 6 values and the account row
+        self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(len(FEATURES) + 1, WINDOW), dtype=np.float32)
 
+    @instrument.timed("StockTradingEnv.step")
     def step(self, action):
         # Execute one time step within the environment
         self._take_action(action) 
         self.current_step += 1 
-        if self.current_step > len(self.df.loc[:, 'close'].values) - 6:
+        if self.current_step > self.prices.size - WINDOW:
             self.current_step = 0 
         delay_modifier = (self.current_step / MAX_STEPS)
         reward = self.balance * delay_modifier
@@ -52,7 +68,7 @@ class StockTradingEnv(gym.Env):
         self.total_sales_value = 0
         
         # Set the current step to a random point within the data frame
-        self.current_step = np.random.randint(0, len(self.df.loc[:, 'close'].values) - 6)
+        self.current_step = np.random.randint(0, self.prices.size - WINDOW)
         return self._next_observation()
         
     def render(self, mode='human', close=False):
@@ -65,34 +81,23 @@ class StockTradingEnv(gym.Env):
         print(f'Net worth: {self.net_worth} (Max net worth: {self.max_net_worth})')
         print(f'Profit: {profit}')
 
+    @instrument.timed("StockTradingEnv._next_observation")
     def _next_observation(self):
-        frame = np.array([
-            self.df.loc[self.current_step: self.current_step +
-                        5, 'high'].values,
-            self.df.loc[self.current_step: self.current_step +
-                        5, 'low'].values,
-            self.df.loc[self.current_step: self.current_step +
-                        5, 'close'].values,
-            self.df.loc[self.current_step: self.current_step +
-                        5, 'MACD'].values,
-            self.df.loc[self.current_step: self.current_step +
-                        5, 'Ultimate'].values,
-            self.df.loc[self.current_step: self.current_step +
-                        5, 'Bollinger'].values,
-        ])  # Append additional data and scale each value to between 0-1
-        obs = np.append(frame, [[
-            self.balance / MAX_ACCOUNT_BALANCE,
-            self.max_net_worth / MAX_ACCOUNT_BALANCE,
-            self.shares_held / MAX_NUM_SHARES,
-            self.cost_basis,
-            self.total_shares_sold / MAX_NUM_SHARES,
-            self.total_sales_value / MAX_NUM_SHARES,
-        ]], axis=0)
+        obs = np.empty(self.observation_space.shape, dtype=np.float32)
+        obs[:-1] = self.features[:, self.current_step: self.current_step + WINDOW]
+        # Append additional data and scale each value to between 0-1
+        account = obs[-1]
+        account[0] = self.balance / MAX_ACCOUNT_BALANCE
+        account[1] = self.max_net_worth / MAX_ACCOUNT_BALANCE
+        account[2] = self.shares_held / MAX_NUM_SHARES
+        account[3] = self.cost_basis
+        account[4] = self.total_shares_sold / MAX_NUM_SHARES
+        account[5] = self.total_sales_value / MAX_NUM_SHARES
         return obs
 
     def _take_action(self, action):
         # Set the current price to a random price within the time step
-        current_price = self.df.loc[self.current_step, "close"]
+        current_price = self.prices[self.current_step]
         action_type = action[0]
         amount = action[1] 
         if action_type < 1:
@@ -111,8 +116,8 @@ class StockTradingEnv(gym.Env):
             self.shares_held -= shares_sold
             self.total_shares_sold += shares_sold
             self.total_sales_value += shares_sold * current_price
-            self.netWorth = self.balance + self.shares_held * current_price
+            self.net_worth = self.balance + self.shares_held * current_price
         if self.net_worth > self.max_net_worth:
-            self.max_net_worth = net_worth
+            self.max_net_worth = self.net_worth
         if self.shares_held == 0:
             self.cost_basis = 0
\ No newline at end of file
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os, os.path
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from utils import technical
+
+# Rows of the feature matrix
+FEATURES = ["high", "low", "close", "MACD", "Ultimate", "Bollinger"]
+# Default indicator parameters of the environments
+PARAMETERS = {"long": 10000, "short": 1000, "days": 7}
+CACHE_ROOT = os.path.join("database", "features")
+
+
+def compute(df: pd.DataFrame, long=10000, short=1000, days=7) -> (np.ndarray, np.ndarray):
+    '''
+    Return the feature matrix, one contiguous float32 row per feature, and the float64 close
+    prices from the first candle with a MACD. df is not modified.
+
+    :param pd.DataFrame df: Data frame with high, low and close
+    :param int long: Long moving average length of the MACD
+    :param int short: Short moving average length of the MACD
+    :param int days: Days of the Ultimate oscillator
+    '''
+    macd = technical.macd(df.close, long, short)
+    ultimate = technical.ultimate(df.close, df.low, df.high, buylevel=30, selllevel=70, days=days).reindex(df.index)
+    keep = ~macd.isna().to_numpy()
+    columns = [df.high, df.low, df.close, macd, ultimate]
+    features = np.empty((len(FEATURES), int(keep.sum())), dtype=np.float32)
+    for row, column in zip(features, columns):
+        row[:] = column.to_numpy(dtype=np.float64)[keep]
+    features[-1] = df.close.std()
+    return features, df.close.to_numpy(dtype=np.float64)[keep]
+
+
+def compute_panel(panel, long=10000, short=1000, days=7) -> (np.ndarray, np.ndarray):
+    '''
+    Return the features of every pair of a utils.panel.Panel, as (pairs, features, time)
+    float32 with the rows of compute, and the (time, pairs) float64 close prices from the
+    first candle where every pair has a MACD. The indicators run on all the pairs at once.
+
+    :param Panel panel: Candles with high, low and close
+    :param int long: Long moving average length of the MACD
+    :param int short: Short moving average length of the MACD
+    :param int days: Days of the Ultimate oscillator
+    '''
+    high, low, close = panel.high, panel.low, panel.close
+    macd = technical.macd(close, long, short)
+    ultimate = technical.ultimate(close, low, high, buylevel=30, selllevel=70, days=days).reindex(close.index)
+    keep = macd.notna().all(axis=1).to_numpy()
+    columns = [high, low, close, macd, ultimate]
+    features = np.empty((len(panel.pairs), len(FEATURES), int(keep.sum())), dtype=np.float32)
+    for row, column in enumerate(columns):
+        features[:, row] = column.to_numpy(dtype=np.float64)[keep].T
+    features[:, -1] = close.std().to_numpy()[:, None]
+    return features, close.to_numpy(dtype=np.float64)[keep]
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    '''
+    Return a hash of the index and of the high, low and close prices
+
+    :param pd.DataFrame df: Data frame with high, low and close
+    '''
+    hashes = pd.util.hash_pandas_object(df[["high", "low", "close"]], index=True)
+    return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+
+
+class FeatureCache:
+    '''
+    Features computed once per dataset and parameters and saved as .npy files, environments
+    and worker processes map them read only so they share a single copy in memory
+
+        {root}/{key}/features.npy, prices.npy, meta.json
+
+    :param str root: Folder of the cache
+    '''
+
+    def __init__(self, root=CACHE_ROOT):
+        self.root = root
+
+    def key(self, df: pd.DataFrame, **params) -> str:
+        '''
+        Return the key of df with the indicator parameters
+
+        :param pd.DataFrame df: Data frame with high, low and close
+        :param params: Parameters of compute, the defaults if missing
+        '''
+        params = dict(PARAMETERS, **params)
+        return hashlib.sha1(json.dumps([fingerprint(df), FEATURES, params], sort_keys=True).encode()).hexdigest()[:20]
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(os.path.join(self.root, key, "meta.json"))
+
+    def get(self, df: pd.DataFrame, **params) -> (np.ndarray, np.ndarray):
+        '''
+        Return the features and prices of df, computing and saving them if not cached
+
+        :param pd.DataFrame df: Data frame with high, low and close
+        :param params: Parameters of compute, the defaults if missing
+        '''
+        key = self.key(df, **params)
+        if not self.exists(key):
+            features, prices = compute(df, **dict(PARAMETERS, **params))
+            self._save(key, features, prices, dict(PARAMETERS, **params))
+        return self.attach(key)
+
+    def attach(self, key: str) -> (np.ndarray, np.ndarray):
+        '''
+        Map the features and prices of a cached key read only
+
+        :param str key: Key returned by key
+        '''
+        if not self.exists(key):
+            raise ValueError(f"Features {key} not found in the cache.")
+        folder = os.path.join(self.root, key)
+        return np.load(os.path.join(folder, "features.npy"), mmap_mode="r"), np.load(os.path.join(folder, "prices.npy"), mmap_mode="r")
+
+    def _save(self, key, features, prices, params):
+        os.makedirs(self.root, exist_ok=True)
+        # written aside and renamed, readers never see a partial entry
+        tmp = tempfile.mkdtemp(prefix=f".{key}-", dir=self.root)
+        np.save(os.path.join(tmp, "features.npy"), features)
+        np.save(os.path.join(tmp, "prices.npy"), prices)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"params": params, "features": FEATURES, "rows": int(prices.size)}, f)
+        try:
+            os.rename(tmp, os.path.join(self.root, key))
+        except OSError:
+            # saved meanwhile by another process
+            shutil.rmtree(tmp)
@@ -0,0 +1,112 @@
+import gym
+from gym import spaces
+import numpy as np
+
+from cryptogym.cryptogym import FEATURES, WINDOW, INITIAL_ACCOUNT_BALANCE, MAX_ACCOUNT_BALANCE, MAX_NUM_SHARES
+from cryptogym.features import compute_panel
+from utils import instrument
+
+# Account row of every pair in the observation, one value per column of the window
+ACCOUNT = ["weight", "cash_weight", "shares_held", "balance", "net_worth", "max_net_worth"]
+
+
+class PortfolioTradingEnv(gym.Env):
+    '''
+    StockTradingEnv over several currency pairs. The action is the weight of the cash and of
+    every pair in the portfolio, normalized to sum to 1, the portfolio is rebalanced to it at
+    the current prices paying commissions on the traded value. The reward is the change of
+    the net worth until the next step and an episode ends with the data.
+
+    :param panel: utils.panel.Panel with high, low and close, or (features, prices) of compute_panel
+    :param float commissions: Percentage commissions on the traded value
+    '''
+    metadata = {'render.modes': ['human']}
+
+    def __init__(self, panel, commissions=0.005):
+        super(PortfolioTradingEnv, self).__init__()
+        if isinstance(panel, tuple):
+            self.features, self.prices = panel
+            self.pairs = [f"pair{i}" for i in range(self.prices.shape[1])]
+        else:
+            self.features, self.prices = compute_panel(panel)
+            self.pairs = panel.pairs
+        self.commissions = commissions
+        pairs = self.prices.shape[1]
+        self.reward_range = (-np.inf, np.inf)
+        # Weight of the cash then of every pair
+        self.action_space = spaces.Box(low=0, high=1, shape=(pairs + 1,), dtype=np.float32)
+        # Features of the last 6 values and the account row, for every pair
+        self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(pairs, len(FEATURES) + 1, WINDOW), dtype=np.float32)
+
+    @instrument.timed("PortfolioTradingEnv.step")
+    def step(self, action):
+        # Execute one time step within the environment
+        net_worth = self._take_action(action)
+        self.current_step += 1
+        self.net_worth = self.balance + self.shares_held @ self.prices[self.current_step]
+        if self.net_worth > self.max_net_worth:
+            self.max_net_worth = self.net_worth
+        reward = self.net_worth - net_worth
+        done = self.net_worth <= 0 or self.current_step >= self.prices.shape[0] - WINDOW
+        obs = self._next_observation()
+        return obs, reward, done, {}
+
+    def reset(self):
+        # Reset the state of the environment to an initial state
+        self.balance = INITIAL_ACCOUNT_BALANCE
+        self.net_worth = INITIAL_ACCOUNT_BALANCE
+        self.max_net_worth = INITIAL_ACCOUNT_BALANCE
+        self.shares_held = np.zeros(self.prices.shape[1])
+        self.total_fees = 0
+
+        # Set the current step to a random point within the data
+        self.current_step = np.random.randint(0, self.prices.shape[0] - WINDOW)
+        return self._next_observation()
+
+    def render(self, mode='human', close=False):
+        # Render the environment to the screen
+        profit = self.net_worth - INITIAL_ACCOUNT_BALANCE
+        print(f'Step: {self.current_step}')
+        print(f'Balance: {self.balance}')
+        print(f'Weights: {dict(zip(["cash"] + list(self.pairs), self.weights().round(4)))}')
+        print(f'Net worth: {self.net_worth} (Max net worth: {self.max_net_worth}, Total fees: {self.total_fees})')
+        print(f'Profit: {profit}')
+
+    def weights(self) -> np.ndarray:
+        '''
+        Return the weight of the cash and of every pair at the current prices
+        '''
+        values = np.concatenate(([self.balance], self.shares_held*self.prices[self.current_step]))
+        return values/values.sum()
+
+    def _next_observation(self):
+        obs = np.empty(self.observation_space.shape, dtype=np.float32)
+        obs[:, :-1] = self.features[:, :, self.current_step: self.current_step + WINDOW]
+        # Append additional data and scale each value to between 0-1
+        weights = self.weights()
+        account = obs[:, -1]
+        account[:, 0] = weights[1:]
+        account[:, 1] = weights[0]
+        account[:, 2] = self.shares_held / MAX_NUM_SHARES
+        account[:, 3] = self.balance / MAX_ACCOUNT_BALANCE
+        account[:, 4] = self.net_worth / MAX_ACCOUNT_BALANCE
+        account[:, 5] = self.max_net_worth / MAX_ACCOUNT_BALANCE
+        return obs
+
+    def _take_action(self, action):
+        '''
+        Rebalance the portfolio to the action weights and return the net worth before the fees
+        '''
+        current_price = self.prices[self.current_step]
+        weights = np.clip(np.asarray(action, dtype=np.float64), 0, None)
+        total = weights.sum()
+        # all cash when every weight is 0
+        weights = weights/total if total > 0 else np.eye(weights.size)[0]
+        net_worth = self.balance + self.shares_held @ current_price
+        # commissions on the trades to the target, taken from every weight
+        fees = self.commissions * np.abs(weights[1:]*net_worth - self.shares_held*current_price).sum()
+        values = weights*(net_worth - fees)
+        self.balance = values[0]
+        self.shares_held = values[1:]/current_price
+        self.total_fees += fees
+        return net_worth
@@ -0,0 +1,119 @@
+from gym import spaces
+import numpy as np
+
+from cryptogym.cryptogym import prepare, FEATURES, WINDOW, INITIAL_ACCOUNT_BALANCE, MAX_ACCOUNT_BALANCE, MAX_NUM_SHARES, MAX_STEPS
+from utils import instrument
+
+# Account fields of every episode, one row each, the first ones in the order of the observation
+ACCOUNT = ["balance", "max_net_worth", "shares_held", "cost_basis", "total_shares_sold", "total_sales_value", "net_worth"]
+# Scale of the account fields in the observation
+SCALES = np.array([MAX_ACCOUNT_BALANCE, MAX_ACCOUNT_BALANCE, MAX_NUM_SHARES, 1, MAX_NUM_SHARES, MAX_NUM_SHARES], dtype=np.float64)
+
+
+class VecStockTradingEnv:
+    '''
+    num_envs independent StockTradingEnv episodes over the same feature matrix, stepped
+    together with NumPy. The account fields are arrays of num_envs values and finished
+    episodes are reset at once, their last observation is in info["final_observation"]
+    like gym vector environments.
+
+    :param df: Data frame with high, low and close, or the key of a dataset in cache
+    :param int num_envs: Number of episodes
+    :param int seed: Seed of the random starting steps
+    :param FeatureCache cache: Cache of the features, computed in memory if None
+    '''
+    metadata = {'render.modes': ['human']}
+
+    def __init__(self, df, num_envs: int, seed=None, cache=None):
+        self.features, self.prices = prepare(df, cache)
+        self.num_envs = num_envs
+        # (starting step, features, WINDOW) view, observations gather from it
+        self.windows = np.lib.stride_tricks.sliding_window_view(self.features, WINDOW, axis=1).transpose(1, 0, 2)
+        self.rng = np.random.default_rng(seed)
+        self.reward_range = (0, MAX_ACCOUNT_BALANCE)
+        self.single_action_space = spaces.Box(low=np.array([0, 0]), high=np.array([3, 1]), dtype=np.float16)
+        self.single_observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(len(FEATURES) + 1, WINDOW), dtype=np.float32)
+        self.action_space = spaces.Box(low=np.tile([0, 0], (num_envs, 1)), high=np.tile([3, 1], (num_envs, 1)), dtype=np.float16)
+        self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(num_envs, len(FEATURES) + 1, WINDOW), dtype=np.float32)
+        # fields are views on the rows of account
+        self.account = np.zeros((len(ACCOUNT), num_envs))
+        for field, row in zip(ACCOUNT, self.account):
+            setattr(self, field, row)
+        self.current_step = np.zeros(num_envs, dtype=np.int64)
+
+    def reset(self, seed=None):
+        '''
+        Reset all the episodes and return their observations
+        '''
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset(np.ones(self.num_envs, dtype=bool))
+        return self._next_observation()
+
+    @instrument.timed("VecStockTradingEnv.step")
+    def step(self, actions):
+        '''
+        Execute one time step within every episode
+
+        :param np.ndarray actions: (num_envs, 2) action type and amount
+        '''
+        instrument.count("VecStockTradingEnv.steps", self.num_envs)
+        actions = np.asarray(actions, dtype=np.float64)
+        self._take_action(actions[:, 0], actions[:, 1])
+        self.current_step += 1
+        self.current_step *= self.current_step <= self.prices.size - WINDOW
+        rewards = self.balance * (self.current_step / MAX_STEPS)
+        dones = self.net_worth <= 0
+        obs = self._next_observation()
+        info = {}
+        if dones.any():
+            final = np.full(self.num_envs, None, dtype=object)
+            for i in np.flatnonzero(dones):
+                final[i] = obs[i].copy()
+            info = {"final_observation": final, "_final_observation": dones}
+            self._reset(dones)
+            obs[dones] = self._next_observation()[dones]
+        return obs, rewards, dones, info
+
+    def render(self, mode='human', close=False):
+        for i in range(self.num_envs):
+            print(f'Env {i} step: {self.current_step[i]} balance: {self.balance[i]} shares held: {self.shares_held[i]} net worth: {self.net_worth[i]} profit: {self.net_worth[i] - INITIAL_ACCOUNT_BALANCE}')
+
+    def _reset(self, mask):
+        for field in ("balance", "net_worth", "max_net_worth"):
+            getattr(self, field)[mask] = INITIAL_ACCOUNT_BALANCE
+        for field in ("shares_held", "cost_basis", "total_shares_sold", "total_sales_value"):
+            getattr(self, field)[mask] = 0
+        self.current_step[mask] = self.rng.integers(0, self.prices.size - WINDOW, mask.sum())
+
+    def _next_observation(self):
+        obs = np.empty((self.num_envs, len(FEATURES) + 1, WINDOW), dtype=np.float32)
+        obs[:, :-1] = self.windows[self.current_step]
+        # Append additional data and scale each value to between 0-1
+        np.divide(self.account[:len(SCALES)].T, SCALES, out=obs[:, -1])
+        return obs
+
+    def _take_action(self, action_type, amount):
+        # same operations as StockTradingEnv._take_action, adding zeros to the other episodes
+        current_price = self.prices[self.current_step]
+        buy = action_type < 1
+        sell = (action_type < 2) ^ buy
+        held = self.shares_held
+        # Buy amount % of balance in shares
+        shares_bought = self.balance / current_price * amount * buy
+        prev_cost = self.cost_basis * held
+        additional_cost = shares_bought * current_price
+        self.balance -= additional_cost
+        shares = held + shares_bought
+        np.divide(prev_cost + additional_cost, shares, out=self.cost_basis, where=buy & (shares != 0))
+        held[:] = shares
+        # Sell amount % of shares held
+        shares_sold = held * amount * sell
+        sales_value = shares_sold * current_price
+        self.balance += sales_value
+        held -= shares_sold
+        self.total_shares_sold += shares_sold
+        self.total_sales_value += sales_value
+        np.copyto(self.net_worth, self.balance + held * current_price, where=sell)
+        np.maximum(self.max_net_worth, self.net_worth, out=self.max_net_worth)
+        np.copyto(self.cost_basis, 0, where=held == 0)
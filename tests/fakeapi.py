@@ -0,0 +1,82 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+def candle(timestamp, step=60):
+    '''
+    Deterministic candle for timestamp, fields as strings like Bitstamp
+    '''
+    close = 100 + (timestamp//step) % 97 + 0.5
+    return {
+        "high": str(close + 1),
+        "timestamp": str(timestamp),
+        "volume": str(1 + (timestamp//step) % 5),
+        "low": str(close - 1),
+        "close": str(close),
+        "open": str(close - 0.25),
+    }
+
+
+class FakeBitstamp:
+    '''
+    Local stand-in for the Bitstamp OHLC endpoint
+
+    :param int first: First available timestamp
+    :param int now: Last available timestamp
+    :param int fail_first: How many requests answer with status 500 before serving data
+    :param set pairs: Existing currency pairs
+    '''
+
+    def __init__(self, first=0, now=10**7, fail_first=0, pairs=("btcusd", "eurusd")):
+        self.first = first
+        self.now = now
+        self.fail_first = fail_first
+        self.pairs = set(pairs)
+        self.requests = []
+        self.lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = api.handle(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/v2"
+
+    def handle(self, path):
+        url = urlparse(path)
+        query = {k: int(v[0]) for k, v in parse_qs(url.query).items()}
+        with self.lock:
+            self.requests.append((url.path, query))
+            if len(self.requests) <= self.fail_first:
+                return 500, b"{}"
+        pair = url.path.rstrip("/").split("/")[-1]
+        if pair not in self.pairs:
+            return 200, b""
+        step, limit = query.get("step", 60), query.get("limit", 1000)
+        if "start" in query:
+            first = max(self.first, -(-query["start"]//step)*step)
+            timestamps = range(first, min(first + step*limit, self.now + 1), step)
+        else:
+            end = min(query.get("end", self.now), self.now)//step*step
+            timestamps = range(max(self.first, end - step*(limit - 1)), end + 1, step)
+        data = {"data": {"pair": pair.upper(), "ohlc": [candle(t, step) for t in timestamps]}}
+        return 200, json.dumps(data).encode()
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+
+def candles(n, seed=0, start="2021-01-01"):
+    '''
+    Random walk minute candles with close, high, low
+    '''
+    rng = np.random.default_rng(seed)
+    close = 100*np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    spread = np.abs(rng.normal(0, 0.001, (2, n)))*close
+    index = pd.date_range(start, periods=n, freq="min")
+    return pd.DataFrame({
+        "open": np.r_[close[0], close[:-1]],
+        "high": close + spread[0],
+        "low": close - spread[1],
+        "close": close,
+        "volume": rng.uniform(0, 10, n),
+    }, index=index)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.synthetic import candles
+from utils import technical
+from utils.backtest import backtest, FixedFee, PercentFee, PercentSlippage, policy_target
+
+
+def _bars(close, low=None, high=None, open_=None):
+    close = np.asarray(close, dtype=np.float64)
+    return pd.DataFrame({
+        "open": close if open_ is None else open_,
+        "high": close if high is None else high,
+        "low": close if low is None else low,
+        "close": close,
+    }, index=pd.date_range("2021-02-15", periods=close.size, freq="min"))
+
+
+def test_policy_matches_gains():
+    df = candles(5000)
+    policy = technical.ultimate(df.close, df.low, df.high, strategy=True)
+    prices = df.close.loc[policy.index]
+    gains = technical.gains(prices, policy, commissions=0)
+    equity, trades = backtest(prices, policy=policy, fee=PercentFee(0))
+    assert len(trades) == policy.sum(), "One fill for every buy and sell"
+    assert np.isclose(equity.iloc[-1]/100, np.prod(1 + gains/100)), "Compounded gains must match technical.gains"
+    assert trades.units.iloc[0] > 0 and trades.position.iloc[1] == 0, "Must buy then sell everything"
+
+
+def test_fees_and_slippage():
+    bars = _bars([100, 110, 121, 121])
+    equity, trades = backtest(bars, target=[1, 1, 0, 0], fee=PercentFee(0.01), slippage=PercentSlippage(0.001))
+    buy_price, sell_price = 100*1.001, 121*0.999
+    units = 100/100
+    assert np.isclose(trades.price.iloc[0], buy_price) and np.isclose(trades.price.iloc[1], sell_price), "Wrong slippage"
+    assert np.isclose(trades.fee.iloc[0], 0.01*units*buy_price), "Wrong buy fee"
+    cash = 100 - units*buy_price*1.01 + units*sell_price*0.99
+    assert np.isclose(equity.iloc[-1], cash), "Wrong final equity"
+    assert np.isclose(equity.iloc[1], 100 - units*buy_price*1.01 + units*110), "Wrong mark to market"
+
+
+def test_partial_targets():
+    bars = _bars([100, 100, 200, 200])
+    equity, trades = backtest(bars, target=[0.5, np.nan, 1, np.nan], fee=FixedFee(0))
+    assert np.isclose(trades.position.iloc[0], 0.5), "Half of the equity must be invested"
+    assert np.isclose(equity.iloc[2], 150), "Half the equity doubled"
+    assert np.isclose(trades.position.iloc[1], 0.75), "Rebalanced to the full equity"
+    assert len(trades) == 2, "NaN keeps the previous target"
+
+
+def test_stoploss_intrabar():
+    close = [100, 100, 99, 95, 90, 100]
+    low = [100, 100, 97, 94, 80, 100]
+    open_ = [100, 100, 100, 96, 85, 100]
+    equity, trades = backtest(_bars(close, low=low, open_=open_), target=[1, 1, 1, 1, 1, 0], fee=PercentFee(0), stoploss=0.05)
+    assert trades.reason.tolist() == ["target", "stoploss"], "Must be stopped before the sell"
+    assert trades.bar.iloc[1] == 3 and np.isclose(trades.price.iloc[1], 95), "Must exit at the stop price"
+    assert np.isclose(equity.iloc[-1], 95), "Flat after the stop"
+
+
+def test_stoploss_gap():
+    close = [100, 100, 90, 90]
+    open_ = [100, 100, 92, 90]
+    equity, trades = backtest(_bars(close, open_=open_), target=[1, 1, 1, 1], fee=PercentFee(0), stoploss=0.05)
+    assert np.isclose(trades.price.iloc[1], 92), "A gap must fill at the open"
+
+
+def test_short_and_next_open():
+    close = [100, 100, 80, 80]
+    open_ = [100, 101, 90, 81]
+    equity, trades = backtest(_bars(close, open_=open_), target=[-1, -1, 0, 0], fee=PercentFee(0), fill="open")
+    assert trades.bar.tolist() == [1, 3], "Must fill at the next open"
+    assert np.isclose(trades.price.iloc[0], 101) and np.isclose(trades.units.iloc[0], -100/101), "Wrong short entry"
+    assert np.isclose(equity.iloc[-1], 100 + 100/101*(101 - 81)), "Wrong short gain"
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        backtest(_bars([1, 2]))
+    with pytest.raises(ValueError):
+        backtest(_bars([1, 2]), target=[1, 0], fill="middle")
+    assert policy_target([True, False, True, True]).tolist() == [1, 1, 0, 1], "Wrong policy target"
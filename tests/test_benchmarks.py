@@ -0,0 +1,37 @@
+import json
+
+from benchmarks import suite
+
+
+def _run(machine, throughput, peak):
+    return {"machine": machine, "results": {"case@100": {"seconds": 1/throughput, "throughput": throughput, "peak_mb": peak}}}
+
+
+def test_compare():
+    runs = [_run("a", 100, 10), _run("a", 110, 10), _run("a", 90, 12), _run("b", 1000, 1)]
+    assert suite.compare({"case@100": {"throughput": 85, "peak_mb": 11}}, runs, "a", threshold=0.2) == [], "Within the threshold"
+    regressions = suite.compare({"case@100": {"throughput": 70, "peak_mb": 20}}, runs, "a", threshold=0.2)
+    assert len(regressions) == 2 and "throughput" in regressions[0] and "memory" in regressions[1], "Wrong regressions"
+    assert suite.compare({"case@100": {"throughput": 70, "peak_mb": 20}}, runs, "c") == [], "Other machines are not compared"
+    assert suite.compare({"other@100": {"throughput": 1, "peak_mb": 20}}, runs, "a") == [], "New cases are not compared"
+
+
+def test_history(tmp_path):
+    history = str(tmp_path / "history.json")
+    args = ["--rows", "3000", "--filter", "momentum[raw]", "getpolicy[accelerate]", "--repeat", "1", "--history", history]
+    assert suite.main(args) == 0, "First run can't regress"
+    runs = suite.load_history(history)
+    assert len(runs) == 1 and set(runs[0]["results"]) == {"technical.momentum[raw]@3000", "technical.getpolicy[accelerate]@3000"}, "Wrong history"
+    for result in runs[0]["results"].values():
+        assert result["throughput"] > 0 and result["peak_mb"] > 0, "Missing measures"
+        result["throughput"] *= 1000
+    with open(history, "w") as f:
+        json.dump({"runs": runs}, f)
+    assert suite.main(args) == 1, "Must fail on a regression"
+    assert len(suite.load_history(history)) == 1, "Regressions must not be saved"
+
+
+def test_env_few_rows(tmp_path):
+    args = ["--rows", "1000", "--filter", "StockTradingEnv", "--repeat", "1", "--history", str(tmp_path / "history.json")]
+    assert suite.main(args) == 0, "Environment case must run below the MACD warmup"
+    assert "StockTradingEnv.step@1000" in suite.load_history(str(tmp_path / "history.json"))[0]["results"], "Missing environment case"
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.synthetic import candles
+from tests.test_store import make_candles
+from utils import compact, policy, technical
+from utils.store import OHLCStore
+
+
+def test_load_from_store(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=100)
+    store.append("btcusd", make_candles(0, 250))
+    c = compact.load(store, "btcusd", start=50*60, end=220*60)
+    df = store.read("btcusd", start=50*60, end=220*60)
+    assert len(c) == 171 and c.timestamp.dtype == np.int64, "Wrong timestamps"
+    assert c.close.dtype == np.float32 and c.volume.dtype == np.float64, "Wrong dtypes"
+    assert type(c.volume) is type(c.close) is pd.Series and c["volume"].name == "volume", "Volume must be a Series like the prices"
+    assert np.array_equal(c.dates([0, -1]), df.index[[0, -1]]), "Wrong dates"
+    pd.testing.assert_frame_equal(c.frame(), df)
+    with pytest.raises(ValueError):
+        compact.load(store, "ethusd")
+
+
+def test_footprint():
+    df = candles(10000)
+    df["timestamp"] = df.index.asi8//10**9
+    c = compact.from_frame(df)
+    # store.read: 6 float64/int64 columns and a DatetimeIndex
+    assert c.nbytes <= 0.6*df.memory_usage(index=True).sum(), "Not compact"
+    assert c.astype(np.float64).nbytes == c.nbytes + 4*4*len(c), "Wrong float64 footprint"
+    with pytest.raises(ValueError):
+        compact.from_frame(df.iloc[::-1])
+
+
+def test_indicators_on_candles():
+    df = candles(20000)
+    c = compact.from_frame(df, dtype=np.float64)
+    for mode in ({"strategy": True}, {"winning": True}):
+        on_candles = technical.ultimate(c.close, c.low, c.high, **mode)
+        on_frame = technical.ultimate(df.close, df.low, df.high, **mode)
+        assert np.allclose(np.asarray(on_candles), np.asarray(on_frame)), f"Wrong ultimate {mode}"
+    c32 = compact.from_frame(df)
+    strategy = technical.bollinger_bands(c32.close, strategy=True)
+    assert strategy.dtype == bool and (strategy.to_numpy() == technical.bollinger_bands(df.close, strategy=True).to_numpy()).mean() > 0.99, "float32 strategy too far"
+    gains = technical.gains(c32.close, strategy, commissions=0)
+    assert np.isclose(gains.sum(), technical.gains(df.close, technical.bollinger_bands(df.close, strategy=True), commissions=0).sum(), rtol=1e-3), "Wrong float32 gains"
+
+
+def test_packed_policy():
+    rng = np.random.default_rng(0)
+    for shape in ((1003,), (1003, 5)):
+        values = rng.random(shape) < 0.1
+        bits = policy.pack(values)
+        assert bits.nbytes == -(-1003//8)*(values.size//1003), "Not packed"
+        assert np.array_equal(policy.unpack(bits, 1003), values), "Wrong unpacked policy"
@@ -0,0 +1,57 @@
+import numpy as np
+
+from cryptogym.cryptogym import StockTradingEnv, FEATURES, MAX_ACCOUNT_BALANCE
+from tests.synthetic import candles
+from utils import technical
+
+
+def _frame(df):
+    # features as StockTradingEnv used to add them to df
+    df = df.copy()
+    df["MACD"] = technical.macd(df.close, 10000, 1000)
+    df["Ultimate"] = technical.ultimate(df.close, df.low, df.high, buylevel=30, selllevel=70, days=7)
+    df["Bollinger"] = df.close.std()
+    return df.loc[~df.MACD.isna()].reset_index(drop=True)
+
+
+def test_observation():
+    df = candles(11000)
+    frame = _frame(df)
+    env = StockTradingEnv(df)
+    np.random.seed(0)
+    obs = env.reset()
+    assert obs.shape == env.observation_space.shape == (7, 6), "Wrong observation shape"
+    assert obs.dtype == np.float32, "Observation must be float32"
+    for _ in range(50):
+        step = env.current_step
+        expected = frame.loc[step: step + 5, FEATURES].to_numpy(dtype=np.float32).T
+        assert np.array_equal(obs[:-1], expected), f"Wrong features at step {step}"
+        assert np.isclose(obs[-1, 0], env.balance/MAX_ACCOUNT_BALANCE), "Wrong account row"
+        obs, reward, done, info = env.step(np.array([0.5, 0.1]))
+
+
+def test_step_wraps():
+    env = StockTradingEnv(candles(11000))
+    env.reset()
+    env.current_step = env.prices.size - 6
+    obs, reward, done, info = env.step(np.array([2.5, 0]))
+    assert env.current_step == 0, "Steps must wrap to the first candle"
+    assert obs.shape == (7, 6), "Wrong observation shape after wrapping"
+
+
+def test_take_action_price():
+    df = candles(11000)
+    env = StockTradingEnv(df)
+    env.reset()
+    env.current_step = 10
+    env.step(np.array([0.5, 1]))
+    price = _frame(df).loc[10, "close"]
+    assert np.isclose(env.shares_held, 100/price), "Shares must be bought at the close of the step"
+    assert np.isclose(env.balance, 0), "All the balance must be spent"
+
+
+def test_does_not_modify_df():
+    df = candles(11000)
+    original = df.copy()
+    StockTradingEnv(df)
+    assert df.equals(original), "The data frame must not be modified"
@@ -0,0 +1,102 @@
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import closing
+
+import pytest
+
+from tests.fakeapi import FakeBitstamp
+from utils import loaders
+from utils.downloader import Checkpoint, Downloader, TokenBucket
+from utils.store import OHLCStore
+
+
+def test_download_concurrent():
+    with FakeBitstamp() as api:
+        downloader = Downloader(base_url=api.url, workers=4, rate=1000)
+        ends = [600000 - 60*100*i for i in range(20)]
+        pages = dict(downloader.download("btcusd", ends, step=60, limit=100))
+        assert sorted(pages) == sorted(ends), "Missing pages"
+        for end, response in pages.items():
+            ohlc = response.json()["data"]["ohlc"]
+            assert len(ohlc) == 100 and int(ohlc[-1]["timestamp"]) == end, "Wrong page"
+        assert len(api.requests) == 20, "Wrong number of requests"
+
+
+def test_retry():
+    with FakeBitstamp(fail_first=2) as api:
+        downloader = Downloader(base_url=api.url, workers=1, rate=1000, backoff=0.01)
+        response = downloader.fetch("btcusd", step=60, limit=10, end=6000)
+        assert len(response.json()["data"]["ohlc"]) == 10, "Retry failed"
+        assert len(api.requests) == 3, "Wrong number of retries"
+    with FakeBitstamp(fail_first=10) as api:
+        downloader = Downloader(base_url=api.url, workers=1, rate=1000, retries=2, backoff=0.01)
+        with pytest.raises(IOError):
+            downloader.fetch("btcusd", end=6000)
+
+
+def test_close_on_error():
+    threads = threading.active_count()
+    closed = []
+    with FakeBitstamp() as api:
+        with pytest.raises(KeyboardInterrupt):
+            with Downloader(base_url=api.url, workers=4, rate=1000) as downloader:
+                downloader.session.close = lambda: closed.append(True)
+                with closing(downloader.download("btcusd", [600000 - 60*100*i for i in range(100)], step=60, limit=100)) as pages:
+                    for _ in pages:
+                        raise KeyboardInterrupt
+        assert len(api.requests) < 100, "Pending requests must be cancelled"
+    assert closed == [True], "Session not closed"
+    assert threading.active_count() == threads, "Worker threads leaked"
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=50, capacity=1)
+    begin = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - begin >= 0.19, "Rate limit not respected"
+
+
+def test_checkpoint_resume(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path, anchor=1000)
+    checkpoint.mark([1, 2])
+    resumed = Checkpoint(path, anchor=2000)
+    assert resumed.anchor == 1000 and 2 in resumed and 3 not in resumed, "Checkpoint not resumed"
+    resumed.clear()
+    assert Checkpoint(path).anchor is None, "Checkpoint not cleared"
+
+
+def test_populate_dataset_resume(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("database")
+    # anchor of a new dataset
+    anchor = int(datetime.datetime(2021, 2, 15).timestamp())
+    save_pages = loaders._save_pages
+    saves = []
+
+    def stop(*args):
+        saves.append(True)
+        if len(saves) == 2:
+            raise KeyboardInterrupt
+        save_pages(*args)
+    checkpoint = os.path.join("database", "btcusd_60.checkpoint.json")
+    with FakeBitstamp(now=anchor) as api:
+        monkeypatch.setattr(loaders, "_save_pages", stop)
+        with pytest.raises(KeyboardInterrupt):
+            loaders.populate_dataset("btcusd", limit=10, n_requests=8, flush_every=3, downloader=Downloader(base_url=api.url, workers=1, rate=1000))
+        monkeypatch.setattr(loaders, "_save_pages", save_pages)
+        with open(checkpoint) as f:
+            state = json.load(f)
+        assert state["anchor"] == anchor and len(state["done"]) == 3, "Wrong checkpoint"
+        assert OHLCStore("database").read("btcusd").shape[0] == 30, "Wrong saved rows"
+        first = len(api.requests)
+        loaders.populate_dataset("btcusd", limit=10, n_requests=8, flush_every=3, downloader=Downloader(base_url=api.url, workers=4, rate=1000))
+        pages = [query["end"] for _, query in api.requests[first:] if "end" in query]
+    assert len(pages) == 5 and not set(pages) & set(state["done"]), "Saved pages downloaded again"
+    df = OHLCStore("database").read("btcusd")
+    assert df.shape[0] == 80 and df.timestamp.iloc[-1] == anchor//60*60 and (df.timestamp.diff().dropna() == 60).all(), "Wrong rows"
+    assert not os.path.exists(checkpoint), "Checkpoint not cleared"
@@ -0,0 +1,59 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from cryptogym.cryptogym import StockTradingEnv
+from cryptogym.features import FeatureCache, compute
+from tests.synthetic import candles
+
+
+def _first_observation(root, key):
+    env = StockTradingEnv(key, cache=FeatureCache(root))
+    env.reset()
+    env.current_step = 0
+    return env._next_observation(), isinstance(env.features, np.memmap)
+
+
+def test_cache_roundtrip(tmp_path):
+    df = candles(11000)
+    cache = FeatureCache(str(tmp_path))
+    features, prices = cache.get(df)
+    assert isinstance(features, np.memmap) and not features.flags.writeable, "Features must be mapped read only"
+    expected_features, expected_prices = compute(df)
+    assert np.array_equal(features, expected_features) and np.array_equal(prices, expected_prices), "Wrong cached features"
+    key = cache.key(df)
+    mtime = (tmp_path/key/"features.npy").stat().st_mtime_ns
+    cache.get(df)
+    assert (tmp_path/key/"features.npy").stat().st_mtime_ns == mtime, "Cached features must not be recomputed"
+
+
+def test_cache_key(tmp_path):
+    df = candles(11000)
+    cache = FeatureCache(str(tmp_path))
+    key = cache.key(df)
+    assert cache.key(df.copy()) == key, "Same data must have the same key"
+    assert cache.key(df, days=8) != key, "Parameters must change the key"
+    changed = df.copy()
+    changed.iloc[5000, changed.columns.get_loc("close")] += 1
+    assert cache.key(changed) != key, "Data must change the key"
+    assert cache.key(df, long=10000) == key, "Default parameters must give the default key"
+
+
+def test_attach_missing(tmp_path):
+    with pytest.raises(ValueError):
+        FeatureCache(str(tmp_path)).attach("missing")
+
+
+def test_workers_attach(tmp_path):
+    df = candles(11000)
+    cache = FeatureCache(str(tmp_path))
+    env = StockTradingEnv(df, cache=cache)
+    env.reset()
+    env.current_step = 0
+    key = cache.key(df)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(_first_observation, [str(tmp_path)]*2, [key]*2))
+    for obs, mapped in results:
+        assert mapped, "Workers must map the cached features"
+        assert np.array_equal(obs, env._next_observation()), "Workers must see the same features"
@@ -0,0 +1,58 @@
+import json
+import os, os.path
+import subprocess
+import sys
+
+import pytest
+
+from utils import loaders
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Seconds the offline modules may take to import on top of numpy and pandas
+IMPORT_BUDGET = 0.1
+OFFLINE = ["utils.loaders", "utils.technical", "utils.sweep", "utils.walkforward", "utils.compact", "cryptogym.features"]
+OPTIONAL = ["requests", "tqdm", "gym", "apikeys"]
+
+
+def _import(modules):
+    '''
+    Return the seconds importing modules took in a new interpreter and the modules it loaded
+    '''
+    code = "\n".join([
+        "import json, sys, time",
+        "import numpy, pandas",
+        "begin = time.perf_counter()",
+        *(f"import {module}" for module in modules),
+        "print(json.dumps({'seconds': time.perf_counter() - begin, 'modules': sorted(sys.modules)}))",
+    ])
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.pop(loaders.APIKEY_ENV, None)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT, env=env)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def test_offline_imports():
+    runs = [_import(OFFLINE) for _ in range(3)]
+    loaded = {module.split(".")[0] for module in runs[0]["modules"]}
+    assert not loaded & set(OPTIONAL), f"Optional dependencies imported: {loaded & set(OPTIONAL)}"
+    seconds = min(run["seconds"] for run in runs)
+    assert seconds < IMPORT_BUDGET, f"Imports took {seconds:.3f}s, budget {IMPORT_BUDGET}s"
+
+
+def test_lazy_packages():
+    modules = _import(["utils", "cryptogym"])["modules"]
+    assert not [module for module in modules if module.startswith(("utils.", "cryptogym."))], "Submodules imported eagerly"
+    import utils, cryptogym
+    assert utils.technical.macd is not None and cryptogym.FeatureCache is not None, "Lazy attributes missing"
+    with pytest.raises(AttributeError):
+        utils.missing
+
+
+def test_deferred_apikey(monkeypatch):
+    monkeypatch.setenv(loaders.APIKEY_ENV, "secret")
+    assert loaders.apikey() == "secret", "Environment key not used"
+    monkeypatch.delenv(loaders.APIKEY_ENV)
+    # no apikeys/key.py
+    monkeypatch.setitem(sys.modules, "apikeys", None)
+    with pytest.raises(FileNotFoundError):
+        loaders.apikey()
@@ -0,0 +1,30 @@
+import json
+
+import numpy as np
+
+from tests.fakeapi import candle
+from utils.ingest import OHLCBuffer
+
+
+def page(timestamps):
+    return json.dumps({"data": {"pair": "BTC/USD", "ohlc": [candle(t) for t in timestamps]}}).encode()
+
+
+def test_buffer_parse():
+    buffer = OHLCBuffer(capacity=10)
+    assert buffer.add_response(page(range(0, 600, 60))) == 10, "Wrong number of rows"
+    arrays = buffer.arrays()
+    assert arrays["timestamp"].dtype == np.int64 and arrays["close"].dtype == np.float64, "Wrong dtypes"
+    assert np.allclose(arrays["close"], [float(candle(t)["close"]) for t in range(0, 600, 60)]), "Wrong values"
+
+
+def test_buffer_dedup_and_sort():
+    buffer = OHLCBuffer(capacity=4)
+    buffer.add_response(page(range(6000, 12000, 60)))
+    buffer.add_response(page(range(0, 6060, 60)))
+    assert buffer.add_response(page([60, 60, 120])) == 0, "Duplicates ingested"
+    arrays = buffer.arrays()
+    assert len(buffer) == 200, "Wrong number of rows"
+    assert (np.diff(arrays["timestamp"]) == 60).all(), "Rows not sorted or duplicated"
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.add_response(page([60])) == 1, "Buffer not cleared"
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+import pytest
+
+from cryptogym.cryptogym import StockTradingEnv
+from tests.fakeapi import candle
+from tests.synthetic import candles
+from utils import instrument, technical
+from utils.ingest import OHLCBuffer
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    instrument.reset()
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+def test_disabled_records_nothing():
+    df = candles(3000)
+    technical.ultimate(df.close, df.low, df.high, strategy=True)
+    with instrument.timer("block"):
+        instrument.count("events", 3)
+    assert instrument.stats() == {"timers": {}, "counters": {}}, "Recorded while disabled"
+    assert instrument.report().empty and instrument.prometheus() == "", "Empty report expected"
+
+
+def test_hot_paths():
+    df = candles(3000)
+    instrument.enable()
+    technical.ultimate(df.close, df.low, df.high, strategy=True)
+    technical.macd(df.close, 1000, 100)
+    timers = instrument.stats()["timers"]
+    for name in ("technical.ultimate", "technical.macd", "technical.getpolicy", "technical.duplicate_check", "rolling.rolling_sum"):
+        assert name in timers, f"{name} not timed"
+    assert timers["technical.duplicate_check"][0] == 2, "Wrong duplicate checks"
+    # ultimate sums over 3 windows, macd through 2 rolling means
+    assert timers["rolling.rolling_sum"][0] == 5, "Wrong rolling calls"
+    report = instrument.report()
+    assert report.loc["technical.macd", "count"] == 1 and report.loc["technical.macd", "kind"] == "timer", "Wrong report"
+
+
+def test_aggregates_and_prometheus():
+    instrument.enable()
+    for seconds in (0.5, 0.1, 0.3):
+        instrument.record("download.wait", seconds)
+    instrument.count("ingest.bytes", 100)
+    instrument.count("ingest.bytes", 300)
+    report = instrument.report()
+    assert np.allclose(report.loc["download.wait", ["count", "total", "min", "max"]].astype(float), [3, 0.9, 0.1, 0.5]), "Wrong timer stats"
+    assert np.isclose(report.loc["download.wait", "per_second"], 3/0.9), "Wrong calls per second"
+    assert report.loc["ingest.bytes", "mean"] == 200, "Wrong mean per event"
+    text = instrument.prometheus(prefix="test")
+    assert "# TYPE test_download_wait_seconds summary" in text, "Missing timer type"
+    assert "test_download_wait_seconds_count 3\n" in text, "Wrong timer count"
+    assert "test_ingest_bytes_total 400.0\n" in text and "test_ingest_bytes_events_total 2\n" in text, "Wrong counter"
+
+
+def test_ingest_and_env_counters():
+    instrument.enable()
+    buffer = OHLCBuffer()
+    page = json.dumps({"data": {"pair": "BTC/USD", "ohlc": [candle(t) for t in range(0, 600, 60)]}}).encode()
+    buffer.add_response(page)
+    buffer.add_response(page)
+    counters = instrument.stats()["counters"]
+    assert counters["ingest.bytes"] == (2, 2*len(page)), "Wrong bytes"
+    assert counters["ingest.rows"] == (2, 10) and counters["ingest.duplicates"] == (2, 10), "Wrong rows"
+    np.random.seed(0)
+    env = StockTradingEnv(candles(11000))
+    env.reset()
+    for _ in range(20):
+        env.step(np.array([0.5, 0.1]))
+    timers = instrument.stats()["timers"]
+    assert timers["StockTradingEnv.step"][0] == 20, "Wrong env steps"
+    assert timers["StockTradingEnv._next_observation"][0] == 21, "Wrong observations"
+
+
+def test_hooks_installed_only_when_enabled():
+    untimed = technical.getpolicy
+    assert not hasattr(untimed, "__wrapped__"), "Hook installed while disabled"
+    instrument.enable()
+    assert technical.getpolicy.__wrapped__ is untimed, "Hook not installed"
+    assert StockTradingEnv.step.__wrapped__ is not None, "Method hook not installed"
+    instrument.disable()
+    assert technical.getpolicy is untimed and not hasattr(StockTradingEnv.step, "__wrapped__"), "Hook not removed"
@@ -0,0 +1,33 @@
+import numpy as np
+
+from tests.synthetic import candles
+from utils import online, technical
+
+
+def run(indicator, df):
+    return np.array([indicator.update(candle) for candle in df.to_dict("records")])
+
+
+def test_online_matches_batch():
+    df = candles(3000)
+    ultimate = technical.ultimate(df.close, df.low, df.high, days=7)
+    assert np.array_equal(run(online.OnlineUltimate(days=7), df)[-len(ultimate):], ultimate.to_numpy()), "Wrong Ultimate"
+    assert np.array_equal(run(online.OnlineMACD(500, 50), df), technical.macd(df.close, 500, 50).to_numpy(), equal_nan=True), "Wrong MACD"
+    lower, upper = technical.bollinger_bands(df.close, k=2, period=200)
+    bands = run(online.OnlineBollingerBands(k=2, period=200), df)
+    assert np.array_equal(bands[:, 0], lower.to_numpy(), equal_nan=True), "Wrong lower band"
+    assert np.array_equal(bands[:, 1], upper.to_numpy(), equal_nan=True), "Wrong upper band"
+    williams = technical.williams(df.close, df.low, df.high, days=10)
+    assert np.array_equal(run(online.OnlineWilliams(days=10), df), williams.to_numpy(), equal_nan=True), "Wrong Williams"
+    momentum = technical.momentum(df.close, period=10)
+    assert np.array_equal(run(online.OnlineMomentum(period=10), df), momentum.to_numpy(), equal_nan=True), "Wrong Momentum"
+
+
+def test_snapshot_restore():
+    df = candles(1000)
+    indicator = online.OnlineBollingerBands(k=1, period=50)
+    run(indicator, df.iloc[:600])
+    state = indicator.snapshot()
+    first = run(indicator, df.iloc[600:])
+    restored = online.OnlineBollingerBands().restore(state)
+    assert np.array_equal(run(restored, df.iloc[600:]), first), "Restored state differs"
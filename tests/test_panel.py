@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.synthetic import candles
+from utils import panel, technical
+from utils.store import OHLCStore
+
+
+def _frames():
+    first = candles(3000, seed=0)
+    # starts later, ends earlier and misses some candles
+    second = candles(2800, seed=1, start="2021-01-01 02:00").drop(pd.date_range("2021-01-01 10:00", periods=50, freq="min"))
+    return {"btcusd": first, "ethusd": second}
+
+
+def test_load(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=500)
+    frames = _frames()
+    for pair, df in frames.items():
+        store.append(pair, dict(df.to_dict("series"), timestamp=df.index.asi8//10**9))
+    data = panel.load(store, ["btcusd", "ethusd"])
+    assert len(data) == 3000 and data.pairs == ["btcusd", "ethusd"], "Wrong outer timestamps"
+    assert data.close.shape == (3000, 2) and data.close.index.equals(data.index), "Wrong frame"
+    assert data.close.ethusd.isna().sum() == 3000 - 2750 and not data.close.btcusd.isna().any(), "Wrong missing candles"
+    assert np.array_equal(data.pair("ethusd").close, frames["ethusd"].close), "Wrong candles of a pair"
+    inner = panel.load(store, how="inner")
+    assert len(inner) == 2750 and not np.isnan(inner.columns["close"]).any(), "Wrong inner timestamps"
+    with pytest.raises(ValueError):
+        panel.load(store, ["btcusd", "xrpusd"])
+
+
+def test_from_frames_and_fill():
+    data = panel.from_frames(_frames())
+    assert len(data) == 3000, "Wrong outer timestamps"
+    filled = data.fill()
+    gap = filled.close.loc["2021-01-01 10:00":"2021-01-01 10:49", "ethusd"]
+    assert (gap == data.close.ethusd.loc["2021-01-01 09:59"]).all(), "Gaps must repeat the last close"
+    assert (filled.volume.loc[gap.index, "ethusd"] == 0).all(), "Filled candles have no volume"
+    assert filled.close.ethusd.iloc[:120].isna().all(), "Rows before the first candle stay NaN"
+    with pytest.raises(ValueError):
+        panel.from_frames({"btcusd": candles(10).iloc[::-1]})
+
+
+def test_technical_column_wise():
+    data = panel.from_frames({pair: candles(3000, seed=seed) for seed, pair in enumerate(["btcusd", "ethusd", "xrpusd"])})
+    close, low, high = data.close, data.low, data.high
+    for pair in data.pairs:
+        checks = [
+            (technical.macd(close, 500, 50), technical.macd(close[pair], 500, 50)),
+            (technical.ultimate(close, low, high), technical.ultimate(close[pair], low[pair], high[pair])),
+            (technical.williams(close, low, high), technical.williams(close[pair], low[pair], high[pair])),
+            (technical.momentum(close), technical.momentum(close[pair])),
+            (technical.bollinger_bands(close, period=100)[0], technical.bollinger_bands(close[pair], period=100)[0]),
+            (technical.macd(close, 500, 50, strategy=True), technical.macd(close[pair], 500, 50, strategy=True)),
+            (technical.bollinger_bands(close, period=100, strategy=True), technical.bollinger_bands(close[pair], period=100, strategy=True)),
+            (technical.ultimate(close, low, high, strategy=True, mingain=0.001), technical.ultimate(close[pair], low[pair], high[pair], strategy=True, mingain=0.001)),
+            (technical.momentum(close, strategy=True), technical.momentum(close[pair], strategy=True)),
+        ]
+        for frame, series in checks:
+            pd.testing.assert_series_equal(frame[pair], series, check_names=False)
+    policy = technical.ultimate(close, low, high, strategy=True)
+    gains = technical.gains(close, policy, commissions=0)
+    assert list(gains.columns) == data.pairs, "One column of gains per pair"
+    assert np.array_equal(gains.ethusd.dropna(), technical.gains(close.ethusd, policy.ethusd, commissions=0)), "Wrong gains"
+    winning = technical.williams(close, low, high, winning=True)
+    assert np.isclose(winning.xrpusd, technical.williams(close.xrpusd, low.xrpusd, high.xrpusd, winning=True)), "Wrong winning"
+
+
+def test_technical_on_missing_candles():
+    data = panel.from_frames(_frames())
+    close, low, high = data.close, data.low, data.high
+    indicators = {
+        "ultimate": lambda c, l, h, **kw: technical.ultimate(c, l, h, **kw),
+        "bollinger_bands": lambda c, l, h, **kw: technical.bollinger_bands(c, period=100, **kw),
+        "macd": lambda c, l, h, **kw: technical.macd(c, 500, 50, **kw),
+        "williams": lambda c, l, h, **kw: technical.williams(c, l, h, **kw),
+        "momentum": lambda c, l, h, **kw: technical.momentum(c, **kw),
+    }
+    for name, indicator in indicators.items():
+        strategy = indicator(close, low, high, strategy=True)
+        gains = indicator(close, low, high, getgains=True)
+        winning = indicator(close, low, high, winning=True)
+        for pair in data.pairs:
+            rows = close[pair].notna()
+            c, l, h = close[pair][rows], low[pair][rows], high[pair][rows]
+            expected = indicator(c, l, h, strategy=True)
+            pd.testing.assert_series_equal(strategy[pair].loc[expected.index], expected, check_names=False)
+            assert not strategy[pair].drop(expected.index).any(), f"{name} trades {pair} without a price"
+            pd.testing.assert_series_equal(gains[pair].dropna(), indicator(c, l, h, getgains=True), check_names=False)
+            assert np.isclose(winning[pair], indicator(c, l, h, winning=True)), f"Wrong {name} winning of {pair}"
+    buy, sell = close < close.shift(10), close > close.shift(10)
+    policy = technical.getpolicy(buy, sell, close, mingain=0.001)
+    rows = close.ethusd.notna()
+    expected = technical.getpolicy(buy.ethusd[rows], sell.ethusd[rows], close.ethusd[rows], mingain=0.001)
+    assert policy.ethusd[rows].equals(expected) and not policy.ethusd[~rows].any(), "Wrong getpolicy of a pair missing candles"
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from tests.synthetic import candles
+from utils import parallel, sweep, technical
+
+
+def test_parallel_evaluate():
+    df = candles(2000)
+    params = [{"days": d, "buylevel": 30, "selllevel": 70, "mingain": m} for d in (3, 7) for m in (0, 0.001)]
+    one = parallel.parallel_evaluate("ultimate", params, df.close, df.low, df.high, workers=1)
+    two = parallel.parallel_evaluate("ultimate", params, df.close, df.low, df.high, workers=2, chunksize=3)
+    pd.testing.assert_frame_equal(one, two)
+    for row, param in zip(one.itertuples(), params):
+        expected = technical.ultimate(df.close, df.low, df.high, **param, winning=True)
+        assert np.isclose(row.winning, expected), f"Wrong winning for {param}"
+
+
+def test_parallel_sweep():
+    df = candles(2000)
+    grid = {"days": [3, 5, 7], "buylevel": [30, 40], "selllevel": [70]}
+    results = parallel.parallel_sweep("ultimate", grid, df.close, df.low, df.high, workers=2)
+    pd.testing.assert_frame_equal(results, sweep.sweep("ultimate", df.close, grid, low=df.low, high=df.high))
+
+
+def test_shared_prices_cleanup():
+    with parallel.SharedPrices({"close": np.arange(5.0)}) as shared:
+        arrays = shared.attach(shared.spec)
+        assert (arrays["close"] == np.arange(5.0)).all(), "Wrong shared values"
+        path = shared.path
+    assert not os.path.exists(path), "Shared files not removed"
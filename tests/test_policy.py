@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.synthetic import candles
+from utils import policy, technical
+
+
+def _signals(index, seed, buy_rate=0.3, sell_rate=0.3):
+    rng = np.random.default_rng(seed)
+    n = index.size
+    return pd.Series(rng.random(n) < buy_rate, index=index), pd.Series(rng.random(n) < sell_rate, index=index)
+
+
+def _absolutegain(buys, prices, mingain, stoploss):
+    # element by element reference, next buy is the first buy edge after the sell
+    prices = prices.astype(np.float32)
+    out = np.zeros(prices.size, dtype=bool)
+    idx = next((i for i in range(prices.size) if buys[i]), None)
+    while idx is not None:
+        out[idx] = True
+        buy_price = float(prices[idx])
+        sell = None
+        for i in range(idx + 1, prices.size):
+            ratio = prices[i]/buy_price
+            if (mingain != 0 and ratio >= 1 + mingain) or (stoploss != 0 and ratio <= 1 - stoploss):
+                sell = i
+                break
+        if sell is None:
+            break
+        out[sell] = True
+        idx = next((i for i in range(sell + 1, prices.size) if buys[i]), None)
+    return out
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("mingain", [0, 0.001, 0.01])
+def test_getpolicy_matches_loop(seed, mingain):
+    df = candles(1500, seed=seed)
+    buy, sell = _signals(df.index, seed, buy_rate=0.1*(seed + 1), sell_rate=0.5 - 0.05*seed)
+    accelerated = technical.getpolicy(buy, sell, df.close, mingain=mingain)
+    loop = technical.getpolicy(buy, sell, df.close, mingain=mingain, accelerate=False)
+    assert accelerated.dtype == bool, "Policy must be boolean"
+    assert accelerated.index.equals(buy.index), "Policy index changed"
+    pd.testing.assert_series_equal(accelerated, loop)
+
+
+def test_getpolicy_aligns_prices():
+    df = candles(1000)
+    buy, sell = _signals(df.index[100:], 0)
+    accelerated = technical.getpolicy(buy, sell, df.close, mingain=0.001)
+    loop = technical.getpolicy(buy, sell, df.close, mingain=0.001, accelerate=False)
+    pd.testing.assert_series_equal(accelerated, loop)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("mingain, stoploss", [(0.002, 0), (0, 0.002), (0.002, 0.004)])
+def test_getpolicy_absolutegain(seed, mingain, stoploss):
+    df = candles(1500, seed=seed)
+    buy, sell = _signals(df.index, seed, buy_rate=0.02)
+    firstopportunity = stoploss == 0
+    result = technical.getpolicy(buy, sell, df.close, mingain=mingain, stoploss=stoploss, firstopportunity=firstopportunity)
+    buys = (buy.shift(1) != buy).to_numpy()
+    expected = _absolutegain(buys, df.close.to_numpy(), mingain, stoploss)
+    assert np.array_equal(result.to_numpy(), expected), "Wrong firstopportunity/stoploss policy"
+    assert result.sum() > 2, "Too few trades to be meaningful"
+
+
+def test_absolutegain_long_search():
+    # exit far after the first search window
+    prices = np.full(5000, 100.0)
+    prices[4000] = 110
+    buys = np.zeros(prices.size, dtype=bool)
+    buys[[10, 20, 4500]] = True
+    result = policy.cycle_absolutegain(buys, prices, 0.05, 0)
+    assert np.flatnonzero(result).tolist() == [10, 4000, 4500], "Wrong long search"
+
+
+def test_cycle_columns():
+    buy, sell = _signals(pd.date_range("2021-02-15", periods=500, freq="min"), 0)
+    buys, sells = policy.edges(buy.to_numpy()), policy.edges(sell.to_numpy())
+    batched = policy.cycle(np.column_stack([buys, sells]), np.column_stack([sells, buys]))
+    assert np.array_equal(batched[:, 0], policy.cycle(buys, sells)), "Wrong first column"
+    assert np.array_equal(batched[:, 1], policy.cycle(sells, buys)), "Wrong second column"
+
+
+def test_cycle_empty():
+    empty = np.zeros(0, dtype=bool)
+    assert policy.cycle(empty, empty).size == 0, "Empty signals must give an empty policy"
+    assert policy.cycle_checkgain(empty, empty, np.zeros(0), 0.01).size == 0, "Empty signals must give an empty policy"
+    assert policy.cycle_absolutegain(empty, np.zeros(0), 0.01, 0).size == 0, "Empty signals must give an empty policy"
@@ -0,0 +1,48 @@
+import numpy as np
+
+from cryptogym.features import compute, compute_panel
+from cryptogym.portfolio_env import PortfolioTradingEnv
+from tests.synthetic import candles
+from utils import panel
+
+
+def _panel():
+    return panel.from_frames({pair: candles(2000, seed=seed) for seed, pair in enumerate(["btcusd", "ethusd", "xrpusd"])})
+
+
+def test_compute_panel():
+    data = _panel()
+    features, prices = compute_panel(data, long=500, short=50)
+    assert features.shape == (3, 6, 1501) and features.dtype == np.float32 and prices.shape == (1501, 3), "Wrong shapes"
+    for column, pair in enumerate(data.pairs):
+        single_features, single_prices = compute(data.pair(pair), long=500, short=50)
+        assert np.array_equal(features[column], single_features), f"Wrong features of {pair}"
+        assert np.array_equal(prices[:, column], single_prices), f"Wrong prices of {pair}"
+
+
+def test_rebalance():
+    np.random.seed(0)
+    data = _panel()
+    env = PortfolioTradingEnv(compute_panel(data, long=500, short=50), commissions=0.01)
+    obs = env.reset()
+    assert obs.shape == (3, 7, 6) and env.observation_space.contains(obs), "Wrong observation"
+    assert np.all(obs[:, -1, 1] == 1), "Must start in cash"
+    step = env.current_step
+    obs, reward, done, _ = env.step([1, 1, 2, 0])
+    prices = env.prices
+    units = np.array([1, 2, 0])/4*100*(1 - 0.01*0.75)/prices[step]
+    assert np.allclose(env.shares_held, units), "Wrong rebalance"
+    assert np.isclose(env.total_fees, 0.75), "Commissions on the traded value"
+    net_worth = env.balance + units @ prices[step + 1]
+    assert np.isclose(env.net_worth, net_worth) and np.isclose(reward, net_worth - 100), "Wrong reward"
+    assert np.allclose(obs[:, -1, 0], env.weights()[1:]), "Observation must hold the weights"
+    obs, reward, done, _ = env.step([0, 0, 0, 0])
+    assert np.all(env.shares_held == 0) and np.isclose(env.weights()[0], 1), "Zero weights sell everything"
+
+
+def test_done_at_end():
+    env = PortfolioTradingEnv(compute_panel(_panel(), long=500, short=50))
+    env.reset()
+    env.current_step = env.prices.shape[0] - 8
+    dones = [env.step(np.ones(4))[2] for _ in range(2)]
+    assert dones == [False, True], "Episode must end with the data"
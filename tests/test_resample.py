@@ -0,0 +1,80 @@
+import os
+
+import pandas as pd
+import pytest
+
+from tests.synthetic import candles
+from utils import resample
+from utils.store import OHLCStore
+
+
+def _minutes(n, seed=0, start="2021-01-01"):
+    df = candles(n, seed=seed, start=start)
+    df["timestamp"] = df.index.asi8 // 10**9
+    return df
+
+
+def test_resample_matches_pandas():
+    df = _minutes(5000).drop(index=pd.date_range("2021-01-01 01:10", periods=30, freq="min"))
+    hourly = resample.resample(df, "1h")
+    expected = df.resample("1h").agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+    pd.testing.assert_frame_equal(hourly[["open", "high", "low", "close", "volume"]], expected, check_freq=False, check_names=False)
+    assert (hourly.timestamp % 3600 == 0).all(), "Buckets must start on the hour"
+
+
+def test_resample_arrays():
+    df = _minutes(100)
+    arrays = {column: df[column].to_numpy() for column in ("timestamp", "open", "high", "low", "close", "volume")}
+    out = resample.resample(arrays, 300)
+    assert isinstance(out, dict) and out["timestamp"].size == 20, "Wrong number of 5 minutes buckets"
+    assert out["low"][0] == df.low.iloc[:5].min(), "Low must come from low"
+    assert resample.resample({column: values[:0] for column, values in arrays.items()}, 300)["timestamp"].size == 0, "Empty input must give no buckets"
+    with pytest.raises(ValueError):
+        resample.resample(arrays, "7m")
+
+
+def test_materialize_incremental(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=64)
+    df = _minutes(3000)
+    store.append("btcusd", df.iloc[:1000])
+    assert resample.materialize(store, "btcusd", "1h") == 17, "Wrong number of hours"
+    for first, last in ((1000, 1030), (1030, 2500), (2500, 3000)):
+        store.append("btcusd", df.iloc[first:last])
+        written = resample.materialize(store, "btcusd", "1h")
+        assert written <= (last - first)//60 + 2, "Only the new hours must be aggregated"
+    expected = resample.resample(df, "1h")
+    pd.testing.assert_frame_equal(store.read("btcusd", step=3600), expected)
+    assert store.steps("btcusd") == [60, 3600], "Wrong stored steps"
+
+
+def test_materialize_backfill_and_refresh(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=64)
+    df = _minutes(2000)
+    store.append("btcusd", df.iloc[1000:])
+    resample.materialize(store, "btcusd", "15m")
+    store.append("btcusd", df.iloc[:1000])
+    assert resample.refresh(store, "btcusd")[900] > 0, "Refresh must update the stored timeframes"
+    pd.testing.assert_frame_equal(store.read("btcusd", step=900), resample.resample(df, "15m"))
+
+
+def test_read(tmp_path):
+    store = OHLCStore(str(tmp_path))
+    df = _minutes(600)
+    store.append("btcusd", df)
+    five = resample.read(store, "btcusd", "5m", start=int(df.timestamp.iloc[300]))
+    assert five.shape[0] == 60 and five.timestamp.iloc[0] == df.timestamp.iloc[300], "Wrong 5 minutes candles"
+    assert os.path.isdir(tmp_path/"btcusd"/"300"), "5 minutes candles must be stored"
+
+
+
+def test_materialize_filled_gap(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=64)
+    df = _minutes(600)
+    hole = (df.timestamp >= 3*3600 + df.timestamp.iloc[0]) & (df.timestamp < 5*3600 + df.timestamp.iloc[0])
+    store.append("btcusd", df[~hole])
+    resample.materialize(store, "btcusd", "1h")
+    assert store.read("btcusd", step=3600).shape[0] == 8, "Hours of the hole must be missing"
+    store.append("btcusd", df[hole])
+    span = (int(df.timestamp[hole].iloc[0]), int(df.timestamp[hole].iloc[-1]))
+    assert resample.refresh(store, "btcusd", spans=[span])[3600] == 3, "The hours of the span and the last one must be aggregated"
+    pd.testing.assert_frame_equal(store.read("btcusd", step=3600), resample.resample(df, "1h"))
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.synthetic import candles
+from utils import rolling, technical
+
+
+@pytest.mark.parametrize("window", [1, 2, 7, 100, 999, 1000, 1001])
+def test_kernels_match_pandas(window):
+    rng = np.random.default_rng(0)
+    values = 50000 + np.cumsum(rng.normal(0, 10, (1000, 2)), axis=0)
+    values[[0, 10, 500], 0] = np.nan
+    df = pd.DataFrame(values)
+    for name in ("sum", "mean", "max", "min"):
+        expected = getattr(df.rolling(window), name)().to_numpy()
+        assert np.allclose(getattr(rolling, f"rolling_{name}")(values, window), expected, equal_nan=True), f"Wrong rolling {name}"
+        assert np.allclose(getattr(rolling, f"rolling_{name}")(values[:, 1], window), expected[:, 1], equal_nan=True), f"Wrong 1-D rolling {name}"
+
+
+@pytest.mark.parametrize("window", [2, 3, 50, 1000])
+def test_variance_is_exact(window):
+    rng = np.random.default_rng(0)
+    values = 1e5 + np.cumsum(rng.normal(0, 1e-2, 1000))
+    expected = np.full(values.size, np.nan)
+    expected[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).std(axis=1, ddof=1)
+    assert np.allclose(rolling.rolling_std(values, window), expected, equal_nan=True, rtol=1e-6), "Imprecise rolling std"
+    mean, _ = rolling.rolling_mean_var(values, window)
+    assert np.allclose(mean, pd.Series(values).rolling(window).mean(), equal_nan=True), "Wrong rolling mean"
+
+
+def test_indicators_match_pandas():
+    df = candles(5000)
+    bp = df.close - np.minimum(df.close.shift(1), df.low)
+    tr = np.maximum(df.high, df.close.shift(1)) - np.minimum(df.close.shift(1), df.low)
+    ult = 100*(4*bp.rolling(7).sum()/tr.rolling(7).sum() + 2*bp.rolling(14).sum()/tr.rolling(14).sum() + bp.rolling(21).sum()/tr.rolling(21).sum())/7
+    pd.testing.assert_series_equal(technical.ultimate(df.close, df.low, df.high, days=7), ult.dropna(), check_names=False)
+    macd = df.close.rolling(100).mean() - df.close.rolling(1000).mean()
+    pd.testing.assert_series_equal(technical.macd(df.close, 1000, 100), macd, check_names=False)
+    lower, upper = technical.bollinger_bands(df.close, k=2, period=500)
+    mean, std = df.close.rolling(500).mean(), df.close.rolling(500).std()
+    pd.testing.assert_series_equal(lower, mean - 2*std, check_names=False)
+    pd.testing.assert_series_equal(upper, mean + 2*std, check_names=False)
+    high_N, low_N = df.high.rolling(10).max(), df.low.rolling(10).min()
+    pd.testing.assert_series_equal(technical.williams(df.close, df.low, df.high, days=10), -100*(high_N - df.close)/(high_N - low_N), check_names=False)
+    pd.testing.assert_series_equal(technical.momentum(df.close, period=10), df.close.rolling(10).mean().pct_change(), check_names=False)
+
+
+@pytest.mark.parametrize("window", [0, -3])
+def test_invalid_window(window):
+    values = np.arange(10.0)
+    for kernel in (rolling.rolling_max, rolling.rolling_min, rolling.rolling_sum, rolling.rolling_mean, rolling.rolling_mean_var, rolling.rolling_std):
+        with pytest.raises(ValueError):
+            kernel(values, window)
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.store import OHLCStore
+
+
+def make_candles(start, n, step=60):
+    timestamp = start + step*np.arange(n)
+    close = 100 + np.arange(n, dtype=float)
+    return pd.DataFrame({
+        "high": (close + 1).astype(str),
+        "timestamp": timestamp.astype(str),
+        "volume": np.ones(n).astype(str),
+        "low": (close - 1).astype(str),
+        "close": close.astype(str),
+        "open": close.astype(str),
+    })
+
+
+def test_append_and_read(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=100)
+    store.append("btcusd", make_candles(0, 250))
+    store.append("btcusd", make_candles(250*60, 10))
+    df = store.read("btcusd")
+    assert df.shape[0] == 260, "Rows lost across chunks"
+    assert (np.diff(df.timestamp) == 60).all(), "Rows not sorted"
+    assert store.bounds("btcusd") == (0, 259*60), "Wrong bounds"
+    assert df.close.iloc[-1] == 109, "Wrong appended values"
+
+
+def test_range_read(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=100)
+    store.append("btcusd", make_candles(0, 500))
+    arrays = store.read_arrays("btcusd", start=95*60, end=205*60)
+    assert arrays["timestamp"][0] == 95*60 and arrays["timestamp"][-1] == 205*60, "Wrong range"
+    assert arrays["close"].size == 111, "Wrong range size"
+
+
+def test_older_and_overlapping_rows(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=100)
+    store.append("btcusd", make_candles(150*60, 100))
+    store.append("btcusd", make_candles(0, 200))
+    df = store.read("btcusd")
+    assert df.index.is_unique, "Duplicate timestamps stored"
+    assert df.shape[0] == 250, "Wrong number of rows after merge"
+    # newer write wins on overlapping timestamps
+    assert df.close.loc[pd.to_datetime(150*60, unit='s')] == 250, "Overlapping row not replaced"
+
+
+def test_migrate_pickle(tmp_path):
+    df = make_candles(0, 300).astype(float)
+    df = pd.concat([df, df.iloc[-5:]])
+    df.timestamp = df.timestamp.astype(int)
+    df.index = pd.to_datetime(df.timestamp, unit='s')
+    df.to_pickle(tmp_path / "btcusd.pkl")
+    store = OHLCStore(str(tmp_path), chunk_rows=100)
+    assert store.migrate_all() == ["btcusd"], "Pickle not migrated"
+    migrated = store.read("btcusd")
+    assert migrated.shape[0] == 300, "Duplicates migrated"
+    assert np.allclose(migrated.close, df.close.iloc[:300]), "Wrong migrated values"
+    assert store.migrate_all() == [], "Pickle migrated twice"
+
+
+def test_append_replaces_last_rows_in_place(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=100)
+    store.append("btcusd", make_candles(0, 10))
+    path = os.path.join(tmp_path, "btcusd", "60", f"{0:012d}", "close.bin")
+    inode = os.stat(path).st_ino
+    update = make_candles(9*60, 11)
+    update.loc[0, "close"] = "1"
+    store.append("btcusd", update)
+    assert os.stat(path).st_ino == inode, "The chunk must not be rewritten"
+    df = store.read("btcusd")
+    assert df.shape[0] == 20 and df.close.iloc[9] == 1, "The last row must be replaced"
+    assert store.steps("btcusd") == [60], "Wrong stored steps"
+
+
+def test_interrupted_merge(tmp_path, monkeypatch):
+    merged = OHLCStore(str(tmp_path / "merged"), chunk_rows=100)
+    merged.append("btcusd", make_candles(50*60, 50))
+    before = merged.read("btcusd")
+    merged.append("btcusd", make_candles(0, 60))
+    replace = os.replace
+    # the merge is undone if stopped before the old chunk is moved and finished after
+    for interrupted, expected in ((1, before), (2, merged.read("btcusd"))):
+        store = OHLCStore(str(tmp_path / str(interrupted)), chunk_rows=100)
+        store.append("btcusd", make_candles(50*60, 50))
+        calls = []
+
+        def stop(source, destination):
+            calls.append(source)
+            if len(calls) == interrupted:
+                raise KeyboardInterrupt
+            replace(source, destination)
+        monkeypatch.setattr(os, "replace", stop)
+        with pytest.raises(KeyboardInterrupt):
+            store.append("btcusd", make_candles(0, 60))
+        monkeypatch.undo()
+        pd.testing.assert_frame_equal(store.read("btcusd"), expected)
+        assert os.listdir(tmp_path / str(interrupted) / "btcusd" / "60") == [f"{0:012d}"], "Merge leftovers"
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.synthetic import candles
+from utils import sweep, technical
+
+
+def test_sweep_ultimate():
+    df = candles(3000)
+    grid = {"days": [3, 7], "buylevel": [30, 40], "selllevel": [60, 70]}
+    results = sweep.sweep("ultimate", df.close, grid, low=df.low, high=df.high, commissions=0.001)
+    assert len(results) == 8, "Wrong number of combinations"
+    for row in results.itertuples():
+        expected = technical.ultimate(df.close, df.low, df.high, buylevel=row.buylevel, selllevel=row.selllevel, days=row.days, winning=True, commissions=0.001)
+        assert np.isclose(row.winning, expected), f"Wrong winning for {row}"
+
+
+def test_sweep_bollinger_bands():
+    df = candles(3000)
+    results = sweep.sweep("bollinger_bands", df.close, {"k": [1, 2], "period": [20, 100]})
+    for row in results.itertuples():
+        expected = technical.bollinger_bands(df.close, k=row.k, period=row.period, winning=True)
+        assert np.isclose(row.winning, expected), f"Wrong winning for {row}"
+
+
+def test_sweep_williams():
+    df = candles(3000)
+    results = sweep.sweep("williams", df.close, {"days": [5, 10, 13], "buylevel": [-80], "selllevel": [-20, -30]}, low=df.low, high=df.high)
+    for row in results.itertuples():
+        expected = technical.williams(df.close, df.low, df.high, buylevel=row.buylevel, selllevel=row.selllevel, days=row.days, winning=True)
+        assert np.isclose(row.winning, expected), f"Wrong winning for {row}"
+
+
+def test_sweep_williams_window_longer_than_history():
+    df = candles(50)
+    results = sweep.sweep("williams", df.close, {"days": [10, 60, 100], "buylevel": [-80], "selllevel": [-20]}, low=df.low, high=df.high)
+    for row in results.itertuples():
+        expected = technical.williams(df.close, df.low, df.high, buylevel=row.buylevel, selllevel=row.selllevel, days=row.days, winning=True)
+        assert np.isclose(row.winning, expected), f"Wrong winning for {row}"
+    assert results.loc[results.days > 50, "winning"].nunique() == 1, "Signals without a full window"
+
+def test_sweep_macd():
+    df = candles(3000)
+    results = sweep.sweep("macd", df.close, {"long": [100, 300], "short": [10, 50]}, max_cells=6000)
+    for row in results.itertuples():
+        expected = technical.macd(df.close, row.long, row.short, winning=True)
+        assert np.isclose(row.winning, expected), f"Wrong winning for {row}"
+
+
+def test_sweep_errors():
+    df = candles(100)
+    with pytest.raises(ValueError):
+        sweep.sweep("ultimate", df.close, {"days": [3]})
+    with pytest.raises(ValueError):
+        sweep.sweep("macd", df.close, {"days": [3]})
+
+
+def test_sweep_parity_on_drifting_history():
+    # a global cumulative sum of squares loses the variance of short windows on such prices
+    rows = 2*10**6
+    rng = np.random.default_rng(1)
+    close = pd.Series(np.linspace(10000, 60000, rows) + rng.normal(0, 5, rows).cumsum()*0.1, index=pd.date_range("2021-01-01", periods=rows, freq="min"))
+    low, high = close - 1, close + 1
+    bands = sweep.sweep("bollinger_bands", close, {"k": [2], "period": [20]})
+    assert np.isclose(bands.winning[0], technical.bollinger_bands(close, k=2, period=20, winning=True), rtol=1e-12), "Bollinger bands differ"
+    ult = sweep.sweep("ultimate", close, {"days": [7], "buylevel": [30], "selllevel": [70]}, low=low, high=high)
+    assert np.isclose(ult.winning[0], technical.ultimate(close, low, high, winning=True), rtol=1e-12), "Ultimate differs"
+    macd = sweep.sweep("macd", close, {"long": [1000], "short": [100]})
+    assert np.isclose(macd.winning[0], technical.macd(close, 1000, 100, winning=True), rtol=1e-12), "MACD differs"
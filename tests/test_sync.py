@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.fakeapi import FakeBitstamp, candle
+from utils import loaders, resample
+from utils.downloader import Downloader
+from utils.store import OHLCStore
+from utils.sync import Coverage, sync
+
+
+def _downloader(api):
+    return Downloader(base_url=api.url, workers=4, rate=1000)
+
+
+def test_new_dataset(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=500)
+    with FakeBitstamp(now=10**6) as api:
+        report = sync(store, "btcusd", _downloader(api), start=6000, end=6000 + 60*2499, limit=1000)
+        assert len(api.requests) == 3, "Wrong number of requests"
+    df = store.read("btcusd")
+    assert df.shape[0] == 2500 and df.timestamp.iloc[0] == 6000, "Wrong rows"
+    assert not df.index.duplicated().any(), "Duplicate rows"
+    assert df.close.iloc[10] == float(candle(6600)["close"]), "Wrong values"
+    assert report["coverage"] == 1 and report["gaps"] == [] and report["rows"] == 2500, "Wrong report"
+    with pytest.raises(ValueError):
+        sync(store, "eurusd", None)
+
+
+def test_incremental(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=500)
+    with FakeBitstamp(now=10**6) as api:
+        sync(store, "btcusd", _downloader(api), start=6000, end=6000 + 60*999)
+        api.requests.clear()
+        report = sync(store, "btcusd", _downloader(api), end=6000 + 60*1099)
+        assert len(api.requests) == 1 and api.requests[0][1]["end"] == 6000 + 60*1099, "Only the new candles must be requested"
+        api.requests.clear()
+        report = sync(store, "btcusd", _downloader(api), end=6000 + 60*1099)
+        assert api.requests == [] and report["requests"] == 0, "Nothing must be requested when up to date"
+    df = store.read("btcusd")
+    assert df.shape[0] == 1100 and (np.diff(df.timestamp) == 60).all(), "Wrong rows"
+
+
+def test_fills_gaps(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=500)
+    with FakeBitstamp(now=10**6) as api:
+        downloader = _downloader(api)
+        sync(store, "btcusd", downloader, start=6000, end=6000 + 60*299)
+        sync(store, "btcusd", downloader, start=6000 + 60*700, end=6000 + 60*999)
+        coverage = Coverage.open(store, "btcusd")
+        assert coverage.missing(6000, 6000 + 60*999) == [(6000 + 60*300, 6000 + 60*699)], "Wrong gap"
+        api.requests.clear()
+        report = sync(store, "btcusd", downloader, limit=150, end=6000 + 60*999)
+        assert len(api.requests) == 3, "Only the gap must be requested"
+        assert report["rows"] == 400, "Rows outside the gap must be dropped"
+    df = store.read("btcusd")
+    assert df.shape[0] == 1000 and (np.diff(df.timestamp) == 60).all(), "Gap not filled"
+
+
+def test_max_requests_and_resume(tmp_path):
+    store = OHLCStore(str(tmp_path))
+    with FakeBitstamp(now=10**6) as api:
+        report = sync(store, "btcusd", _downloader(api), start=0, end=60*999, limit=100, max_requests=4)
+        assert report["requests"] == 4 and np.isclose(report["coverage"], 0.4), "Wrong partial coverage"
+        assert report["gaps"] == [(60*400, 60*999)], "The oldest candles must come first"
+        report = sync(store, "btcusd", _downloader(api), end=60*999, limit=100)
+        assert report["coverage"] == 1 and report["requests"] == 6, "Wrong resume"
+
+
+def test_rebuild_from_store(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=100)
+    timestamp = np.r_[np.arange(0, 60*150, 60), np.arange(60*200, 60*260, 60)]
+    data = {column: np.ones(timestamp.size) for column in ("open", "high", "low", "close", "volume")}
+    store.append("btcusd", dict(data, timestamp=timestamp))
+    coverage = Coverage.open(store, "btcusd")
+    assert coverage.ranges == [[0, 60*149], [60*200, 60*259]], "Wrong rebuilt ranges"
+    report = coverage.report()
+    assert report["gaps"] == [(60*150, 60*199)] and np.isclose(report["coverage"], 210/260), "Wrong report"
+
+
+def test_filled_gap_refreshes_timeframes(tmp_path):
+    store = OHLCStore(str(tmp_path), chunk_rows=500)
+    start = 3600*10
+    with FakeBitstamp(now=10**6) as api:
+        downloader = _downloader(api)
+        sync(store, "btcusd", downloader, start=start, end=start + 60*179)
+        sync(store, "btcusd", downloader, start=start + 60*300, end=start + 60*599)
+        resample.materialize(store, "btcusd", "1h")
+        assert store.read("btcusd", step=3600).shape[0] == 8, "Hours of the gap must be missing"
+        report = sync(store, "btcusd", downloader, end=start + 60*599)
+    assert report["spans"] == [(start + 60*180, start + 60*299)], "Wrong written spans"
+    resample.refresh(store, "btcusd", spans=report["spans"])
+    pd.testing.assert_frame_equal(store.read("btcusd", step=3600), resample.resample(store.read("btcusd"), "1h"))
+
+
+def test_update_dataset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("database")
+    store = OHLCStore("database")
+    start = 3600*10
+    with FakeBitstamp(now=10**6) as api:
+        downloader = _downloader(api)
+        sync(store, "btcusd", downloader, start=start, end=start + 60*179)
+        sync(store, "btcusd", downloader, start=start + 60*300, end=start + 60*599)
+        resample.materialize(store, "btcusd", "1h")
+        # the oldest missing candles, the gap, come first
+        report = loaders.update_dataset("btcusd", limit=200, n_requests=1, downloader=downloader)
+        with pytest.raises(ValueError):
+            loaders.update_dataset("xrpusd", downloader=downloader)
+    assert report["requests"] == 1 and report["rows"] == 120, "Wrong report"
+    assert report["spans"] == [(start + 60*180, start + 60*299)] and report["gaps"][0][0] == start + 60*600, "Wrong spans"
+    df = store.read("btcusd")
+    assert df.shape[0] == 600 and (np.diff(df.timestamp) == 60).all(), "Gap not filled"
+    pd.testing.assert_frame_equal(store.read("btcusd", step=3600), resample.resample(df, "1h"))
@@ -0,0 +1,40 @@
+import numpy as np
+
+from cryptogym.cryptogym import StockTradingEnv
+from cryptogym.vec_env import VecStockTradingEnv
+from tests.synthetic import candles
+
+
+def test_matches_single_envs():
+    df = candles(11000)
+    vec = VecStockTradingEnv(df.copy(), 8, seed=0)
+    obs = vec.reset()
+    envs = []
+    for i in range(8):
+        env = StockTradingEnv(df.copy())
+        env.reset()
+        env.current_step = int(vec.current_step[i])
+        envs.append(env)
+    assert obs.shape == (8, 7, 6) and obs.dtype == np.float32, "Wrong observation"
+    actions = np.random.default_rng(0).uniform([0, 0], [3, 1], (200, 8, 2))
+    for action in actions:
+        obs, rewards, dones, info = vec.step(action)
+        for i, env in enumerate(envs):
+            single_obs, reward, done, _ = env.step(action[i])
+            assert np.array_equal(obs[i], single_obs), f"Wrong observation of env {i}"
+            assert rewards[i] == reward and dones[i] == done, f"Wrong reward of env {i}"
+            assert vec.net_worth[i] == env.net_worth and vec.max_net_worth[i] == env.max_net_worth, f"Wrong net worth of env {i}"
+
+
+def test_auto_reset():
+    vec = VecStockTradingEnv(candles(11000), 4, seed=1)
+    vec.reset()
+    vec.step(np.tile([0.5, 0.5], (4, 1)))
+    vec.net_worth[2] = -1
+    obs, rewards, dones, info = vec.step(np.tile([2.5, 0], (4, 1)))
+    assert dones.tolist() == [False, False, True, False], "Only the third episode is done"
+    assert info["_final_observation"].tolist() == dones.tolist(), "Wrong final observation mask"
+    assert info["final_observation"][2].shape == (7, 6), "Missing final observation"
+    assert vec.balance[2] == vec.net_worth[2] == 100 and vec.shares_held[2] == 0, "Episode not reset"
+    assert vec.shares_held[0] > 0, "Other episodes must not be reset"
+    assert obs[2, -1, 0] == np.float32(0.1), "Observation must be the reset one"
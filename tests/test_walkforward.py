@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.synthetic import candles
+from utils import sweep, technical, walkforward
+
+
+def _winning(close, buy, sell, commissions):
+    policy = technical.getpolicy(buy=buy, sell=sell, prices=close)
+    return technical.gains(close, policy, commissions=commissions).sum() - (close.iloc[-1]/close.iloc[0] - 1)*100
+
+
+def test_splits():
+    assert walkforward.splits(10, 4, 2) == [(0, 4, 4, 6), (2, 6, 6, 8), (4, 8, 8, 10)], "Wrong rolling windows"
+    assert walkforward.splits(10, 4, 3, step=2, anchored=True) == [(0, 4, 4, 7), (0, 6, 6, 9)], "Wrong anchored windows"
+    with pytest.raises(ValueError):
+        walkforward.splits(10, 1, 2)
+
+
+def test_ultimate_windows():
+    df = candles(3000)
+    grid = {"days": [3, 7], "buylevel": [30, 40], "selllevel": [60, 70]}
+    results = walkforward.walk_forward("ultimate", grid, df.close, df.low, df.high, train=800, test=400, step=300, commissions=0.001, workers=1)
+    assert len(results) == 7 and (results.test_start == results.train_end).all(), "Wrong windows"
+    assert (results.test_first == df.index[results.test_start]).all(), "Wrong test dates"
+    for row in results.itertuples():
+        # indicators over the whole history, the strategy starting again on every window
+        candidates = []
+        for days in grid["days"]:
+            ult = technical.ultimate(df.close, df.low, df.high, days=days)
+            for window, kind in (((row.train_start, row.train_end), "train"), ((row.test_start, row.test_end), "test")):
+                close = df.close.iloc[window[0]:window[1]]
+                values = ult.reindex(close.index)
+                for buylevel in grid["buylevel"]:
+                    for selllevel in grid["selllevel"]:
+                        candidates.append((kind, days, buylevel, selllevel, _winning(close, values < buylevel, values > selllevel, 0.001)))
+        train = [c for c in candidates if c[0] == "train"]
+        assert np.isclose(row.train_winning, max(c[4] for c in train)), f"Wrong best train winning of {row}"
+        test = [c[4] for c in candidates if c[0] == "test" and c[1:4] == (row.days, row.buylevel, row.selllevel)]
+        assert np.isclose(row.test_winning, test[0]), f"Wrong test winning of {row}"
+
+
+def test_parallel_and_signals():
+    df = candles(3000)
+    grid = {"k": [1, 2], "period": [20, 100]}
+    one = walkforward.walk_forward("bollinger_bands", grid, df.close, train=600, test=300, workers=1)
+    two = walkforward.walk_forward("bollinger_bands", grid, df.close, train=600, test=300, workers=2)
+    pd.testing.assert_frame_equal(one, two)
+    lower, upper = technical.bollinger_bands(df.close, k=one.k.iloc[-1], period=one.period.iloc[-1])
+    window = slice(one.test_start.iloc[-1], one.test_end.iloc[-1])
+    close = df.close.iloc[window]
+    assert np.isclose(one.test_winning.iloc[-1], _winning(close, close < lower.iloc[window], close > upper.iloc[window], 0.005)), "Wrong test winning"
+    # the whole history gives back the sweep
+    for strategy, grid in (("macd", {"long": [100, 300], "short": [10, 50]}), ("williams", {"days": [5, 10], "selllevel": [-20, -30]})):
+        params, buy, sell, combos = sweep.signals(strategy, df.close, grid, low=df.low, high=df.high)
+        winning, trades = sweep.evaluate(df.close.to_numpy(), buy, sell, combos)
+        expected = sweep.sweep(strategy, df.close, grid, low=df.low, high=df.high)
+        assert np.allclose(winning, expected.winning) and np.array_equal(trades, expected.trades), f"Wrong signals of {strategy}"
+
+
+def test_events_match_evaluate():
+    df = candles(4000, seed=3)
+    grids = {
+        "ultimate": {"days": [3, 7], "buylevel": [30, 45], "selllevel": [55, 70]},
+        "bollinger_bands": {"k": [0.5, 1, 2], "period": [20, 100]},
+        "williams": {"days": [5, 10], "buylevel": [-80, -60], "selllevel": [-20, -40]},
+        "macd": {"long": [100, 300], "short": [10, 50]},
+    }
+    close = df.close.to_numpy()
+    for strategy, grid in grids.items():
+        params, buy, sell, combos = sweep.signals(strategy, df.close, grid, low=df.low, high=df.high)
+        events = walkforward.events(close, buy, sell, combos, max_cells=3*len(close))
+        for start, end in ((0, 4000), (300, 1300), (1234, 1240), (2500, 3999), (3000, 3002)):
+            winning, trades = walkforward.evaluate_window(close, events, start, end, commissions=0.001)
+            expected_winning, expected_trades = sweep.evaluate(close, buy, sell, combos, start, end, commissions=0.001)
+            assert np.allclose(winning, expected_winning) and np.array_equal(trades, expected_trades), f"Wrong {strategy} window {start}, {end}"
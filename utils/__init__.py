@@ -0,0 +1,22 @@
+import importlib
+
+# Submodules are imported on first access, import utils then utils.technical loads only
+# technical and what it needs. The network ones load requests and the API key when calling
+# Bitstamp, not when imported.
+
+SUBMODULES = [
+    "backtest", "compact", "downloader", "ingest", "instrument", "loaders", "online", "panel",
+    "parallel", "policy", "resample", "rolling", "store", "sweep", "sync", "technical", "walkforward",
+]
+
+__all__ = SUBMODULES
+
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(SUBMODULES))
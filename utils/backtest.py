@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+# Orders only happen when the target position changes, so the fills are few compared to the
+# bars: they are simulated one by one, while positions are marked to market and stop-losses
+# searched with NumPy over all the bars in between.
+
+
+class PercentFee:
+    '''
+    Fee proportional to the traded value
+
+    :param float rate: Percentage of the traded value (ex 0.005)
+    '''
+
+    def __init__(self, rate=0.005):
+        self.rate = rate
+
+    def __call__(self, value: float) -> float:
+        return self.rate*value
+
+
+class FixedFee:
+    '''
+    Same fee for every fill
+
+    :param float amount: Fee per fill
+    '''
+
+    def __init__(self, amount: float):
+        self.amount = amount
+
+    def __call__(self, value: float) -> float:
+        return self.amount
+
+
+class PercentSlippage:
+    '''
+    Fills at a price worse by a percentage, higher when buying and lower when selling
+
+    :param float rate: Percentage of the price (ex 0.0005)
+    '''
+
+    def __init__(self, rate=0.0005):
+        self.rate = rate
+
+    def __call__(self, price: float, units: float) -> float:
+        return price*(1 + self.rate) if units > 0 else price*(1 - self.rate)
+
+
+def _no_slippage(price, units):
+    return price
+
+
+def policy_target(policy) -> np.ndarray:
+    '''
+    Return the target position of a technical policy, 1 from a buy to the next sell and 0 else
+
+    :param policy: Policy of a technical strategy, True at every buy and sell
+    '''
+    return (np.cumsum(np.asarray(policy, dtype=bool)) % 2).astype(np.float64)
+
+
+def _columns(bars):
+    if isinstance(bars, pd.Series):
+        close = bars.to_numpy(dtype=np.float64)
+        return bars.index, close, close, close, close
+    close = bars["close"].to_numpy(dtype=np.float64)
+    open_, high, low = (bars[name].to_numpy(dtype=np.float64) if name in bars else close for name in ("open", "high", "low"))
+    return bars.index, open_, high, low, close
+
+
+def _aligned(values, index, fill):
+    if isinstance(values, pd.Series) and not values.index.equals(index):
+        values = values.reindex(index)
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape != index.shape:
+        raise ValueError("Target and bars must have the same length.")
+    # keep the previous target where missing
+    valid = ~np.isnan(values)
+    last = np.maximum.accumulate(np.where(valid, np.arange(values.size), -1))
+    return np.where(last >= 0, values[np.maximum(last, 0)], fill)
+
+
+class _Book:
+    '''
+    Cash, position and fills of a backtest
+    '''
+
+    def __init__(self, budget, fee, slippage):
+        self.cash = float(budget)
+        self.units = 0.0
+        self.entry = 0.0
+        self.fee = fee
+        self.slippage = slippage
+        self.fills = []
+
+    def fill(self, bar, units, price, reason):
+        if units == 0:
+            return
+        price = self.slippage(price, units)
+        fee = self.fee(abs(units)*price)
+        self.cash -= units*price + fee
+        position = self.units + units
+        if position == 0:
+            self.entry = 0.0
+        elif self.units == 0 or (position > 0) != (self.units > 0):
+            self.entry = price
+        elif abs(position) > abs(self.units):
+            self.entry = (self.entry*self.units + price*units)/position
+        self.units = position
+        self.fills.append((bar, units, price, fee, reason, position, self.cash))
+
+    def stop(self, open_, high, low, start, end, stoploss):
+        '''
+        Close the position at the first bar in [start, end) reaching the stop-loss, return if stopped
+        '''
+        if self.units == 0 or stoploss == 0 or start >= end:
+            return False
+        if self.units > 0:
+            level = self.entry*(1 - stoploss)
+            hit = low[start:end] <= level
+        else:
+            level = self.entry*(1 + stoploss)
+            hit = high[start:end] >= level
+        if not hit.any():
+            return False
+        bar = start + int(hit.argmax())
+        # a gap through the stop fills at the open
+        price = min(open_[bar], level) if self.units > 0 else max(open_[bar], level)
+        self.fill(bar, -self.units, price, "stoploss")
+        return True
+
+
+def backtest(bars, target=None, policy=None, fee=None, slippage=None, budget=100, stoploss=0, fill="close") -> (pd.Series, pd.DataFrame):
+    '''
+    Return the equity curve and the fills of a strategy simulated against OHLC bars
+
+    The position is rebalanced to target times the equity every time target changes, at the
+    close of that bar or at the open of the next one. With a stop-loss the position is closed
+    at the first bar whose low (high when short) reaches the entry price -/+ stoploss, at the
+    stop price or at the open if it gapped through, and stays closed until target changes.
+
+    :param bars: Data frame with close and optionally open, high, low, or the close prices
+    :param target: Position as a fraction of the equity for every bar (1 long, -1 short, 0.5 half), NaN keeps the previous one
+    :param policy: Policy of a technical strategy, used if target is None
+    :param fee: Fee of a fill given the traded value, PercentFee(0.005) if None
+    :param slippage: Fill price given the price and the traded units, no slippage if None
+    :param float budget: Initial cash
+    :param float stoploss: Maximum percentage loss of a position, 0 to disable
+    :param str fill: close to fill at the close of the signal bar, open at the open of the next bar
+    '''
+    if fill not in ("close", "open"):
+        raise ValueError("fill must be close or open.")
+    index, open_, high, low, close = _columns(bars)
+    if target is None:
+        if policy is None:
+            raise ValueError("Either target or policy is needed.")
+        if isinstance(policy, pd.Series) and not policy.index.equals(index):
+            policy = policy.reindex(index, fill_value=False)
+        target = policy_target(policy)
+    target = _aligned(target, index, 0.0)
+    book = _Book(budget, PercentFee() if fee is None else fee, _no_slippage if slippage is None else slippage)
+    changes = np.flatnonzero(target != np.concatenate(([0.0], target[:-1])))
+    fills = changes + 1 if fill == "open" else changes
+    changes, fills = changes[fills < close.size], fills[fills < close.size]
+    prices = open_[fills] if fill == "open" else close[fills]
+    # first bar where the current position can be stopped
+    start = 0
+    for bar, price, goal in zip(fills.tolist(), prices.tolist(), target[changes].tolist()):
+        book.stop(open_, high, low, start, bar if fill == "open" else bar + 1, stoploss)
+        equity = book.cash + book.units*price
+        book.fill(bar, goal*equity/price - book.units, price, "target")
+        start = bar if fill == "open" else bar + 1
+    book.stop(open_, high, low, start, close.size, stoploss)
+    trades = pd.DataFrame(book.fills, columns=["bar", "units", "price", "fee", "reason", "position", "cash"])
+    trades.index = index[trades.bar.to_numpy(dtype=np.int64)]
+    # cash and position after the last fill of every bar
+    state = np.searchsorted(trades.bar.to_numpy(dtype=np.int64), np.arange(close.size), side="right") - 1
+    cash = np.concatenate(([float(budget)], trades.cash.to_numpy(dtype=np.float64)))[state + 1]
+    units = np.concatenate(([0.0], trades.position.to_numpy(dtype=np.float64)))[state + 1]
+    return pd.Series(cash + units*close, index=index), trades
@@ -0,0 +1,202 @@
+import json
+import os, os.path
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils import instrument
+
+BITSTAMP_URL = "https://www.bitstamp.net/api/v2"
+# Bitstamp allows 8000 requests per 10 minutes
+MAX_RATE = 8000/600
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    '''
+    Thread safe token bucket rate limiter
+
+    :param float rate: Tokens added per second
+    :param int capacity: Maximum burst size
+    '''
+
+    def __init__(self, rate=MAX_RATE, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        Block until a token is available and take it
+        '''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last)*self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens)/self.rate
+            time.sleep(wait_time)
+
+
+class Checkpoint:
+    '''
+    Record of the finished requests of a download, persisted as json so it can be resumed
+
+    :param str path: Checkpoint file
+    :param anchor: Reference of the download (ex first timestamp), kept from the first run when resuming
+    '''
+
+    def __init__(self, path, anchor=None):
+        self.path = path
+        self.anchor = anchor
+        self.done = set()
+        if os.path.isfile(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.anchor = state["anchor"]
+            self.done = set(state["done"])
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def mark(self, keys):
+        '''
+        Mark keys as done and save the checkpoint
+        '''
+        self.done.update(keys)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"anchor": self.anchor, "done": sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        '''
+        Remove the checkpoint once the download is complete
+        '''
+        self.done = set()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+class Downloader:
+    '''
+    Concurrent OHLC downloader with pooled connections, rate limit and retries
+
+    :param str base_url: API url, change it to point to a local server
+    :param auth: Requests authentication
+    :param int workers: Concurrent requests
+    :param float rate: Maximum requests per second
+    :param int retries: Retries per request
+    :param float backoff: Seconds to wait before the first retry, doubled at every retry
+    :param float timeout: Request timeout in seconds
+    '''
+
+    def __init__(self, base_url=BITSTAMP_URL, auth=None, workers=8, rate=MAX_RATE, retries=5, backoff=0.5, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate=rate, capacity=workers)
+        # requests is only needed once downloading
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.auth = auth
+        self.session.headers.update({"Accept": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, currency_pair, step=60, limit=1000, end=None, start=None):
+        '''
+        Download one page of candles, retrying on connection errors and rate limits
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param int step: Seconds step
+        :param int limit: How many steps
+        :param int end: Final timestamp
+        :param int start: First timestamp, used instead of end if given
+        :raise IOError: if the request keeps failing
+        :return: requests.Response
+        '''
+        params = {"step": step, "limit": limit}
+        if start is not None:
+            params["start"] = int(start)
+        elif end is not None:
+            params["end"] = int(end)
+        import requests
+        url = f"{self.base_url}/ohlc/{currency_pair}/"
+        error = None
+        for attempt in range(self.retries + 1):
+            with instrument.timer("downloader.rate_limit"):
+                self.bucket.acquire()
+            try:
+                with instrument.timer("downloader.request"):
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, retry_after = e, None
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    instrument.count("downloader.bytes", len(response.content))
+                    return response
+                error, retry_after = IOError(f"Request failed with status {response.status_code}"), _retry_after(response)
+            instrument.count("downloader.retries")
+            if attempt < self.retries:
+                time.sleep(retry_after if retry_after is not None else self.backoff*2**attempt)
+        raise IOError(f"Request to {url} failed after {self.retries} retries") from error
+
+    def download(self, currency_pair, ends, step=60, limit=1000):
+        '''
+        Download a page for every end timestamp, yielding (end, response) as soon as each one is ready
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param list ends: Final timestamp of every page
+        :param int step: Seconds step
+        :param int limit: How many steps per page
+        '''
+        ends = iter(ends)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = {}
+            # keep a bounded number of requests in flight so pages don't pile up in memory
+            for end in ends:
+                pending[pool.submit(self.fetch, currency_pair, step, limit, end)] = end
+                if len(pending) >= 2*self.workers:
+                    break
+            try:
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        end = pending.pop(future)
+                        response = future.result()
+                        next_end = next(ends, None)
+                        if next_end is not None:
+                            pending[pool.submit(self.fetch, currency_pair, step, limit, next_end)] = next_end
+                        yield end, response
+            finally:
+                # on errors or when closed early, only the running requests are waited for
+                for future in pending:
+                    future.cancel()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,106 @@
+import json
+
+import numpy as np
+
+from utils import instrument
+from utils.store import COLUMNS, DTYPES
+
+
+class OHLCBuffer:
+    '''
+    Typed column buffers filled page by page from API responses
+
+    Every page is parsed straight into preallocated arrays, rows whose timestamp was already
+    ingested are dropped on the way in.
+
+    :param int capacity: Rows to preallocate, the buffer grows if more rows arrive
+    '''
+
+    def __init__(self, capacity=0):
+        self.columns = {column: np.empty(capacity, dtype=DTYPES[column]) for column in COLUMNS}
+        self.size = 0
+        # first timestamp, last timestamp, offset and rows of every ingested page
+        self.pages = np.empty((16, 4), dtype=np.int64)
+        self.n_pages = 0
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, rows):
+        capacity = self.columns["timestamp"].size
+        if self.size + rows <= capacity:
+            return
+        capacity = max(self.size + rows, 2*capacity)
+        for column, values in self.columns.items():
+            grown = np.empty(capacity, dtype=DTYPES[column])
+            grown[:self.size] = values[:self.size]
+            self.columns[column] = grown
+
+    def add(self, ohlc):
+        '''
+        Ingest a page of candles
+
+        :param list ohlc: Candles as returned by Bitstamp, dictionaries of strings
+        :return: Number of new rows
+        '''
+        rows = len(ohlc)
+        if rows == 0:
+            return 0
+        self._reserve(rows)
+        start = self.size
+        stop = start + rows
+        for column in COLUMNS:
+            self.columns[column][start:stop] = [candle[column] for candle in ohlc]
+        timestamp = self.columns["timestamp"][start:stop]
+        keep = np.ones(rows, dtype=bool)
+        if rows > 1 and not (np.diff(timestamp) > 0).all():
+            keep[:] = False
+            keep[np.unique(timestamp, return_index=True)[1]] = True
+        first, last = timestamp.min(), timestamp.max()
+        pages = self.pages[:self.n_pages]
+        overlapping = pages[(pages[:, 0] <= last) & (pages[:, 1] >= first)]
+        for _, _, offset, count in overlapping:
+            keep &= ~np.isin(timestamp, self.columns["timestamp"][offset:offset + count])
+        kept = int(keep.sum())
+        if kept < rows:
+            for values in self.columns.values():
+                values[start:start + kept] = values[start:stop][keep]
+        if kept:
+            timestamp = self.columns["timestamp"][start:start + kept]
+            if self.n_pages == self.pages.shape[0]:
+                self.pages = np.concatenate([self.pages, np.empty_like(self.pages)])
+            self.pages[self.n_pages] = timestamp.min(), timestamp.max(), start, kept
+            self.n_pages += 1
+        self.size += kept
+        instrument.count("ingest.rows", kept)
+        instrument.count("ingest.duplicates", rows - kept)
+        return kept
+
+    def add_response(self, response):
+        '''
+        Ingest a Bitstamp OHLC response
+
+        :param response: requests.Response or raw json bytes
+        :return: Number of new rows
+        '''
+        content = getattr(response, "content", response)
+        instrument.count("ingest.bytes", len(content))
+        return self.add(json.loads(content)["data"]["ohlc"])
+
+    def arrays(self):
+        '''
+        Return the ingested columns sorted by timestamp, views on the buffer when already sorted
+        '''
+        columns = {column: values[:self.size] for column, values in self.columns.items()}
+        timestamp = columns["timestamp"]
+        if timestamp.size > 1 and not (np.diff(timestamp) > 0).all():
+            order = np.argsort(timestamp, kind="stable")
+            columns = {column: values[order] for column, values in columns.items()}
+        return columns
+
+    def clear(self):
+        '''
+        Empty the buffer keeping the allocated memory
+        '''
+        self.size = 0
+        self.n_pages = 0
@@ -0,0 +1,236 @@
+import functools
+import re
+import sys
+import threading
+import time
+
+# Opt-in timers and counters around the hot paths. Functions decorated with timed are left
+# untouched until enable sets their timing wrapper on their module or class, and disable
+# puts them back, so a disabled hook costs nothing. timer and count check a flag and are
+# meant for blocks slower than a microsecond, like a request or a page.
+#
+#     instrument.enable()
+#     technical.ultimate(df.close, df.low, df.high, strategy=True)
+#     print(instrument.report())
+#     print(instrument.prometheus())
+
+
+class _State:
+    enabled = False
+
+
+_state = _State()
+_lock = threading.Lock()
+# name: [calls, total seconds, min seconds, max seconds]
+_timers = {}
+# name: [events, total]
+_counters = {}
+# (function, its timing wrapper) of every timed function
+_hooks = []
+
+
+def enable():
+    '''
+    Start recording the timers and counters
+    '''
+    _state.enabled = True
+    for function, wrapper in _hooks:
+        _install(function, wrapper)
+
+
+def disable():
+    '''
+    Stop recording, the recorded stats are kept
+    '''
+    _state.enabled = False
+    for function, wrapper in _hooks:
+        _install(wrapper, function)
+
+
+def is_enabled() -> bool:
+    return _state.enabled
+
+
+def reset():
+    '''
+    Drop the recorded stats
+    '''
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def record(name: str, seconds: float):
+    '''
+    Add a call of seconds to the timer name
+    '''
+    with _lock:
+        stats = _timers.get(name)
+        if stats is None:
+            _timers[name] = [1, seconds, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds < stats[2]:
+                stats[2] = seconds
+            if seconds > stats[3]:
+                stats[3] = seconds
+
+
+def count(name: str, value=1):
+    '''
+    Add value to the counter name, as one event, if enabled
+
+    :param str name: Counter (ex downloader.bytes)
+    :param value: Amount of the event (ex bytes of a response)
+    '''
+    if not _state.enabled:
+        return
+    with _lock:
+        stats = _counters.get(name)
+        if stats is None:
+            _counters[name] = [1, value]
+        else:
+            stats[0] += 1
+            stats[1] += value
+
+
+class _Timer:
+    __slots__ = ("name", "begin")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.begin)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullTimer()
+
+
+def timer(name: str):
+    '''
+    Return a context manager timing its block under name, if enabled
+
+        with instrument.timer("downloader.request"):
+            ...
+
+    :param str name: Timer (ex technical.getpolicy)
+    '''
+    return _Timer(name) if _state.enabled else _NULL
+
+
+def _install(current, replacement):
+    '''
+    Replace current with replacement on the module or class it is defined in, if it is still there
+    '''
+    owner = sys.modules.get(current.__module__)
+    *path, attribute = current.__qualname__.split(".")
+    for part in path:
+        owner = getattr(owner, part, None)
+    if owner is not None and vars(owner).get(attribute) is current:
+        setattr(owner, attribute, replacement)
+
+
+def timed(name: str):
+    '''
+    Decorator timing every call of a function under name once enabled
+
+    The function must be reached through its module or class (technical.getpolicy, env.step),
+    references taken with from ... import keep the untimed function.
+
+    :param str name: Timer (ex technical.getpolicy)
+    '''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return function(*args, **kwargs)
+            begin = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - begin)
+        _hooks.append((function, wrapper))
+        return wrapper if _state.enabled else function
+    return decorator
+
+
+def stats() -> dict:
+    '''
+    Return a copy of the timers, {name: (calls, seconds, min, max)}, and of the counters, {name: (events, total)}
+    '''
+    with _lock:
+        return {
+            "timers": {name: tuple(values) for name, values in _timers.items()},
+            "counters": {name: tuple(values) for name, values in _counters.items()},
+        }
+
+
+def report():
+    '''
+    Return a DataFrame with one row per timer and counter, sorted by name: the calls or
+    events, their total (seconds for timers), mean, min and max, and the calls per second
+    of the timers
+    '''
+    import pandas as pd
+    recorded = stats()
+    rows = []
+    for name, (calls, total, low, high) in recorded["timers"].items():
+        rows.append({"name": name, "kind": "timer", "count": calls, "total": total, "mean": total/calls, "min": low, "max": high, "per_second": calls/total if total > 0 else float("nan")})
+    for name, (events, total) in recorded["counters"].items():
+        rows.append({"name": name, "kind": "counter", "count": events, "total": total, "mean": total/events})
+    columns = ["kind", "count", "total", "mean", "min", "max", "per_second"]
+    if not rows:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="name"))
+    return pd.DataFrame(rows).set_index("name").sort_index().reindex(columns=columns)
+
+
+def _metric(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def prometheus(prefix="cryptotrading") -> str:
+    '''
+    Return the stats in the Prometheus text exposition format, every timer as
+    {prefix}_{name}_seconds summary and every counter as {prefix}_{name}_total
+
+    :param str prefix: Prefix of the metric names
+    '''
+    recorded = stats()
+    lines = []
+    for name, (calls, total, _, high) in sorted(recorded["timers"].items()):
+        metric = f"{prefix}_{_metric(name)}_seconds"
+        lines += [
+            f"# HELP {metric} Time spent in {name}",
+            f"# TYPE {metric} summary",
+            f"{metric}_count {calls}",
+            f"{metric}_sum {float(total)!r}",
+            f"# TYPE {metric}_max gauge",
+            f"{metric}_max {float(high)!r}",
+        ]
+    for name, (events, total) in sorted(recorded["counters"].items()):
+        metric = f"{prefix}_{_metric(name)}"
+        lines += [
+            f"# HELP {metric}_total Total of {name}",
+            f"# TYPE {metric}_total counter",
+            f"{metric}_total {float(total)!r}",
+            f"# TYPE {metric}_events_total counter",
+            f"{metric}_events_total {events}",
+        ]
+    return "\n".join(lines) + "\n" if lines else ""
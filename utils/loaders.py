@@ -1,25 +1,49 @@
 import os, os.path
+from contextlib import closing
 
-import pandas as pd
-from requests.auth import HTTPBasicAuth
-from tqdm.auto import tqdm
-
-import requests
 import time
 import datetime
 
-from apikeys import key
+from utils import compact, instrument, panel, resample, sync
+from utils.downloader import Checkpoint, Downloader
+from utils.ingest import OHLCBuffer
+from utils.store import OHLCStore
+
+# requests, tqdm and the API key are only loaded by the functions calling Bitstamp, so the
+# offline loaders work without them
+
+# Environment variable with the Bitstamp API key, read before apikeys/key.py
+APIKEY_ENV = "BITSTAMP_APIKEY"
+
+def apikey():
+    '''
+    Return the Bitstamp API key of the BITSTAMP_APIKEY environment variable or of apikeys/key.py
+
+    :raise FileNotFoundError: if neither is set
+    '''
+    if os.environ.get(APIKEY_ENV):
+        return os.environ[APIKEY_ENV]
+    try:
+        from apikeys import key
+    except ImportError:
+        raise FileNotFoundError(f"Can't find the Bitstamp API key, set {APIKEY_ENV} or create apikeys/key.py.") from None
+    return key.apikey
 
-def currency_pair_exists(currency_pair):
+def _auth():
+    from requests.auth import HTTPBasicAuth
+    return HTTPBasicAuth('apikey', apikey())
+
+def currency_pair_exists(currency_pair, downloader=None):
     '''
     Check if currenct pair exists
 
     :param str currency_pair: Currency pair (ex btcusd)
+    :param Downloader downloader: Downloader of the request, a new one to Bitstamp if None
     '''
-    url = f"https://www.bitstamp.net/api/v2/ohlc/{currency_pair}/?step=60&limit=1"
-    headers = {"Accept": "application/json"}
-    auth = HTTPBasicAuth('apikey', key.apikey)
-    response = requests.get(url, headers=headers , auth=auth)
+    if downloader is None:
+        with Downloader(auth=_auth(), workers=1) as downloader:
+            return currency_pair_exists(currency_pair, downloader=downloader)
+    response = downloader.fetch(currency_pair, step=60, limit=1)
     if response.text == "":
         return False
     try:
@@ -45,86 +69,168 @@ def get_data(currency_pair, end=None, start=None, step=60, limit=1000):
     url = f"https://www.bitstamp.net/api/v2/ohlc/{currency_pair}/?step={step}&limit={limit}&end={end}"
     if start:
         url = f"https://www.bitstamp.net/api/v2/ohlc/{currency_pair}/?step={step}&limit={limit}&start={start}"
+    import requests
     headers = {"Accept": "application/json"}
-    auth = HTTPBasicAuth('apikey', key.apikey)
 
-    return requests.get(url, headers=headers , auth=auth)
+    with instrument.timer("loaders.get_data"):
+        response = requests.get(url, headers=headers , auth=_auth())
+    instrument.count("loaders.get_data.bytes", len(response.content))
+    return response
 
-def check_availability(currency_pair):
+def check_availability(currency_pair, step=60):
     '''
     Return first and last available dates on dataset for currency_pair and dataset if available
 
+    Pickles from the old database/{currency_pair}.pkl layout are migrated to the store on first access.
+
     :param str currency_pair: Currency pair (ex btcusd)
+    :param int step: Seconds step
     :raise ValueError: if currency_pair not in database
     '''
-    path = f"database/{currency_pair}.pkl"
-    if not os.path.isfile(path):
-        raise ValueError("Currency pair not found in the database")
-    df = pd.read_pickle(path)
+    store = _open_store(currency_pair, step)
+    df = store.read(currency_pair, step=step)
     return df.index[0], df.index[-1], df
 
-def populate_dataset(currency_pair, step=60, limit=1000, n_requests=100):
+def load_panel(currency_pairs, step=60, start=None, end=None, how="outer"):
     '''
-    Populate dataset for currency_pair
+    Return the candles of several currency pairs aligned on their timestamps, see utils.panel
+
+    :param list currency_pairs: Currency pairs (ex [btcusd, ethusd])
+    :param int step: Seconds step
+    :param int start: First timestamp (seconds), None for the beginning
+    :param int end: Last timestamp (seconds), None for the end
+    :param str how: outer to keep every timestamp, inner only the ones of all the pairs
+    :raise ValueError: if a currency pair not in database
+    '''
+    for currency_pair in currency_pairs:
+        # migrates the pickles of the old layout
+        _open_store(currency_pair, step)
+    return panel.load(OHLCStore("database"), list(currency_pairs), start=start, end=end, step=step, how=how)
+
+def load_candles(currency_pair, step=60, start=None, end=None, dtype="float32"):
+    '''
+    Return the candles of currency_pair as compact float32 or float64 arrays, see utils.compact
 
     :param str currency_pair: Currency pair (ex btcusd)
+    :param int step: Seconds step
+    :param int start: First timestamp (seconds), None for the beginning
+    :param int end: Last timestamp (seconds), None for the end
+    :param str dtype: float32 or float64 for the prices
+    :raise ValueError: if currency_pair not in database
+    '''
+    store = _open_store(currency_pair, step)
+    return compact.load(store, currency_pair, start=start, end=end, step=step, dtype=dtype)
+
+def _open_store(currency_pair, step=60):
+    '''
+    Return the database store, migrating the currency_pair pickle if needed
+
+    :param str currency_pair: Currency pair (ex btcusd)
+    :param int step: Seconds step
+    '''
+    store = OHLCStore("database")
+    if not store.exists(currency_pair, step) and os.path.isfile(f"database/{currency_pair}.pkl"):
+        store.migrate_pickle(currency_pair, step=step)
+    return store
+
+def populate_dataset(currency_pair, step=60, limit=1000, n_requests=100, workers=8, flush_every=100, downloader=None):
+    '''
+    Populate dataset for currency_pair
+
+    Requests run concurrently under the API rate limit, finished pages are saved every
+    flush_every requests so an interrupted download resumes where it stopped. Timeframes
+    materialized with utils.resample are brought up to date at the end.
+
+    :param currency_pair: Currency pair (ex btcusd) or list of pairs
     :param int step: Seconds step, 60, 180, 300, 900, 1800, 3600, 7200, 14400, 21600, 43200, 86400, 259200
     :param int limit: How many steps
-    :param int n_requests: How many requests, max 8000 per 10 minutes
+    :param int n_requests: How many requests per pair, max 8000 per 10 minutes
+    :param int workers: Concurrent requests of the new downloader
+    :param int flush_every: Requests between saves to the database
+    :param Downloader downloader: Downloader of the requests (ex to a local server), a new one to Bitstamp if None
     '''
-    if not currency_pair_exists(currency_pair):
+    if downloader is None:
+        # threads and session are released on errors and interruptions too
+        with Downloader(auth=_auth(), workers=workers) as downloader:
+            return populate_dataset(currency_pair, step=step, limit=limit, n_requests=n_requests, flush_every=flush_every, downloader=downloader)
+    if not isinstance(currency_pair, str):
+        for pair in currency_pair:
+            populate_dataset(pair, step=step, limit=limit, n_requests=n_requests, flush_every=flush_every, downloader=downloader)
+        return
+    if not currency_pair_exists(currency_pair, downloader=downloader):
         raise ValueError("This currency pair is not available to download.")
     if not os.path.isdir('database'):
         if os.path.isdir('../database'):
             os.chdir("..")
         else:
             raise FileNotFoundError("Can't find database folder, you are in the wrong folder.") 
-    try:
-        start, _, old_df = check_availability(currency_pair)
-    except ValueError:
-        print("Currency pair not found in the database, creating new dataset...")
-        start = datetime.datetime.strptime("15/02/2021", "%d/%m/%Y")
-        old_df = pd.DataFrame([])
-    datas = [get_data(
-        currency_pair=currency_pair,
-        step=step, 
-        limit=limit, 
-        end=(start - datetime.timedelta(seconds=step*limit)*i).strftime("%d/%m/%Y %H %M %S")) 
-            for i in tqdm(range(n_requests))]
-    df = pd.concat([pd.DataFrame(data.json()["data"]["ohlc"]) for data in reversed(datas)]).astype(float)
-    df.timestamp = df.timestamp.astype(int)
-    df.index = pd.to_datetime(df.timestamp, unit='s')
-    df_complete = pd.concat([df, old_df])
-    df_complete.to_pickle(f"database/{currency_pair}.pkl")
-
-def update_dataset(currency_pair, step=60, limit=1000, n_requests=100):
-    '''
-    Update dataset for currency_pair
+    store = _open_store(currency_pair, step)
+    checkpoint = Checkpoint(f"database/{currency_pair}_{step}.checkpoint.json")
+    if checkpoint.anchor is None:
+        try:
+            checkpoint.anchor, _ = store.bounds(currency_pair, step=step)
+        except ValueError:
+            print("Currency pair not found in the database, creating new dataset...")
+            checkpoint.anchor = int(datetime.datetime.strptime("15/02/2021", "%d/%m/%Y").timestamp())
+    ends = [checkpoint.anchor - step*limit*i for i in range(n_requests)]
+    ends = [end for end in ends if end not in checkpoint]
+    from tqdm.auto import tqdm
+    buffer = OHLCBuffer(capacity=min(flush_every, len(ends))*limit)
+    coverage = sync.Coverage.open(store, currency_pair, step=step)
+    done = []
+    with closing(downloader.download(currency_pair, ends, step=step, limit=limit)) as pages:
+        for end, data in tqdm(pages, total=len(ends)):
+            buffer.add_response(data)
+            done.append(end)
+            if len(done) >= flush_every:
+                _save_pages(store, currency_pair, step, limit, buffer, coverage, done)
+                checkpoint.mark(done)
+                done = []
+    if done:
+        _save_pages(store, currency_pair, step, limit, buffer, coverage, done)
+    checkpoint.clear()
+    resample.refresh(store, currency_pair, source_step=step)
 
-    :param str currency_pair: Currency pair (ex btcusd)
+def _save_pages(store, currency_pair, step, limit, buffer, coverage, ends):
+    '''
+    Append the buffered pages to the store and mark them in the coverage index
+    '''
+    store.append(currency_pair, buffer.arrays(), step=step)
+    buffer.clear()
+    for end in ends:
+        coverage.add(end - (limit - 1)*step, end)
+    coverage.save()
+
+def update_dataset(currency_pair, step=60, limit=1000, n_requests=100, downloader=None):
+    '''
+    Update dataset for currency_pair and the timeframes materialized with utils.resample
+
+    Every gap since the first stored candle is downloaded, see utils.sync.
+
+    :param currency_pair: Currency pair (ex btcusd) or list of pairs
     :param int step: Seconds step, 60, 180, 300, 900, 1800, 3600, 7200, 14400, 21600, 43200, 86400, 259200
     :param int limit: How many steps
-    :param int n_requests: How many requests, max 8000 per 10 minutes
+    :param int n_requests: How many requests per pair, max 8000 per 10 minutes
+    :param Downloader downloader: Downloader of the requests (ex to a local server), a new one to Bitstamp if None
+    :return: Coverage report of the dataset, a dictionary of reports for a list of pairs
     '''
-    if not currency_pair_exists(currency_pair):
+    if downloader is None:
+        with Downloader(auth=_auth()) as downloader:
+            return update_dataset(currency_pair, step=step, limit=limit, n_requests=n_requests, downloader=downloader)
+    if not isinstance(currency_pair, str):
+        return {pair: update_dataset(pair, step=step, limit=limit, n_requests=n_requests, downloader=downloader) for pair in currency_pair}
+    if not currency_pair_exists(currency_pair, downloader=downloader):
         raise ValueError("This currency pair is not available to download.")
     if not os.path.isdir('database'):
         if os.path.isdir('../database'):
             os.chdir("..")
         else:
             raise FileNotFoundError("Can't find database folder, you are in the wrong folder.") 
-    try:
-        _, end, old_df = check_availability(currency_pair)
-    except ValueError:
+    store = _open_store(currency_pair, step)
+    if not store.exists(currency_pair, step):
         print("Currency pair not found in the database, impossible to update.")
-        raise
-    data = get_data(
-        currency_pair=currency_pair,
-        step=step, 
-        limit=limit, 
-        start=end)
-    df = pd.DataFrame(data.json()["data"]["ohlc"]).astype(float)
-    df.timestamp = df.timestamp.astype(int)
-    df.index = pd.to_datetime(df.timestamp, unit='s')
-    df_complete = pd.concat([old_df, df])
-    df_complete.to_pickle(f"database/{currency_pair}.pkl")
\ No newline at end of file
+        raise ValueError("Currency pair not found in the database")
+    report = sync.sync(store, currency_pair, downloader, step=step, limit=limit, max_requests=n_requests)
+    # buckets of the filled gaps are aggregated again, not only the new ones
+    resample.refresh(store, currency_pair, source_step=step, spans=report["spans"])
+    return report
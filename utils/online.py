@@ -0,0 +1,225 @@
+import copy
+
+import numpy as np
+
+# Online versions of the technical indicators, fed one candle at a time.
+# Windows keep the block layout of utils.rolling: the scan of the last complete block plus a
+# running scan of the current one, so every update is O(1) amortized and the values are
+# exactly the ones of the batch functions on the same candles.
+
+
+class _Online:
+    '''
+    Base class with snapshot and restore of the indicator state
+    '''
+
+    def snapshot(self) -> dict:
+        '''
+        Return a copy of the indicator state
+        '''
+        return copy.deepcopy(self.__dict__)
+
+    def restore(self, state: dict):
+        '''
+        Restore a state returned by snapshot
+        '''
+        self.__dict__.update(copy.deepcopy(state))
+        return self
+
+
+class _Window(_Online):
+    '''
+    Rolling op over the last window values, NaN until the window is full
+    '''
+
+    def __init__(self, window, op, fill):
+        self.window = window
+        self.op = op
+        self.fill = fill
+        self.block = np.empty(window)
+        self.suffix = None
+        self.prefix = fill
+        self.count = 0
+
+    def update(self, value):
+        offset = self.count % self.window
+        self.block[offset] = value
+        self.count += 1
+        if offset == self.window - 1:
+            # the block is complete, its suffix is the first half of the next windows
+            self.suffix = self.op.accumulate(self.block[::-1])[::-1]
+            self.prefix = self.fill
+            return float(self.op(self.suffix[0], self.fill))
+        self.prefix = self.op(self.prefix, value)
+        if self.suffix is None:
+            return np.nan
+        return float(self.op(self.suffix[offset + 1], self.prefix))
+
+
+def _sum(window):
+    return _Window(window, np.add, 0.0)
+
+
+class OnlineMACD(_Online):
+    '''
+    Online technical.macd
+
+    :param int long: Long moving average length
+    :param int short: Short moving average length
+    '''
+
+    def __init__(self, long: int, short: int):
+        self.long = _sum(long)
+        self.short = _sum(short)
+        self.value = np.nan
+
+    def update(self, candle) -> float:
+        '''
+        Add a candle and return the MACD
+
+        :param candle: Mapping with close
+        '''
+        close = float(candle["close"])
+        self.value = self.short.update(close)/self.short.window - self.long.update(close)/self.long.window
+        return self.value
+
+
+class OnlineUltimate(_Online):
+    '''
+    Online technical.ultimate, NaN for the first 3*days candles
+
+    :param int days: Days for moving sum
+    '''
+
+    def __init__(self, days=7):
+        self.sums = [(_sum(d), _sum(d)) for d in (days, 2*days, 3*days)]
+        self.previous = np.nan
+        self.value = np.nan
+
+    def update(self, candle) -> float:
+        '''
+        Add a candle and return the Ultimate oscillator
+
+        :param candle: Mapping with close, low, high
+        '''
+        close = float(candle["close"])
+        floor = np.minimum(self.previous, float(candle["low"]))
+        bp = close - floor
+        tr = np.maximum(float(candle["high"]), self.previous) - floor
+        self.previous = close
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg1, avg2, avg3 = (np.float64(bp_sum.update(bp))/tr_sum.update(tr) for bp_sum, tr_sum in self.sums)
+        self.value = float(100 * (4*avg1 + 2*avg2 + avg3)/7)
+        return self.value
+
+
+class OnlineBollingerBands(_Online):
+    '''
+    Online technical.bollinger_bands
+
+    :param int k: How many standard deviations out
+    :param int period: Period for moving average
+    '''
+
+    def __init__(self, k=1, period=1000):
+        self.k = k
+        self.period = period
+        self.block = np.empty(period)
+        self.reference = 0.0
+        self.previous_reference = 0.0
+        self.sum_suffix = None
+        self.square_suffix = None
+        self.sum_prefix = 0.0
+        self.square_prefix = 0.0
+        self.count = 0
+        self.value = (np.nan, np.nan)
+
+    def update(self, candle) -> (float, float):
+        '''
+        Add a candle and return the lower and upper bands
+
+        :param candle: Mapping with close
+        '''
+        close = float(candle["close"])
+        offset = self.count % self.period
+        if offset == 0:
+            self.reference = float(np.nan_to_num(close))
+        centered = close - self.reference
+        self.block[offset] = centered
+        self.count += 1
+        if offset == self.period - 1:
+            self.sum_suffix = np.add.accumulate(self.block[::-1])[::-1]
+            self.square_suffix = np.add.accumulate(np.square(self.block)[::-1])[::-1]
+            self.previous_reference = self.reference
+            self.sum_prefix = self.square_prefix = 0.0
+            self.value = self._bands(0, 0.0)
+            return self.value
+        self.sum_prefix += centered
+        self.square_prefix += centered*centered
+        if self.sum_suffix is not None:
+            self.value = self._bands(offset + 1, self.reference - self.previous_reference)
+        return self.value
+
+    def _bands(self, rows, shift):
+        # same operations as rolling.rolling_mean_var on the window starting at rows
+        sum_prefix, square_prefix = self.sum_prefix, self.square_prefix
+        square_prefix += shift*(2*sum_prefix + rows*shift)
+        sum_prefix += rows*shift
+        sum_suffix = self.sum_suffix[rows] + sum_prefix
+        square_suffix = self.square_suffix[rows] + square_prefix
+        mean = sum_suffix/self.period
+        square_suffix -= sum_suffix*mean
+        mean += self.previous_reference
+        var = np.maximum(square_suffix, 0)/(self.period - 1) if self.period > 1 else np.nan
+        std = np.sqrt(var)
+        return float(mean - std*self.k), float(mean + std*self.k)
+
+
+class OnlineWilliams(_Online):
+    '''
+    Online technical.williams
+
+    :param int days: Days for moving maximum and minimum
+    '''
+
+    def __init__(self, days=10):
+        self.high = _Window(days, np.maximum, -np.inf)
+        self.low = _Window(days, np.minimum, np.inf)
+        self.value = np.nan
+
+    def update(self, candle) -> float:
+        '''
+        Add a candle and return the Williams %R
+
+        :param candle: Mapping with close, low, high
+        '''
+        high_N = np.float64(self.high.update(float(candle["high"])))
+        low_N = self.low.update(float(candle["low"]))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.value = float(-100*(high_N - float(candle["close"]))/(high_N - low_N))
+        return self.value
+
+
+class OnlineMomentum(_Online):
+    '''
+    Online technical.momentum
+
+    :param int period: Days for moving average
+    '''
+
+    def __init__(self, period=10):
+        self.mean = _sum(period)
+        self.previous = np.nan
+        self.value = np.nan
+
+    def update(self, candle) -> float:
+        '''
+        Add a candle and return the Momentum
+
+        :param candle: Mapping with close
+        '''
+        mean = np.float64(self.mean.update(float(candle["close"])))/self.mean.window
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.value = float(mean/self.previous - 1)
+        self.previous = mean
+        return self.value
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from utils.store import COLUMNS, OHLCStore
+
+
+class Panel:
+    '''
+    Candles of several currency pairs aligned on the same timestamps, one (time, pair)
+    float64 array per column with NaN where a pair has no candle
+
+    Columns are also returned as DataFrames with one column per pair, which the indicators
+    of utils.technical compute column-wise: technical.macd(panel.close, 10000, 1000)
+
+    :param np.ndarray timestamp: Sorted int64 timestamps (seconds)
+    :param list pairs: Currency pairs, in the order of the array columns
+    :param dict columns: (time, pair) array of every column (ex close)
+    '''
+
+    def __init__(self, timestamp, pairs, columns):
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)
+        self.pairs = list(pairs)
+        self.columns = columns
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return self.frame(name)
+        raise AttributeError(name)
+
+    def __getitem__(self, column):
+        return self.frame(column)
+
+    def __len__(self):
+        return self.timestamp.size
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return pd.to_datetime(self.timestamp, unit='s')
+
+    def frame(self, column: str) -> pd.DataFrame:
+        '''
+        Return column as a DataFrame indexed by date with one column per pair, sharing the array
+
+        :param str column: Column (ex close)
+        '''
+        return pd.DataFrame(self.columns[column], index=self.index, columns=self.pairs, copy=False)
+
+    def pair(self, currency_pair: str) -> pd.DataFrame:
+        '''
+        Return the candles of currency_pair like OHLCStore.read, without the missing rows
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        '''
+        column = self.pairs.index(currency_pair)
+        keep = ~np.isnan(self.columns["close"][:, column])
+        df = pd.DataFrame({"timestamp": self.timestamp[keep]})
+        for name, values in self.columns.items():
+            df[name] = values[keep, column]
+        df.index = pd.to_datetime(df.timestamp, unit='s')
+        return df
+
+    def fill(self) -> "Panel":
+        '''
+        Return a panel where missing candles repeat the previous close with no volume,
+        rows before the first candle of a pair stay NaN
+        '''
+        close = self.columns["close"]
+        rows = np.arange(close.shape[0])[:, None]
+        last = np.maximum.accumulate(np.where(np.isnan(close), -1, rows), axis=0)
+        filled = np.where(last >= 0, np.take_along_axis(close, np.maximum(last, 0), axis=0), np.nan)
+        missing = np.isnan(close)
+        columns = {}
+        for name, values in self.columns.items():
+            if name == "volume":
+                columns[name] = np.where(missing & (last >= 0), 0.0, values)
+            else:
+                columns[name] = np.where(missing, filled, values)
+        return Panel(self.timestamp, self.pairs, columns)
+
+
+def _align(arrays, how):
+    '''
+    Return the panel of the column arrays of every pair, on the union (outer) or the
+    intersection (inner) of their timestamps
+    '''
+    if how not in ("outer", "inner"):
+        raise ValueError("how must be outer or inner.")
+    timestamps = [np.asarray(data["timestamp"], dtype=np.int64) for data in arrays.values()]
+    if not timestamps:
+        timestamp = np.empty(0, dtype=np.int64)
+    elif how == "outer":
+        timestamp = np.unique(np.concatenate(timestamps))
+    else:
+        timestamp = timestamps[0]
+        for other in timestamps[1:]:
+            timestamp = np.intersect1d(timestamp, other, assume_unique=True)
+    names = [column for column in next(iter(arrays.values()), {}) if column != "timestamp"]
+    columns = {name: np.full((timestamp.size, len(arrays)), np.nan) for name in names}
+    for column, (data, pair_timestamp) in enumerate(zip(arrays.values(), timestamps)):
+        # rows of the pair in the panel, timestamps are sorted so a single searchsorted
+        rows = np.searchsorted(timestamp, pair_timestamp)
+        keep = rows < timestamp.size
+        keep[keep] = timestamp[rows[keep]] == pair_timestamp[keep]
+        for name in names:
+            columns[name][rows[keep], column] = np.asarray(data[name], dtype=np.float64)[keep]
+    return Panel(timestamp, list(arrays), columns)
+
+
+def load(store: OHLCStore, currency_pairs=None, start=None, end=None, step=60, columns=COLUMNS[1:], how="outer") -> Panel:
+    '''
+    Return the candles of currency_pairs in [start, end] as a Panel
+
+    :param OHLCStore store: Store of the candles
+    :param list currency_pairs: Currency pairs (ex [btcusd, ethusd]), all the pairs of the store if None
+    :param int start: First timestamp (seconds), None for the beginning
+    :param int end: Last timestamp (seconds), None for the end
+    :param int step: Seconds step
+    :param tuple columns: Columns to read
+    :param str how: outer to keep every timestamp, inner only the ones of all the pairs
+    :raise ValueError: if a currency pair is not in store
+    '''
+    if currency_pairs is None:
+        currency_pairs = [pair for pair in store.pairs() if store.exists(pair, step)]
+    arrays = {}
+    for currency_pair in currency_pairs:
+        if not store.exists(currency_pair, step):
+            raise ValueError(f"Currency pair {currency_pair} not found in the database")
+        arrays[currency_pair] = store.read_arrays(currency_pair, start=start, end=end, step=step, columns=columns)
+    return _align(arrays, how)
+
+
+def from_frames(frames: dict, how="outer") -> Panel:
+    '''
+    Return the Panel of DataFrames like OHLCStore.read, one per currency pair
+
+    :param dict frames: DataFrame of every currency pair, with a timestamp column or a DatetimeIndex
+    :param str how: outer to keep every timestamp, inner only the ones of all the pairs
+    :raise ValueError: if the candles of a pair are not sorted or have duplicates
+    '''
+    arrays = {}
+    for currency_pair, df in frames.items():
+        if "timestamp" in df:
+            timestamp = df["timestamp"].to_numpy(dtype=np.int64)
+        else:
+            timestamp = df.index.asi8//10**9
+        if np.any(np.diff(timestamp) <= 0):
+            raise ValueError(f"Candles of {currency_pair} must be sorted without duplicates.")
+        data = {"timestamp": timestamp}
+        data.update((column, df[column].to_numpy(dtype=np.float64)) for column in COLUMNS[1:] if column in df)
+        arrays[currency_pair] = data
+    return _align(arrays, how)
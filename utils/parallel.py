@@ -0,0 +1,132 @@
+import os, os.path
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils import sweep, technical
+
+# Arrays mapped by the current worker process
+_arrays = {}
+
+
+class SharedPrices:
+    '''
+    Price arrays saved once to memory mapped files, worker processes map them read only
+    instead of receiving a pickled copy. Bool and integer arrays keep their type, the
+    others are saved as float64.
+
+    :param dict arrays: Name and values of every array (ex close, low, high)
+    :param str path: Folder for the files, a temporary folder if None
+    '''
+
+    def __init__(self, arrays, path=None):
+        self.owner = path is None
+        self.path = tempfile.mkdtemp(prefix="cryptotrading-") if path is None else path
+        os.makedirs(self.path, exist_ok=True)
+        self.spec = {}
+        for name, values in arrays.items():
+            if isinstance(values, pd.Series):
+                values = values.to_numpy()
+            file = os.path.join(self.path, f"{name}.npy")
+            values = np.asarray(values)
+            np.save(file, np.ascontiguousarray(values, dtype=values.dtype if values.dtype.kind in "bi" else np.float64))
+            self.spec[name] = file
+
+    @staticmethod
+    def attach(spec):
+        '''
+        Map the arrays described by spec read only
+        '''
+        return {name: np.load(file, mmap_mode="r") for name, file in spec.items()}
+
+    def close(self):
+        if self.owner and os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _attach(spec):
+    _arrays.clear()
+    _arrays.update(SharedPrices.attach(spec))
+
+
+def _series():
+    return [pd.Series(_arrays[name]) for name in ("close", "low", "high") if name in _arrays]
+
+
+def _evaluate_task(strategy, params):
+    series = _series()
+    return [getattr(technical, strategy)(*series, **param, winning=True) for param in params]
+
+
+def _sweep_task(strategy, grid, commissions, budget):
+    return sweep.sweep(strategy, _arrays["close"], grid, low=_arrays.get("low"), high=_arrays.get("high"), commissions=commissions, budget=budget)
+
+
+def _shared(close, low, high):
+    for prices in (close, low, high):
+        if isinstance(prices, pd.Series) and prices.index.duplicated().any():
+            raise ValueError("There are some duplicate indexes.")
+    arrays = {"close": close}
+    if low is not None and high is not None:
+        arrays.update(low=low, high=high)
+    return SharedPrices(arrays)
+
+
+def parallel_evaluate(strategy: str, params: list, close, low=None, high=None, workers=None, chunksize=1) -> pd.DataFrame:
+    '''
+    Return the winning of a technical strategy for every parameter set, computed by a pool of processes
+
+    Results are in the order of params whatever the number of workers.
+
+    :param str strategy: Name of a technical function (ex ultimate)
+    :param list params: Dictionaries of keyword arguments for the strategy
+    :param close: Prices of the stock
+    :param low: Low prices, for ultimate and williams
+    :param high: High prices, for ultimate and williams
+    :param int workers: Number of processes, all the cores if None
+    :param int chunksize: Parameter sets sent to a worker at once
+    '''
+    if not hasattr(technical, strategy):
+        raise ValueError(f"Unknown strategy {strategy}.")
+    params = list(params)
+    chunks = [params[i:i + chunksize] for i in range(0, len(params), chunksize)]
+    with _shared(close, low, high) as shared:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(shared.spec,)) as pool:
+            winning = [w for chunk in pool.map(_evaluate_task, [strategy]*len(chunks), chunks) for w in chunk]
+    results = pd.DataFrame(params)
+    results["winning"] = winning
+    return results
+
+
+def parallel_sweep(strategy: str, grid: dict, close, low=None, high=None, workers=None, commissions=0.005, budget=100) -> pd.DataFrame:
+    '''
+    Return sweep.sweep computed by a pool of processes, one task per value of the first parameter
+
+    :param str strategy: One of ultimate, bollinger_bands, williams, macd
+    :param dict grid: Values to try for every parameter
+    :param close: Prices of the stock
+    :param low: Low prices, for ultimate and williams
+    :param high: High prices, for ultimate and williams
+    :param int workers: Number of processes, all the cores if None
+    :param float commissions: Percentage commissions per transaction
+    :param float budget: My budget
+    '''
+    outer = {"ultimate": "days", "williams": "days", "bollinger_bands": "period", "macd": "long"}
+    if strategy not in outer:
+        raise ValueError(f"Unknown strategy {strategy}, must be one of {', '.join(outer)}.")
+    grid = {key: list(np.atleast_1d(value)) for key, value in grid.items()}
+    values = grid.get(outer[strategy])
+    grids = [dict(grid, **{outer[strategy]: [value]}) for value in values] if values else [grid]
+    with _shared(close, low, high) as shared:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(shared.spec,)) as pool:
+            results = list(pool.map(_sweep_task, [strategy]*len(grids), grids, [commissions]*len(grids), [budget]*len(grids)))
+    return pd.concat(results, ignore_index=True)
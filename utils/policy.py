@@ -0,0 +1,143 @@
+import numpy as np
+
+# Buy/sell state machines behind technical.getpolicy, over bool and float arrays.
+# A policy is True at every buy and at every sell, starting with a buy.
+
+# First rows scanned when looking for a mingain or stoploss exit, doubled until found
+SEARCH_ROWS = 1024
+
+
+def edges(signal: np.ndarray) -> np.ndarray:
+    '''
+    Return signal.shift(1) != signal along the rows, the first row is always an edge
+
+    :param np.ndarray signal: Bool signal, 1-D or one signal per column
+    '''
+    signal = np.asarray(signal, dtype=bool)
+    out = np.empty_like(signal)
+    if signal.shape[0]:
+        out[0] = True
+        np.not_equal(signal[1:], signal[:-1], out=out[1:])
+    return out
+
+
+def cycle(buys: np.ndarray, sells: np.ndarray) -> np.ndarray:
+    '''
+    Return the policy buying at the first buy edge, then selling at the next sell edge and so on
+
+    After a buy only edge you hold, after a sell only edge you don't, when both happen together
+    the position flips, so the position is found without a loop and the policy is True where it
+    changes. Works on 2-D arrays with one combination per column.
+
+    :param np.ndarray buys: When buying is possible
+    :param np.ndarray sells: When selling is possible
+    '''
+    buys = np.asarray(buys, dtype=bool)
+    sells = np.asarray(sells, dtype=bool)
+    if buys.shape[0] == 0:
+        return buys.copy()
+    rows = np.arange(buys.shape[0]).reshape((-1,) + (1,)*(buys.ndim - 1))
+    reset = buys ^ sells
+    last_reset = np.maximum.accumulate(np.where(reset, rows, -1), axis=0)
+    started = last_reset >= 0
+    last_reset = np.maximum(last_reset, 0)
+    base = np.take_along_axis(buys, last_reset, axis=0) & started
+    flips = np.cumsum(buys & sells, axis=0)
+    flips -= np.where(started, np.take_along_axis(flips, last_reset, axis=0), 0)
+    holding = base ^ (flips % 2 == 1)
+    policy = np.empty_like(holding)
+    policy[0] = holding[0]
+    np.not_equal(holding[1:], holding[:-1], out=policy[1:])
+    return policy
+
+
+def cycle_checkgain(buys: np.ndarray, sells: np.ndarray, prices: np.ndarray, mingain: float) -> np.ndarray:
+    '''
+    Return the policy of cycle, selling only when the gain is at least mingain
+
+    :param np.ndarray buys: When buying is possible
+    :param np.ndarray sells: When selling is possible
+    :param np.ndarray prices: Prices of the stock
+    :param float mingain: Minimum gain to sell
+    '''
+    buys = np.asarray(buys, dtype=bool)
+    sells = np.asarray(sells, dtype=bool)
+    index = np.flatnonzero(buys | sells)
+    policy = np.zeros(buys.size, dtype=bool)
+    target = 1 + mingain
+    token = True
+    buy_price = 0.0
+    # single pass over the events as python scalars, only their prices are converted
+    for idx, buy, sell, price in zip(index.tolist(), buys[index].tolist(), sells[index].tolist(), np.asarray(prices)[index].astype(np.float64).tolist()):
+        if token and buy:
+            policy[idx] = True
+            buy_price = price
+            token = False
+        elif not token and sell and price/buy_price >= target:
+            policy[idx] = True
+            token = True
+    return policy
+
+
+def cycle_absolutegain(buys: np.ndarray, prices: np.ndarray, mingain: float, stoploss: float) -> np.ndarray:
+    '''
+    Return the policy buying at buy edges and selling at the first price reaching mingain or stoploss
+
+    Prices are compared in float32, the next buy is the first buy edge after the sell.
+
+    :param np.ndarray buys: When buying is possible
+    :param np.ndarray prices: Prices of the stock
+    :param float mingain: Minimum gain to sell, 0 to disable
+    :param float stoploss: Maximum percentage loss, 0 to disable
+    '''
+    index = np.flatnonzero(np.asarray(buys, dtype=bool))
+    prices = np.asarray(prices, dtype=np.float32)
+    policy = np.zeros(prices.size, dtype=bool)
+    i = 0
+    while i < index.size:
+        idx = index[i]
+        policy[idx] = True
+        sell = _first_exit(prices, idx + 1, float(prices[idx]), mingain, stoploss)
+        if sell < 0:
+            break
+        policy[sell] = True
+        i = np.searchsorted(index, sell, side="right")
+    return policy
+
+
+def _first_exit(prices, start, buy_price, mingain, stoploss):
+    '''
+    Return the first row from start reaching mingain or stoploss, -1 if none
+    '''
+    rows = SEARCH_ROWS
+    while start < prices.size:
+        ratio = prices[start:start + rows]/buy_price
+        hit = np.zeros(ratio.size, dtype=bool)
+        if mingain != 0:
+            hit |= ratio >= 1 + mingain
+        if stoploss != 0:
+            hit |= ratio <= 1 - stoploss
+        if hit.any():
+            return start + int(hit.argmax())
+        start += rows
+        rows *= 2
+    return -1
+
+
+def pack(policy) -> np.ndarray:
+    '''
+    Return a bool policy packed 8 rows per byte along the rows, see unpack
+
+    :param policy: Bool policy, 1-D or one policy per column
+    '''
+    return np.packbits(np.asarray(policy, dtype=bool), axis=0)
+
+
+def unpack(bits: np.ndarray, rows: int) -> np.ndarray:
+    '''
+    Return the bool policy of rows rows packed with pack
+
+    :param np.ndarray bits: Packed policy
+    :param int rows: Rows of the policy
+    '''
+    return np.unpackbits(bits, axis=0, count=rows).view(bool)
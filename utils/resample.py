@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from utils.store import COLUMNS, OHLCStore
+
+# Seconds step of the usual timeframes
+TIMEFRAMES = {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "4h": 14400, "1d": 86400}
+
+
+def _seconds(timeframe):
+    if isinstance(timeframe, str):
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe {timeframe}, must be one of {', '.join(TIMEFRAMES)}.")
+        return TIMEFRAMES[timeframe]
+    return int(timeframe)
+
+
+def resample(data, timeframe):
+    '''
+    Aggregate candles sorted by timestamp into candles of timeframe, aligned on multiples of it
+
+    Open is the first open, high the highest high, low the lowest low, close the last close and
+    volume the sum of the volumes of every bucket, timestamp is the start of the bucket.
+    Buckets with missing candles aggregate the ones available.
+
+    :param data: DataFrame (indexed like OHLCStore.read) or dictionary of arrays with timestamp, open, high, low, close, volume
+    :param timeframe: Seconds step or one of TIMEFRAMES (ex 1h)
+    :return: Same type as data
+    '''
+    step = _seconds(timeframe)
+    timestamp = np.asarray(data["timestamp"], dtype=np.int64)
+    bucket = timestamp - timestamp % step
+    if timestamp.size:
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], timestamp.size] - 1
+    else:
+        starts = ends = np.empty(0, dtype=np.int64)
+    columns = {column: np.asarray(data[column], dtype=np.float64) for column in COLUMNS[1:]}
+    out = {
+        "timestamp": bucket[starts],
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts) if starts.size else columns["high"][:0],
+        "low": np.minimum.reduceat(columns["low"], starts) if starts.size else columns["low"][:0],
+        "close": columns["close"][ends],
+        "volume": np.add.reduceat(columns["volume"], starts) if starts.size else columns["volume"][:0],
+    }
+    if isinstance(data, pd.DataFrame):
+        df = pd.DataFrame(out)
+        df.index = pd.to_datetime(df.timestamp, unit='s')
+        return df
+    return out
+
+
+def materialize(store: OHLCStore, currency_pair: str, timeframe, source_step=60, spans=None) -> int:
+    '''
+    Aggregate the candles of source_step into the store at timeframe, incrementally
+
+    Only the candles from the last stored bucket on are aggregated, the last bucket is
+    recomputed since it may have been incomplete. Everything is aggregated again if the
+    source now starts before the first stored bucket. Candles written before the last stored
+    bucket (ex a filled gap) are only aggregated again if their spans are given.
+
+    :param OHLCStore store: Store of the candles
+    :param str currency_pair: Currency pair (ex btcusd)
+    :param timeframe: Seconds step or one of TIMEFRAMES (ex 1h)
+    :param int source_step: Seconds step of the candles to aggregate
+    :param list spans: (first, last) timestamps of source_step candles written since the last call, every bucket they overlap is aggregated again
+    :raise ValueError: if currency_pair not in store at source_step
+    :return: Number of buckets written
+    '''
+    step = _seconds(timeframe)
+    if step % source_step:
+        raise ValueError("timeframe must be a multiple of source_step.")
+    first, _ = store.bounds(currency_pair, step=source_step)
+    start = None
+    if store.exists(currency_pair, step):
+        stored_first, stored_last = store.bounds(currency_pair, step=step)
+        if first >= stored_first:
+            start = stored_last
+    written = 0
+    if start is not None and spans:
+        # buckets of the spans before the tail, merged so none is aggregated twice
+        buckets = []
+        for span_first, span_last in sorted(spans):
+            bucket_first, bucket_last = span_first - span_first % step, span_last - span_last % step
+            if bucket_first >= start:
+                continue
+            bucket_last = min(bucket_last, start - step)
+            if buckets and bucket_first <= buckets[-1][1] + step:
+                buckets[-1][1] = max(buckets[-1][1], bucket_last)
+            else:
+                buckets.append([bucket_first, bucket_last])
+        for bucket_first, bucket_last in buckets:
+            candles = resample(store.read_arrays(currency_pair, start=bucket_first, end=bucket_last + step - 1, step=source_step), step)
+            written += store.append(currency_pair, candles, step=step)
+    candles = resample(store.read_arrays(currency_pair, start=start, step=source_step), step)
+    return written + store.append(currency_pair, candles, step=step)
+
+
+def refresh(store: OHLCStore, currency_pair: str, source_step=60, spans=None) -> dict:
+    '''
+    Materialize again every timeframe of currency_pair already in the store
+
+    :param OHLCStore store: Store of the candles
+    :param str currency_pair: Currency pair (ex btcusd)
+    :param int source_step: Seconds step of the candles to aggregate
+    :param list spans: (first, last) timestamps of the candles written since the last refresh, see materialize
+    :return: Buckets written for every step
+    '''
+    return {step: materialize(store, currency_pair, step, source_step=source_step, spans=spans) for step in store.steps(currency_pair) if step > source_step and step % source_step == 0}
+
+
+def read(store: OHLCStore, currency_pair: str, timeframe, start=None, end=None, source_step=60) -> pd.DataFrame:
+    '''
+    Return the candles of timeframe in [start, end], materializing the new ones first
+
+    :param OHLCStore store: Store of the candles
+    :param str currency_pair: Currency pair (ex btcusd)
+    :param timeframe: Seconds step or one of TIMEFRAMES (ex 1h)
+    :param int start: First timestamp (seconds), None for the beginning
+    :param int end: Last timestamp (seconds), None for the end
+    :param int source_step: Seconds step of the candles to aggregate
+    '''
+    step = _seconds(timeframe)
+    if step != source_step:
+        materialize(store, currency_pair, step, source_step=source_step)
+    return store.read(currency_pair, start=start, end=end, step=step)
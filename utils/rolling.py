@@ -0,0 +1,185 @@
+import numpy as np
+
+from utils import instrument
+
+# Rolling window kernels over float64 arrays, along the first axis for 2-D arrays.
+# Rows are cut in blocks of window rows, the window starting at row b*window + o is the
+# suffix of block b from o plus the first o rows of block b + 1. Both halves come from one
+# forward and one backward scan inside every block, so every kernel is O(n) whatever the
+# window (van Herk/Gil-Werman). The first window - 1 rows are NaN and a NaN in a window
+# gives NaN, like pandas rolling.
+
+
+def _as_2d(values):
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return values[:, None], values.shape
+    return values, values.shape
+
+
+def _blocks(values, window, fill):
+    '''
+    Return values as (blocks, window, columns), padded with fill up to one block past the last window
+    '''
+    n, columns = values.shape
+    blocks = n//window + 1
+    padded = np.full((blocks*window, columns), fill, dtype=np.float64)
+    padded[:n] = values
+    return padded.reshape(blocks, window, columns)
+
+
+def _halves(blocks, op, fill):
+    '''
+    Return op over the suffix and over the prefix of every window, as (blocks - 1, window, columns)
+    '''
+    suffix = op.accumulate(blocks[:-1, ::-1], axis=1)[:, ::-1]
+    prefix = np.empty(suffix.shape)
+    prefix[:, 0] = fill
+    if blocks.shape[1] > 1:
+        op.accumulate(blocks[1:, :-1], axis=1, out=prefix[:, 1:])
+    return suffix, prefix
+
+
+def _unblock(windows, n, window, shape):
+    out = np.full((n, windows.shape[2]), np.nan)
+    out[window - 1:] = windows.reshape(-1, windows.shape[2])[:n - window + 1]
+    return out.reshape(shape)
+
+
+def _check_window(window):
+    '''
+    Raise ValueError if window is not a positive number of rows
+    '''
+    if window < 1:
+        raise ValueError("window must be at least 1.")
+
+
+def _extreme(values, window, op, fill):
+    _check_window(window)
+    values, shape = _as_2d(values)
+    n = values.shape[0]
+    if window > n:
+        return np.full(shape, np.nan)
+    suffix, prefix = _halves(_blocks(values, window, fill), op, fill)
+    return _unblock(op(suffix, prefix, out=prefix), n, window, shape)
+
+
+@instrument.timed("rolling.rolling_max")
+def rolling_max(values, window: int) -> np.ndarray:
+    '''
+    Return the rolling maximum
+
+    :param np.ndarray values: Values, 1-D or 2-D with one series per column
+    :param int window: Window length
+    '''
+    return _extreme(values, window, np.maximum, -np.inf)
+
+
+@instrument.timed("rolling.rolling_min")
+def rolling_min(values, window: int) -> np.ndarray:
+    '''
+    Return the rolling minimum
+
+    :param np.ndarray values: Values, 1-D or 2-D with one series per column
+    :param int window: Window length
+    '''
+    return _extreme(values, window, np.minimum, np.inf)
+
+
+@instrument.timed("rolling.rolling_sum")
+def rolling_sum(values, window: int) -> np.ndarray:
+    '''
+    Return the rolling sum
+
+    :param np.ndarray values: Values, 1-D or 2-D with one series per column
+    :param int window: Window length
+    '''
+    return _extreme(values, window, np.add, 0)
+
+
+def rolling_mean(values, window: int) -> np.ndarray:
+    '''
+    Return the rolling mean
+
+    :param np.ndarray values: Values, 1-D or 2-D with one series per column
+    :param int window: Window length
+    '''
+    return rolling_sum(values, window)/window
+
+
+@instrument.timed("rolling.rolling_mean_var")
+def rolling_mean_var(values, window: int, ddof=1) -> (np.ndarray, np.ndarray):
+    '''
+    Return the rolling mean and variance in a single pass
+
+    Sums are taken around the first value of every block and the prefix half is moved to the
+    suffix reference before merging, which avoids the cancellation of the plain sum of squares
+    formula on large prices.
+
+    :param np.ndarray values: Values, 1-D or 2-D with one series per column
+    :param int window: Window length
+    :param int ddof: Delta degrees of freedom, 1 like pandas
+    '''
+    _check_window(window)
+    values, shape = _as_2d(values)
+    n = values.shape[0]
+    if window > n:
+        return np.full(shape, np.nan), np.full(shape, np.nan)
+    blocks = _blocks(values, window, 0)
+    reference = np.nan_to_num(blocks[:, :1])
+    blocks -= reference
+    sum_suffix, sum_prefix = _halves(blocks, np.add, 0)
+    np.square(blocks, out=blocks)
+    square_suffix, square_prefix = _halves(blocks, np.add, 0)
+    del blocks
+    # prefix rows and reference change of every window
+    rows = np.arange(window, dtype=np.float64)[:, None]
+    shift = reference[1:] - reference[:-1]
+    square_prefix += shift*(2*sum_prefix + rows*shift)
+    sum_prefix += rows*shift
+    sum_suffix += sum_prefix
+    square_suffix += square_prefix
+    del sum_prefix, square_prefix
+    mean = sum_suffix/window
+    # sum of squared deviations
+    square_suffix -= sum_suffix*mean
+    mean += reference[:-1]
+    np.maximum(square_suffix, 0, out=square_suffix)
+    square_suffix /= window - ddof if window > ddof else np.nan
+    return _unblock(mean, n, window, shape), _unblock(square_suffix, n, window, shape)
+
+
+def rolling_var(values, window: int, ddof=1) -> np.ndarray:
+    '''
+    Return the rolling variance
+
+    :param np.ndarray values: Values, 1-D or 2-D with one series per column
+    :param int window: Window length
+    :param int ddof: Delta degrees of freedom, 1 like pandas
+    '''
+    return rolling_mean_var(values, window, ddof=ddof)[1]
+
+
+def rolling_std(values, window: int, ddof=1) -> np.ndarray:
+    '''
+    Return the rolling standard deviation
+
+    :param np.ndarray values: Values, 1-D or 2-D with one series per column
+    :param int window: Window length
+    :param int ddof: Delta degrees of freedom, 1 like pandas
+    '''
+    return np.sqrt(rolling_var(values, window, ddof=ddof))
+
+
+def shift(values, periods=1) -> np.ndarray:
+    '''
+    Return values moved down by periods rows, NaN filled like pd.Series.shift
+
+    :param np.ndarray values: Values, 1-D or 2-D with one series per column
+    :param int periods: Rows to move
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, np.nan)
+    if periods < values.shape[0]:
+        out[periods:] = values[:values.shape[0] - periods]
+    return out
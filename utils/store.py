@@ -0,0 +1,295 @@
+import os, os.path
+import shutil
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+DTYPES = {
+    "timestamp": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+# Rows per chunk, a chunk covers step*CHUNK_ROWS seconds (~45 days of minute bars)
+CHUNK_ROWS = 65536
+
+
+class OHLCStore:
+    '''
+    Chunked columnar store for OHLC candles
+
+    Data lives in {root}/{pair}/{step}/{chunk_start}/{column}.bin, one raw little endian
+    array per column, so chunks can be memory mapped and new candles appended in place.
+
+    :param str root: Database folder
+    :param int chunk_rows: Rows per chunk
+    '''
+
+    def __init__(self, root="database", chunk_rows=CHUNK_ROWS):
+        self.root = root
+        self.chunk_rows = chunk_rows
+
+    def _pair_path(self, currency_pair, step):
+        return os.path.join(self.root, currency_pair, str(step))
+
+    def _chunk_path(self, currency_pair, step, chunk_start):
+        return os.path.join(self._pair_path(currency_pair, step), f"{chunk_start:012d}")
+
+    def _chunk_starts(self, currency_pair, step):
+        path = self._pair_path(currency_pair, step)
+        if not os.path.isdir(path):
+            return []
+        names = os.listdir(path)
+        if any(name.endswith((".merge", ".old")) for name in names):
+            _recover(path)
+            names = os.listdir(path)
+        return sorted(int(name) for name in names if name.isdigit())
+
+    def _chunk_rows(self, path):
+        # timestamp is written last, so it bounds the rows fully written
+        file = os.path.join(path, "timestamp.bin")
+        if not os.path.isfile(file):
+            return 0
+        return os.path.getsize(file) // DTYPES["timestamp"].itemsize
+
+    def _map_chunk(self, path, columns=COLUMNS):
+        rows = self._chunk_rows(path)
+        chunk = {}
+        for column in columns:
+            if rows == 0:
+                chunk[column] = np.empty(0, dtype=DTYPES[column])
+            else:
+                chunk[column] = np.memmap(os.path.join(path, f"{column}.bin"), dtype=DTYPES[column], mode="r", shape=(rows,))
+        return chunk
+
+    def pairs(self):
+        '''
+        Return the currency pairs in the store
+        '''
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def steps(self, currency_pair):
+        '''
+        Return the seconds steps stored for currency_pair
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        '''
+        path = os.path.join(self.root, currency_pair)
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(name) for name in os.listdir(path) if name.isdigit() and self.exists(currency_pair, int(name)))
+
+    def exists(self, currency_pair, step=60):
+        '''
+        Check if currency_pair has data in the store
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param int step: Seconds step
+        '''
+        return any(self._chunk_rows(self._chunk_path(currency_pair, step, start)) for start in self._chunk_starts(currency_pair, step))
+
+    def bounds(self, currency_pair, step=60):
+        '''
+        Return first and last stored timestamps
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param int step: Seconds step
+        :raise ValueError: if currency_pair not in store
+        '''
+        starts = [start for start in self._chunk_starts(currency_pair, step) if self._chunk_rows(self._chunk_path(currency_pair, step, start))]
+        if not starts:
+            raise ValueError("Currency pair not found in the database")
+        first = self._map_chunk(self._chunk_path(currency_pair, step, starts[0]), ("timestamp",))["timestamp"]
+        last = self._map_chunk(self._chunk_path(currency_pair, step, starts[-1]), ("timestamp",))["timestamp"]
+        return int(first[0]), int(last[-1])
+
+    def iter_chunks(self, currency_pair, start=None, end=None, step=60, columns=COLUMNS):
+        '''
+        Yield dictionaries of memory mapped column arrays, one per chunk, restricted to [start, end]
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param int start: First timestamp (seconds), None for the beginning
+        :param int end: Last timestamp (seconds), None for the end
+        :param int step: Seconds step
+        :param tuple columns: Columns to map
+        '''
+        span = step*self.chunk_rows
+        columns = tuple(columns)
+        if "timestamp" not in columns:
+            columns = ("timestamp",) + columns
+        for chunk_start in self._chunk_starts(currency_pair, step):
+            if start is not None and chunk_start + span <= start:
+                continue
+            if end is not None and chunk_start > end:
+                break
+            chunk = self._map_chunk(self._chunk_path(currency_pair, step, chunk_start), columns)
+            timestamp = chunk["timestamp"]
+            if timestamp.size == 0:
+                continue
+            first = 0 if start is None else np.searchsorted(timestamp, start, side="left")
+            last = timestamp.size if end is None else np.searchsorted(timestamp, end, side="right")
+            if first >= last:
+                continue
+            yield {column: values[first:last] for column, values in chunk.items()}
+
+    def read_arrays(self, currency_pair, start=None, end=None, step=60, columns=COLUMNS):
+        '''
+        Return a dictionary of column arrays in [start, end]
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param int start: First timestamp (seconds), None for the beginning
+        :param int end: Last timestamp (seconds), None for the end
+        :param int step: Seconds step
+        :param tuple columns: Columns to read
+        '''
+        chunks = list(self.iter_chunks(currency_pair, start=start, end=end, step=step, columns=columns))
+        if len(chunks) == 1:
+            return {column: np.asarray(values) for column, values in chunks[0].items()}
+        columns = ("timestamp",) + tuple(column for column in columns if column != "timestamp")
+        return {column: np.concatenate([chunk[column] for chunk in chunks]) if chunks else np.empty(0, dtype=DTYPES[column]) for column in columns}
+
+    def read(self, currency_pair, start=None, end=None, step=60):
+        '''
+        Return the candles in [start, end] as a DataFrame indexed by date
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param int start: First timestamp (seconds), None for the beginning
+        :param int end: Last timestamp (seconds), None for the end
+        :param int step: Seconds step
+        :raise ValueError: if currency_pair not in store
+        '''
+        if not self.exists(currency_pair, step):
+            raise ValueError("Currency pair not found in the database")
+        arrays = self.read_arrays(currency_pair, start=start, end=end, step=step)
+        df = pd.DataFrame({column: np.array(arrays[column]) for column in COLUMNS})
+        df.index = pd.to_datetime(df.timestamp, unit='s')
+        return df
+
+    def append(self, currency_pair, data, step=60):
+        '''
+        Add candles to the store, rows with an already stored timestamp are replaced
+
+        Candles newer than a chunk's last row are appended in place, as are candles replacing
+        the last rows of a chunk, older ones only rewrite the chunks they fall in.
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param data: DataFrame or dictionary with timestamp, open, high, low, close, volume
+        :param int step: Seconds step
+        :return: Number of rows written
+        '''
+        arrays = _as_arrays(data)
+        if arrays["timestamp"].size == 0:
+            return 0
+        arrays = _dedup(arrays)
+        span = step*self.chunk_rows
+        chunk_ids = arrays["timestamp"] // span
+        bounds = np.flatnonzero(np.diff(chunk_ids)) + 1
+        for first, last in zip(np.r_[0, bounds], np.r_[bounds, chunk_ids.size]):
+            part = {column: values[first:last] for column, values in arrays.items()}
+            self._write_chunk(currency_pair, step, int(chunk_ids[first])*span, part)
+        return int(arrays["timestamp"].size)
+
+    def _write_chunk(self, currency_pair, step, chunk_start, part):
+        path = self._chunk_path(currency_pair, step, chunk_start)
+        os.makedirs(path, exist_ok=True)
+        rows = self._chunk_rows(path)
+        if rows:
+            stored = self._map_chunk(path, ("timestamp",))["timestamp"]
+            keep = int(np.searchsorted(stored, part["timestamp"][0]))
+            tail = stored[keep:]
+            if tail.size and not np.array_equal(tail, part["timestamp"][:tail.size]):
+                del stored, tail
+                stored = self._map_chunk(path)
+                merged = _dedup({column: np.concatenate([stored[column], part[column]]) for column in COLUMNS})
+                del stored
+                # the merged chunk is written apart and swapped in, see _recover
+                merge = f"{path}.merge"
+                shutil.rmtree(merge, ignore_errors=True)
+                os.makedirs(merge)
+                for column in COLUMNS[1:] + COLUMNS[:1]:
+                    merged[column].tofile(os.path.join(merge, f"{column}.bin"))
+                os.replace(path, f"{path}.old")
+                os.replace(merge, path)
+                shutil.rmtree(f"{path}.old")
+                return
+            # the stored tail starts part (ex a candle still open), rewrite it in place
+            del stored, tail
+            rows = keep
+        for column in COLUMNS[1:] + COLUMNS[:1]:
+            file = os.path.join(path, f"{column}.bin")
+            with open(file, "r+b" if os.path.isfile(file) else "wb") as f:
+                # drop a partially written tail left by an interrupted append
+                f.truncate(rows*DTYPES[column].itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(part[column].tobytes())
+
+    def migrate_pickle(self, currency_pair, step=60):
+        '''
+        Import database/{currency_pair}.pkl into the store, the pickle is left untouched
+
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param int step: Seconds step of the pickled candles
+        :raise ValueError: if there is no pickle for currency_pair
+        :return: Number of rows imported
+        '''
+        path = os.path.join(self.root, f"{currency_pair}.pkl")
+        if not os.path.isfile(path):
+            raise ValueError("Currency pair not found in the database")
+        return self.append(currency_pair, pd.read_pickle(path), step=step)
+
+    def migrate_all(self, step=60):
+        '''
+        Import every pickle in the database folder not yet in the store
+        '''
+        migrated = []
+        for name in sorted(os.listdir(self.root)):
+            currency_pair, ext = os.path.splitext(name)
+            if ext == ".pkl" and not self.exists(currency_pair, step):
+                self.migrate_pickle(currency_pair, step=step)
+                migrated.append(currency_pair)
+        return migrated
+
+
+def _recover(path):
+    '''
+    Finish or undo the chunk swaps of the merges interrupted in path
+
+    A merge writes {chunk}.merge, moves {chunk} to {chunk}.old, moves {chunk}.merge to {chunk}
+    and removes {chunk}.old. Once the old chunk is moved the merged one is complete.
+    '''
+    names = set(os.listdir(path))
+    for name in names:
+        chunk = name[:-len(".old")]
+        if name.endswith(".old") and chunk not in names:
+            source = f"{chunk}.merge" if f"{chunk}.merge" in names else name
+            os.replace(os.path.join(path, source), os.path.join(path, chunk))
+    for name in os.listdir(path):
+        if name.endswith((".merge", ".old")):
+            shutil.rmtree(os.path.join(path, name))
+
+
+def _as_arrays(data):
+    arrays = {}
+    for column in COLUMNS:
+        values = np.asarray(data[column])
+        if values.dtype != DTYPES[column]:
+            # Bitstamp sends every field as a string, go through float for all columns
+            values = values.astype(float).astype(DTYPES[column])
+        arrays[column] = np.ascontiguousarray(values)
+    return arrays
+
+
+def _dedup(arrays):
+    # Sort by timestamp keeping the last occurrence of every timestamp
+    timestamp = arrays["timestamp"]
+    if timestamp.size > 1 and (np.diff(timestamp) > 0).all():
+        return arrays
+    order = np.argsort(timestamp, kind="stable")
+    timestamp = timestamp[order]
+    keep = np.r_[timestamp[1:] != timestamp[:-1], True]
+    return {column: values[order][keep] for column, values in arrays.items()}
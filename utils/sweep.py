@@ -0,0 +1,353 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from utils import policy, rolling
+
+# Cells (rows x combinations) evaluated at once, bounds the memory of a sweep
+MAX_CELLS = 2**22
+
+
+def sweep(strategy: str, prices, grid: dict, low=None, high=None, commissions=0.005, budget=100, max_cells=MAX_CELLS) -> pd.DataFrame:
+    '''
+    Return the winning of every parameter combination of a strategy, see technical for the parameters
+
+    :param str strategy: One of ultimate, bollinger_bands, williams, macd
+    :param prices: Prices of the stock, pd.Series or np.ndarray
+    :param dict grid: Values to try for every parameter, missing parameters use the technical defaults
+    :param low: Low prices, needed by ultimate and williams
+    :param high: High prices, needed by ultimate and williams
+    :param float commissions: Percentage commissions per transaction
+    :param float budget: My budget
+    :param int max_cells: Maximum rows times combinations evaluated at once
+    '''
+    strategies = {
+        "ultimate": sweep_ultimate,
+        "bollinger_bands": sweep_bollinger_bands,
+        "williams": sweep_williams,
+        "macd": sweep_macd,
+    }
+    if strategy not in strategies:
+        raise ValueError(f"Unknown strategy {strategy}, must be one of {', '.join(strategies)}.")
+    if strategy in ("ultimate", "williams"):
+        if low is None or high is None:
+            raise ValueError(f"{strategy} needs low and high prices.")
+        return strategies[strategy](prices, low, high, grid, commissions=commissions, budget=budget, max_cells=max_cells)
+    return strategies[strategy](prices, grid, commissions=commissions, budget=budget, max_cells=max_cells)
+
+
+def sweep_ultimate(prices, low, high, grid: dict, commissions=0.005, budget=100, max_cells=MAX_CELLS) -> pd.DataFrame:
+    '''
+    Return the winning of technical.ultimate for every combination of days, buylevel and selllevel
+
+    bp and tr are computed once for every days value and summed with the kernels of
+    utils.rolling, like the indicator.
+
+    :param prices: Prices of the stock
+    :param low: Low prices
+    :param high: High prices
+    :param dict grid: Values of days, buylevel, selllevel
+    :param float commissions: Percentage commissions per transaction
+    :param float budget: My budget
+    :param int max_cells: Maximum rows times combinations evaluated at once
+    '''
+    prices, low, high = _check(prices), _check(low), _check(high)
+    results = []
+    for rows, params, buy, sell, combos in _ultimate_signals(prices, low, high, grid):
+        winning, trades = _evaluate_cycle(prices[rows], policy.edges(buy), policy.edges(sell), combos, commissions, budget, max_cells)
+        results += [param + (w, t) for param, w, t in zip(params, winning, trades)]
+    return pd.DataFrame(results, columns=["days", "buylevel", "selllevel", "winning", "trades"])
+
+
+def _ultimate_signals(prices, low, high, grid):
+    '''
+    Yield the rows with a value, the (days, buylevel, selllevel) combinations, the buy and sell
+    signals on those rows and the (buy column, sell column) of every combination, by days
+    '''
+    grid = _grid(grid, days=7, buylevel=30, selllevel=70)
+    previous = rolling.shift(prices)
+    floor = np.minimum(previous, low)
+    # bp and tr side by side, the first row is NaN so windows over it too
+    bp_tr = np.column_stack([prices - floor, np.maximum(high, previous) - floor])
+    combos = list(itertools.product(range(len(grid["buylevel"])), range(len(grid["selllevel"]))))
+    for days in grid["days"]:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg = [sums[:, 0]/sums[:, 1] for sums in (rolling.rolling_sum(bp_tr, d) for d in (days, 2*days, 3*days))]
+        ult = 100 * (4*avg[0] + 2*avg[1] + avg[2])/7
+        valid = ~np.isnan(ult)
+        ult_ = ult[valid]
+        buy = ult_[:, None] < np.asarray(grid["buylevel"], dtype=float)
+        sell = ult_[:, None] > np.asarray(grid["selllevel"], dtype=float)
+        yield valid, [(days, grid["buylevel"][b], grid["selllevel"][s]) for b, s in combos], buy, sell, combos
+
+
+def sweep_bollinger_bands(prices, grid: dict, commissions=0.005, budget=100, max_cells=MAX_CELLS) -> pd.DataFrame:
+    '''
+    Return the winning of technical.bollinger_bands for every combination of k and period
+
+    Means and variances come from rolling.rolling_mean_var, like the indicator.
+
+    :param prices: Prices of the stock
+    :param dict grid: Values of k, period
+    :param float commissions: Percentage commissions per transaction
+    :param float budget: My budget
+    :param int max_cells: Maximum rows times combinations evaluated at once
+    '''
+    prices = _check(prices)
+    results = []
+    for rows, params, buy, sell, combos in _bollinger_bands_signals(prices, grid):
+        winning, trades = _evaluate_cycle(prices, policy.edges(buy), policy.edges(sell), combos, commissions, budget, max_cells)
+        results += [param + (w, t) for param, w, t in zip(params, winning, trades)]
+    return pd.DataFrame(results, columns=["k", "period", "winning", "trades"])
+
+
+def _bollinger_bands_signals(prices, grid):
+    '''
+    Yield the signals of every (k, period) combination like _ultimate_signals, by period
+    '''
+    grid = _grid(grid, k=1, period=1000)
+    ks = np.asarray(grid["k"], dtype=float)
+    combos = [(i, i) for i in range(ks.size)]
+    for period in grid["period"]:
+        # block-local sums, a global cumulative sum loses precision on long drifting histories
+        mean, var = rolling.rolling_mean_var(prices, period)
+        std = np.sqrt(var)
+        sell = prices[:, None] > mean[:, None] + std[:, None]*ks
+        buy = prices[:, None] < mean[:, None] - std[:, None]*ks
+        yield None, [(k, period) for k in grid["k"]], buy, sell, combos
+
+
+def sweep_williams(prices, low, high, grid: dict, commissions=0.005, budget=100, max_cells=MAX_CELLS) -> pd.DataFrame:
+    '''
+    Return the winning of technical.williams for every combination of days, buylevel and selllevel
+
+    One sparse table of high maxima and low minima serves every days value.
+
+    :param prices: Prices of the stock
+    :param low: Low prices
+    :param high: High prices
+    :param dict grid: Values of days, buylevel, selllevel
+    :param float commissions: Percentage commissions per transaction
+    :param float budget: My budget
+    :param int max_cells: Maximum rows times combinations evaluated at once
+    '''
+    prices, low, high = _check(prices), _check(low), _check(high)
+    results = []
+    for rows, params, buy, sell, combos in _williams_signals(prices, low, high, grid):
+        winning, trades = _evaluate_cycle(prices, policy.edges(buy), policy.edges(sell), combos, commissions, budget, max_cells)
+        results += [param + (w, t) for param, w, t in zip(params, winning, trades)]
+    return pd.DataFrame(results, columns=["days", "buylevel", "selllevel", "winning", "trades"])
+
+
+def _williams_signals(prices, low, high, grid):
+    '''
+    Yield the signals of every (days, buylevel, selllevel) combination like _ultimate_signals, by days
+    '''
+    grid = _grid(grid, days=10, buylevel=-80, selllevel=-20)
+    high_table = _sparse_table(high, max(grid["days"]), np.maximum)
+    low_table = _sparse_table(low, max(grid["days"]), np.minimum)
+    combos = list(itertools.product(range(len(grid["buylevel"])), range(len(grid["selllevel"]))))
+    for days in grid["days"]:
+        high_N = _window_extreme(high_table, days, np.maximum)
+        low_N = _window_extreme(low_table, days, np.minimum)
+        R = -100*(high_N - prices)/(high_N - low_N)
+        buy = R[:, None] > np.asarray(grid["buylevel"], dtype=float)
+        sell = R[:, None] < np.asarray(grid["selllevel"], dtype=float)
+        yield None, [(days, grid["buylevel"][b], grid["selllevel"][s]) for b, s in combos], buy, sell, combos
+
+
+def sweep_macd(prices, grid: dict, commissions=0.005, budget=100, max_cells=MAX_CELLS) -> pd.DataFrame:
+    '''
+    Return the winning of technical.macd for every combination of long and short
+
+    Every moving average length is computed once with rolling.rolling_mean, like the indicator.
+
+    :param prices: Prices of the stock
+    :param dict grid: Values of long, short
+    :param float commissions: Percentage commissions per transaction
+    :param float budget: My budget
+    :param int max_cells: Maximum rows times combinations evaluated at once
+    '''
+    prices = _check(prices)
+    means, combos = _macd_means(prices, grid)
+    batch = max(1, max_cells//max(prices.size, 1))
+    diff = (prices[-1]/prices[0] - 1)*100
+    results = []
+    for first in range(0, len(combos), batch):
+        positive = np.stack([means[short] - means[long] > 0 for long, short in combos[first:first + batch]], axis=1)
+        # macd gains pair the alternate changes of sign, without a buy/sell cycle
+        gain, trades = _gains(prices, policy.edges(positive), commissions, budget)
+        results += [(long, short, w - diff, t) for (long, short), w, t in zip(combos[first:first + batch], gain, trades)]
+    return pd.DataFrame(results, columns=["long", "short", "winning", "trades"])
+
+
+def _macd_means(prices, grid):
+    '''
+    Return the moving average of every length and the (long, short) combinations
+    '''
+    grid = _grid(grid, long=10000, short=1000)
+    means = {w: rolling.rolling_mean(prices, w) for w in set(grid["long"]) | set(grid["short"])}
+    return means, list(itertools.product(grid["long"], grid["short"]))
+
+
+def signals(strategy: str, prices, grid: dict, low=None, high=None) -> (pd.DataFrame, np.ndarray, np.ndarray, np.ndarray):
+    '''
+    Return the buy and sell signals of every parameter combination over all the rows of prices
+
+    Any range of rows can then be evaluated with evaluate without computing the indicators
+    again. Rows where ultimate has no value keep the previous signals, like the rows dropped
+    by technical.ultimate.
+
+    :param str strategy: One of ultimate, bollinger_bands, williams, macd
+    :param prices: Prices of the stock, pd.Series or np.ndarray
+    :param dict grid: Values to try for every parameter, missing parameters use the technical defaults
+    :param low: Low prices, needed by ultimate and williams
+    :param high: High prices, needed by ultimate and williams
+    :return: Parameters of every combination, buy signals (rows, buy columns), sell signals (rows, sell columns) or None for macd, (buy column, sell column) of every combination
+    '''
+    generators = {
+        "ultimate": _ultimate_signals,
+        "bollinger_bands": _bollinger_bands_signals,
+        "williams": _williams_signals,
+    }
+    if strategy not in generators and strategy != "macd":
+        raise ValueError(f"Unknown strategy {strategy}, must be one of {', '.join(list(generators) + ['macd'])}.")
+    prices = _check(prices)
+    if strategy == "macd":
+        means, combos = _macd_means(prices, grid)
+        positive = np.empty((prices.size, len(combos)), dtype=bool)
+        for column, (long, short) in enumerate(combos):
+            np.greater(means[short] - means[long], 0, out=positive[:, column])
+        return pd.DataFrame(combos, columns=["long", "short"]), positive, None, np.repeat(np.arange(len(combos))[:, None], 2, axis=1)
+    if strategy in ("ultimate", "williams"):
+        if low is None or high is None:
+            raise ValueError(f"{strategy} needs low and high prices.")
+        blocks = generators[strategy](prices, _check(low), _check(high), grid)
+    else:
+        blocks = generators[strategy](prices, grid)
+    params, buys, sells, columns = [], [], [], []
+    offset = np.zeros(2, dtype=np.int64)
+    for rows, block_params, buy, sell, combos in blocks:
+        if rows is not None:
+            buy, sell = _fill_rows(buy, rows), _fill_rows(sell, rows)
+        params += block_params
+        buys.append(buy)
+        sells.append(sell)
+        columns.append(np.asarray(combos, dtype=np.int64).reshape(-1, 2) + offset)
+        offset += (buy.shape[1], sell.shape[1])
+    names = ["k", "period"] if strategy == "bollinger_bands" else ["days", "buylevel", "selllevel"]
+    return pd.DataFrame(params, columns=names), np.concatenate(buys, axis=1), np.concatenate(sells, axis=1), np.concatenate(columns)
+
+
+def evaluate(prices, buy, sell, combos, start=0, end=None, commissions=0.005, budget=100, max_cells=MAX_CELLS) -> (np.ndarray, np.ndarray):
+    '''
+    Return the winning and the number of trades of every combination of signals on rows [start, end)
+
+    The strategy starts again at start, as technical would on prices[start:end], while the
+    indicators keep the history before it.
+
+    :param np.ndarray prices: Prices of the stock
+    :param np.ndarray buy: Buy signals of signals
+    :param np.ndarray sell: Sell signals of signals, None for macd
+    :param np.ndarray combos: (buy column, sell column) of every combination
+    :param int start: First row
+    :param int end: Row after the last one, the end if None
+    :param float commissions: Percentage commissions per transaction
+    :param float budget: My budget
+    :param int max_cells: Maximum rows times combinations evaluated at once
+    '''
+    prices = np.asarray(prices, dtype=np.float64)[start:end]
+    combos = [tuple(combo) for combo in np.asarray(combos).tolist()]
+    if sell is None:
+        positive = np.asarray(buy)[start:end]
+        batch = max(1, max_cells//max(prices.size, 1))
+        diff = (prices[-1]/prices[0] - 1)*100
+        winning, trades = [], []
+        for first in range(0, len(combos), batch):
+            gain, count = _gains(prices, policy.edges(positive[:, [b for b, _ in combos[first:first + batch]]]), commissions, budget)
+            winning.append(gain - diff)
+            trades.append(count)
+        return np.concatenate(winning), np.concatenate(trades)
+    return _evaluate_cycle(prices, policy.edges(np.asarray(buy)[start:end]), policy.edges(np.asarray(sell)[start:end]), combos, commissions, budget, max_cells)
+
+
+def _check(prices):
+    if isinstance(prices, pd.Series):
+        if prices.index.duplicated().any():
+            raise ValueError("There are some duplicate indexes.")
+        prices = prices.to_numpy()
+    return np.asarray(prices, dtype=np.float64)
+
+
+def _grid(grid, **defaults):
+    grid = {key: list(np.atleast_1d(value)) for key, value in grid.items()}
+    unknown = set(grid) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown parameters {', '.join(sorted(unknown))}.")
+    return {key: grid.get(key, [value]) for key, value in defaults.items()}
+
+
+def _fill_rows(signal, rows):
+    '''
+    Return the signal of the rows selected by the mask rows on all the rows, the other rows
+    repeating the previous signal and False before the first one
+    '''
+    full = np.zeros((rows.size, signal.shape[1]), dtype=bool)
+    full[rows] = signal
+    last = np.maximum.accumulate(np.where(rows, np.arange(rows.size), -1))
+    return np.where((last >= 0)[:, None], full[np.maximum(last, 0)], False)
+
+
+def _sparse_table(values, max_window, op):
+    '''
+    Levels of op over windows of 1, 2, 4... rows starting at every row
+    '''
+    table = [values]
+    width = 1
+    while 2*width <= max_window:
+        level = table[-1]
+        table.append(op(level[:-width], level[width:]))
+        width *= 2
+    return table
+
+
+def _window_extreme(table, window, op):
+    level = int(np.log2(window))
+    width = 2**level
+    values = table[level]
+    out = np.full(table[0].size, np.nan)
+    if window > out.size:
+        return out
+    # two overlapping power of two windows cover [i - window + 1, i]
+    out[window - 1:] = op(values[:values.size - (window - width)], values[window - width:])
+    return out
+
+
+def _gains(prices, policy, commissions, budget):
+    '''
+    Sum of technical.gains and number of sells for every column of policy
+    '''
+    count = np.cumsum(policy, axis=0)
+    buy = policy & (count % 2 == 1)
+    rows = np.arange(policy.shape[0])[:, None]
+    last_buy = np.maximum.accumulate(np.where(buy, rows, 0), axis=0)
+    sell_rows, sell_cols = np.nonzero(policy & (count % 2 == 0))
+    gain = prices[sell_rows]/prices[last_buy[sell_rows, sell_cols]] - 1 - commissions*2
+    total = np.bincount(sell_cols, weights=gain, minlength=policy.shape[1])*budget
+    return total, np.bincount(sell_cols, minlength=policy.shape[1])
+
+
+def _evaluate_cycle(prices, buys, sells, combos, commissions, budget, max_cells):
+    '''
+    Winning and number of trades for every (buy column, sell column) combination
+    '''
+    batch = max(1, max_cells//max(prices.size, 1))
+    diff = (prices[-1]/prices[0] - 1)*100
+    winning, trades = [], []
+    for first in range(0, len(combos), batch):
+        b, s = map(list, zip(*combos[first:first + batch]))
+        gain, count = _gains(prices, policy.cycle(buys[:, b], sells[:, s]), commissions, budget)
+        winning.append(gain - diff)
+        trades.append(count)
+    return np.concatenate(winning), np.concatenate(trades)
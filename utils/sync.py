@@ -0,0 +1,191 @@
+import json
+import os, os.path
+import time
+from contextlib import closing
+
+import numpy as np
+
+from utils.ingest import OHLCBuffer
+from utils.store import OHLCStore
+
+
+def _merge(ranges, step):
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + step:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
+
+
+class Coverage:
+    '''
+    Sorted disjoint [first, last] timestamp ranges already downloaded for a pair and step,
+    saved as json next to the chunks of the store: {root}/{pair}/{step}/coverage.json
+
+    A range is covered once the API was asked for it, even if it had no candles there.
+
+    :param str path: Index file
+    :param int step: Seconds step
+    '''
+
+    def __init__(self, path, step=60):
+        self.path = path
+        self.step = step
+        self.ranges = []
+        if os.path.isfile(path):
+            with open(path) as f:
+                self.ranges = json.load(f)["ranges"]
+
+    @classmethod
+    def open(cls, store: OHLCStore, currency_pair: str, step=60):
+        '''
+        Return the index of currency_pair, built from the stored timestamps the first time
+
+        :param OHLCStore store: Store of the candles
+        :param str currency_pair: Currency pair (ex btcusd)
+        :param int step: Seconds step
+        '''
+        coverage = cls(os.path.join(store.root, currency_pair, str(step), "coverage.json"), step=step)
+        if not os.path.isfile(coverage.path) and store.exists(currency_pair, step):
+            coverage.rebuild(store, currency_pair)
+        return coverage
+
+    def rebuild(self, store: OHLCStore, currency_pair: str):
+        '''
+        Set the ranges to the runs of consecutive stored timestamps and save them
+        '''
+        ranges = []
+        for chunk in store.iter_chunks(currency_pair, step=self.step, columns=("timestamp",)):
+            timestamp = np.asarray(chunk["timestamp"])
+            breaks = np.flatnonzero(np.diff(timestamp) > self.step)
+            ranges += [[int(first), int(last)] for first, last in zip(np.r_[timestamp[0], timestamp[breaks + 1]], np.r_[timestamp[breaks], timestamp[-1]])]
+        self.ranges = _merge(ranges, self.step)
+        self.save()
+
+    def add(self, first: int, last: int):
+        '''
+        Mark [first, last] as covered
+        '''
+        self.ranges = _merge(self.ranges + [[int(first), int(last)]], self.step)
+
+    def missing(self, start: int, end: int) -> list:
+        '''
+        Return the (first, last) ranges of [start, end] not covered
+        '''
+        gaps = []
+        cursor = start
+        for first, last in self.ranges:
+            if last < cursor:
+                continue
+            if first > end:
+                break
+            if first > cursor:
+                gaps.append((cursor, first - self.step))
+            cursor = last + self.step
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def report(self, start=None, end=None) -> dict:
+        '''
+        Return the covered ranges, the gaps and the covered fraction of [start, end]
+
+        :param int start: First timestamp, the first covered one if None
+        :param int end: Last timestamp, the last covered one if None
+        '''
+        if not self.ranges and (start is None or end is None):
+            return {"first": start, "last": end, "ranges": [], "gaps": [], "coverage": 0.0}
+        start = self.ranges[0][0] if start is None else start
+        end = self.ranges[-1][1] if end is None else end
+        gaps = self.missing(start, end)
+        total = (end - start)//self.step + 1
+        missing = sum((last - first)//self.step + 1 for first, last in gaps)
+        return {
+            "first": start,
+            "last": end,
+            "ranges": [list(r) for r in self.ranges if r[1] >= start and r[0] <= end],
+            "gaps": gaps,
+            "coverage": 1 - missing/total if total > 0 else 1.0,
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"step": self.step, "ranges": self.ranges}, f)
+        os.replace(tmp, self.path)
+
+
+def sync(store: OHLCStore, currency_pair: str, downloader, step=60, start=None, end=None, limit=1000, max_requests=None, flush_every=100) -> dict:
+    '''
+    Download the candles of [start, end] missing from the store and report the coverage
+
+    Only the gaps of the coverage index are requested, candles outside them are dropped so
+    stored rows are never rewritten, and the index is saved after every write so an
+    interrupted sync resumes where it stopped.
+
+    :param OHLCStore store: Store of the candles
+    :param str currency_pair: Currency pair (ex btcusd)
+    :param Downloader downloader: Downloader used for the requests
+    :param int step: Seconds step
+    :param int start: First timestamp, the first covered one if None
+    :param int end: Last timestamp, the last closed candle if None
+    :param int limit: Candles per request
+    :param int max_requests: Maximum requests, oldest gaps first, no limit if None
+    :param int flush_every: Requests between writes to the store
+    :raise ValueError: if currency_pair not in store and start is None
+    :return: Coverage.report of [start, end] with the requests made, the rows written and the
+        merged (first, last) spans written, to pass to resample.refresh
+    '''
+    coverage = Coverage.open(store, currency_pair, step=step)
+    if start is None:
+        if not coverage.ranges:
+            raise ValueError("Currency pair not found in the database, a start is needed.")
+        start = coverage.ranges[0][0]
+    end = (int(time.time())//step - 1)*step if end is None else end
+    start, end = -(-start//step)*step, end//step*step
+    # pages of limit candles, each clipped to its gap, oldest first
+    pages = sorted(
+        (max(first, page_end - (limit - 1)*step), page_end)
+        for first, last in coverage.missing(start, end)
+        for page_end in range(last, first - 1, -limit*step)
+    )
+    if max_requests is not None:
+        pages = pages[:max_requests]
+    spans = {page_end: first for first, page_end in pages}
+    buffer = OHLCBuffer(capacity=min(flush_every, len(pages))*limit)
+    done = []
+    rows = 0
+    with closing(downloader.download(currency_pair, list(spans), step=step, limit=limit)) as responses:
+        for page_end, response in responses:
+            buffer.add_response(response)
+            done.append(page_end)
+            if len(done) >= flush_every:
+                rows += _flush(store, currency_pair, coverage, buffer, [(spans[e], e) for e in done])
+                done = []
+    if done:
+        rows += _flush(store, currency_pair, coverage, buffer, [(spans[e], e) for e in done])
+    report = coverage.report(start, end)
+    report.update(requests=len(pages), rows=rows, spans=[tuple(span) for span in _merge(pages, step)])
+    return report
+
+
+def _flush(store, currency_pair, coverage, buffer, spans):
+    '''
+    Write the buffered candles inside the disjoint spans, mark the spans covered and empty the buffer
+    '''
+    spans = sorted(spans)
+    firsts = np.array([first for first, _ in spans], dtype=np.int64)
+    lasts = np.array([last for _, last in spans], dtype=np.int64)
+    arrays = buffer.arrays()
+    timestamp = arrays["timestamp"]
+    span = np.searchsorted(firsts, timestamp, side="right") - 1
+    keep = (span >= 0) & (timestamp <= lasts[np.maximum(span, 0)])
+    rows = store.append(currency_pair, {column: values[keep] for column, values in arrays.items()}, step=coverage.step)
+    for first, last in spans:
+        coverage.add(first, last)
+    coverage.save()
+    buffer.clear()
+    return rows
@@ -1,16 +1,21 @@
 import numpy as np
 import pandas as pd
-from tqdm.auto import tqdm
 
-from utils import ultimate_cycle
+from utils import instrument, rolling
+from utils.policy import cycle, cycle_absolutegain, cycle_checkgain
+
+# Every indicator takes pd.Series or DataFrames with one column per currency pair (see
+# utils.panel), the rolling kernels compute all the columns in one pass. Pairs missing
+# candles (NaN prices) go pair by pair on their own candles, see _by_pair.
 
 # OSCILLATORS
 
+@instrument.timed("technical.macd")
 def macd(prices: pd.Series, long: int, short: int, strategy=False, getgains=False, winning=False, commissions=0.005) -> pd.Series:
     '''
     Return the MACD
 
-    :param pd.Series prices: Prices of the stock
+    :param prices: Prices of the stock, pd.Series or DataFrame with one column per pair
     :param int long: Long moving average length
     :param int short: Short moving average length
     :param bool strategy: If strategy should be returned
@@ -18,16 +23,18 @@ def macd(prices: pd.Series, long: int, short: int, strategy=False, getgains=Fals
     :param bool winning: If policy gain - no strategy gain should be returned
     :param float commissions: Percentage commissions per transaction
     '''
-    if prices.index.duplicated().any():
-        raise ValueError("There are some duplicate indexes.")
-    macdvalues = prices.rolling(short).mean() - prices.rolling(long).mean()
+    if _missing(prices):
+        return _by_pair(macd, locals())
+    _check_index(prices)
+    values = prices.to_numpy(dtype=np.float64)
+    macdvalues = _like(rolling.rolling_mean(values, short) - rolling.rolling_mean(values, long), prices)
     if winning:
         positive = macdvalues > 0
         policy = positive.shift(1) != positive
-        if positive.iloc[0]:
+        if np.any(positive.iloc[0]):
             policy.iloc[0] = 1
         gain = gains(prices=prices, policy=policy, commissions=commissions)
-        diff = (prices.iloc[-1]/prices.iloc[0]) - 1
+        diff = _change(prices)
         return gain.sum() - diff * 100
     if strategy:
         positive = macdvalues > 0
@@ -35,39 +42,46 @@ def macd(prices: pd.Series, long: int, short: int, strategy=False, getgains=Fals
     if getgains:
         positive = macdvalues > 0
         policy = positive.shift(1) != positive
-        if positive.iloc[0]:
+        if np.any(positive.iloc[0]):
             policy.iloc[0] = 1
         return gains(prices=prices, policy=policy, commissions=commissions)
     return macdvalues
     
+@instrument.timed("technical.ultimate")
 def ultimate(prices: pd.Series, low: pd.Series, high: pd.Series, buylevel=30, selllevel=70, days=7, strategy=False, getgains=False, winning=False, commissions=0.005, mingain=0, accelerate=True, firstopportunity=False, stoploss=0) -> pd.Series:
     '''
     Return the Ultimate oscillator
 
-    :param pd.Series prices: Prices of the stock
-    :param pd.Series low: Long moving average length
-    :param pd.Series high: Short moving average length
+    :param prices: Prices of the stock, pd.Series or DataFrame with one column per pair
+    :param low: Long moving average length
+    :param high: Short moving average length
     :param int days: Days for moving sum
     :param bool strategy: If strategy should be returned
     :param bool getgains: If gains should be returned
     :param bool winning: If policy gain - no strategy gain should be returned
     :param float commissions: Percentage commissions per transaction
-    :param bool accelerate: If uses cython
+    :param bool accelerate: If uses the NumPy state machines of utils.policy
     :param float mingain: Minimum gain to sell
     :param bool firstopportunity: If sell first time you have mingain
     :param float stoploss: Maximum percentage loss
     '''
-    if prices.index.duplicated().any():
-        raise ValueError("There are some duplicate indexes.")
-    bp = prices - np.minimum(prices.shift(1), low)
-    tr = np.maximum(high, prices.shift(1)) - np.minimum(prices.shift(1), low)
-    avg1 = bp.rolling(days).sum()/tr.rolling(days).sum()
-    avg2 = bp.rolling(2*days).sum()/tr.rolling(2*days).sum()
-    avg3 = bp.rolling(3*days).sum()/tr.rolling(3*days).sum()
-    ult = 100 * (4*avg1 + 2*avg2 + avg3)/7
+    if _missing(prices):
+        return _by_pair(ultimate, locals())
+    _check_index(prices)
+    close = prices.to_numpy(dtype=np.float64)
+    previous = rolling.shift(close)
+    floor = np.minimum(previous, low.to_numpy(dtype=np.float64))
+    # bp and tr side by side, one pass per window length
+    bp_tr = np.column_stack([close - floor, np.maximum(high.to_numpy(dtype=np.float64), previous) - floor])
+    columns = bp_tr.shape[1]//2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg1, avg2, avg3 = (sums[:, :columns]/sums[:, columns:] for sums in (rolling.rolling_sum(bp_tr, d) for d in (days, 2*days, 3*days)))
+    ult = _like((100 * (4*avg1 + 2*avg2 + avg3)/7).reshape(close.shape), prices)
     if mingain == 0 and not firstopportunity and stoploss == 0:
-        prices = prices.loc[~ult.isna()]
-        ult = ult.dropna()
+        # rows where some pair has a value for DataFrames
+        keep = ult.notna() if ult.ndim == 1 else ult.notna().any(axis=1)
+        prices = prices.loc[keep]
+        ult = ult.loc[keep]
     if winning or strategy or getgains:
         buy = ult < buylevel
         sell = ult > selllevel
@@ -76,40 +90,43 @@ def ultimate(prices: pd.Series, low: pd.Series, high: pd.Series, buylevel=30, se
         return ult
     if winning:
         gain = gains(prices=prices, policy=policy, commissions=commissions)
-        diff = (prices.iloc[-1]/prices.iloc[0]) - 1
+        diff = _change(prices)
         return gain.sum() - diff * 100
     if strategy:
         return policy
     if getgains:
         return gains(prices=prices, policy=policy, commissions=commissions)
 
+@instrument.timed("technical.bollinger_bands")
 def bollinger_bands(prices: pd.Series, k=1, period=1000, strategy=False, getgains=False, winning=False, commissions=0.005, accelerate=True, mingain=0, firstopportunity=False, stoploss=0) -> (pd.Series, pd.Series):
     '''
     Return the Bollinger bands
 
-    :param pd.Series prices: Prices of the stock
+    :param prices: Prices of the stock, pd.Series or DataFrame with one column per pair
     :param int k: How many standard deviations out
     :param int period: Period for moving average 
     :param bool strategy: If strategy should be returned
     :param bool getgains: If gains should be returned
     :param bool winning: If policy gain - no strategy gain should be returned
     :param float commissions: Percentage commissions per transaction
-    :param bool accelerate: If uses cython
+    :param bool accelerate: If uses the NumPy state machines of utils.policy
     :param float mingain: Minimum gain to sell
     :param bool firstopportunity: If sell first time you have mingain
     :param float stoploss: Maximum percentage loss
     '''
-    std = prices.rolling(period).std()
-    mean = prices.rolling(period).mean()
-    upperband = mean + std*k
-    lowerband = mean - std*k
+    if _missing(prices):
+        return _by_pair(bollinger_bands, locals())
+    mean, var = rolling.rolling_mean_var(prices.to_numpy(dtype=np.float64), period)
+    std = np.sqrt(var)
+    upperband = _like(mean + std*k, prices)
+    lowerband = _like(mean - std*k, prices)
     if strategy or getgains or winning:
         sell = prices > upperband
         buy = prices < lowerband
         policy = getpolicy(buy=buy, sell=sell, prices=prices, mingain=mingain, stoploss=stoploss, accelerate=accelerate, firstopportunity=firstopportunity)
     if winning:
         gain = gains(prices=prices, policy=policy, commissions=commissions)
-        diff = (prices.iloc[-1]/prices.iloc[0]) - 1
+        diff = _change(prices)
         return gain.sum() - diff * 100
     if strategy:
         return policy
@@ -117,28 +134,31 @@ def bollinger_bands(prices: pd.Series, k=1, period=1000, strategy=False, getgain
         return gains(prices=prices, policy=policy, commissions=commissions)
     return lowerband, upperband
 
+@instrument.timed("technical.williams")
 def williams(prices: pd.Series, low: pd.Series, high: pd.Series, buylevel=-80, selllevel=-20, days=10, strategy=False, getgains=False, winning=False, commissions=0.005, mingain=0, accelerate=True, firstopportunity=False, stoploss=0) -> pd.Series:
     '''
     Return the Williams %R oscillator
 
-    :param pd.Series prices: Prices of the stock
-    :param pd.Series low: Long moving average length
-    :param pd.Series high: Short moving average length
+    :param prices: Prices of the stock, pd.Series or DataFrame with one column per pair
+    :param low: Long moving average length
+    :param high: Short moving average length
     :param int days: Days for moving sum
     :param bool strategy: If strategy should be returned
     :param bool getgains: If gains should be returned
     :param bool winning: If policy gain - no strategy gain should be returned
     :param float commissions: Percentage commissions per transaction
-    :param bool accelerate: If uses cython
+    :param bool accelerate: If uses the NumPy state machines of utils.policy
     :param float mingain: Minimum gain to sell
     :param bool firstopportunity: If sell first time you have mingain
     :param float stoploss: Maximum percentage loss
     '''
-    if prices.index.duplicated().any():
-        raise ValueError("There are some duplicate indexes.")
-    high_N = high.rolling(days).max()
-    low_N = low.rolling(days).min()
-    R = -100*(high_N - prices)/(high_N - low_N)
+    if _missing(prices):
+        return _by_pair(williams, locals())
+    _check_index(prices)
+    high_N = rolling.rolling_max(high.to_numpy(dtype=np.float64), days)
+    low_N = rolling.rolling_min(low.to_numpy(dtype=np.float64), days)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        R = _like(-100*(high_N - prices.to_numpy(dtype=np.float64))/(high_N - low_N), prices)
     if winning or strategy or getgains:
         buy = R > buylevel
         sell = R < selllevel
@@ -147,39 +167,43 @@ def williams(prices: pd.Series, low: pd.Series, high: pd.Series, buylevel=-80, s
         return R
     if winning:
         gain = gains(prices=prices, policy=policy, commissions=commissions)
-        diff = (prices.iloc[-1]/prices.iloc[0]) - 1
+        diff = _change(prices)
         return gain.sum() - diff * 100
     if strategy:
         return policy
     if getgains:
         return gains(prices=prices, policy=policy, commissions=commissions)
 
+@instrument.timed("technical.momentum")
 def momentum(prices: pd.Series, period=10, strategy=False, getgains=False, winning=False, commissions=0.005) -> pd.Series:
     '''
     Return the Momentum
 
-    :param pd.Series prices: Prices of the stock
+    :param prices: Prices of the stock, pd.Series or DataFrame with one column per pair
     :param int period: Days for moving average
     :param bool strategy: If strategy should be returned
     :param bool getgains: If gains should be returned
     :param bool winning: If policy gain - no strategy gain should be returned
     :param float commissions: Percentage commissions per transaction
     '''
-    if prices.index.duplicated().any():
-        raise ValueError("There are some duplicate indexes.")
-    momentum = prices.rolling(period).mean().pct_change()
+    if _missing(prices):
+        return _by_pair(momentum, locals())
+    _check_index(prices)
+    mean = rolling.rolling_mean(prices.to_numpy(dtype=np.float64), period)
+    values = _like(mean/rolling.shift(mean) - 1, prices)
     if winning or strategy or getgains:
-        buy = momentum > 0
-        sell = momentum < 0
+        buy = values > 0
+        sell = values < 0
         buy_ = buy.shift(1) != buy
         sell_ = sell.shift(1) != sell
-        sell_.loc[:buy_[buy_].iloc[0].index] = 0
+        # no sell up to the first buy
+        sell_ &= buy_.cumsum() > buy_
         policy = buy_ | sell_
     else:
-        return momentum
+        return values
     if winning:
         gain = gains(prices=prices, policy=policy, commissions=commissions)
-        diff = (prices.iloc[-1]/prices.iloc[0]) - 1
+        diff = _change(prices)
         return gain.sum() - diff * 100
     if strategy:
         return policy
@@ -188,59 +212,137 @@ def momentum(prices: pd.Series, period=10, strategy=False, getgains=False, winni
 
 # UTILS
 
+@instrument.timed("technical.duplicate_check")
+def _check_index(prices):
+    '''
+    Raise ValueError if the index of prices has duplicates
+    '''
+    # cached by the index, without a mask of the duplicates
+    if not prices.index.is_unique:
+        raise ValueError("There are some duplicate indexes.")
+
+def _like(values: np.ndarray, like):
+    '''
+    Return values as a pd.Series or a DataFrame with the index and columns of like
+    '''
+    if isinstance(like, pd.DataFrame):
+        return pd.DataFrame(values, index=like.index, columns=like.columns)
+    return pd.Series(values, index=like.index)
+
+def _change(prices) -> float:
+    '''
+    Return the relative change from the first to the last price, of every column for DataFrames
+    '''
+    if isinstance(prices, pd.DataFrame):
+        return prices.ffill().iloc[-1]/prices.bfill().iloc[0] - 1
+    return (prices.iloc[-1]/prices.iloc[0]) - 1
+
+def _missing(prices) -> bool:
+    '''
+    Return if prices is a DataFrame missing candles of some pairs (ex pairs listed at different dates)
+    '''
+    return isinstance(prices, pd.DataFrame) and prices.isna().to_numpy().any()
+
+def _by_pair(function, arguments: dict):
+    '''
+    Return function of the arguments run pair by pair, on the rows where the pair has a price,
+    so that every column is the result of the pair's own candles
+
+    :param function: Indicator or getpolicy
+    :param dict arguments: Arguments of the call, the DataFrames one column per pair like prices
+    '''
+    prices = arguments["prices"]
+    results = {}
+    for column in prices.columns:
+        rows = prices[column].notna()
+        results[column] = function(**{name: value[column][rows] if isinstance(value, pd.DataFrame) else value for name, value in arguments.items()})
+    return _combine(results)
+
+def _combine(results: dict):
+    '''
+    Return the results of every pair of _by_pair as the result of a DataFrame
+    '''
+    first = next(iter(results.values()))
+    if isinstance(first, tuple):
+        return tuple(_combine({column: result[i] for column, result in results.items()}) for i in range(len(first)))
+    if np.ndim(first) == 0:
+        return pd.Series(results)
+    frame = pd.concat(results, axis=1).sort_index()
+    if all(result.dtype == bool for result in results.values()):
+        # no buy or sell on the rows where a pair has no price
+        frame = frame.fillna(False).astype(bool)
+    return frame
+
+@instrument.timed("technical.gains")
 def gains(prices: pd.Series, policy: pd.Series, budget=100, commissions=0.005) -> pd.Series:
     '''
     Return the gains
 
-    :param pd.Series prices: Prices of the stock
-    :param pd.Series policy: True when buy or sell
+    :param prices: Prices of the stock, pd.Series or DataFrame with one column per pair
+    :param policy: True when buy or sell, like prices
     :param float budget: My budget
     :param float commissions: Percentage commissions per transaction
+    :return: Gain of every sell, a column per pair for DataFrames
     '''
+    if isinstance(policy, pd.DataFrame):
+        # no trade on the rows where a pair has no price
+        present = prices.reindex(policy.index).notna()
+        return pd.concat({column: gains(prices[column], policy[column] & present[column], budget=budget, commissions=commissions) for column in policy.columns}, axis=1)
     prices = prices.loc[policy.index]
     buy = prices[policy].iloc[::2]
     sell = prices[policy].iloc[1::2]
     buy = buy.iloc[:sell.size].values
-    gains = (sell/buy) - 1
-    return (gains - commissions*2)*budget
+    gain = (sell/buy) - 1
+    return (gain - commissions*2)*budget
 
+@instrument.timed("technical.getpolicy")
 def getpolicy(buy: pd.Series, sell: pd.Series, prices: pd.Series, mingain=0, stoploss=0, accelerate=True, firstopportunity=False) -> pd.Series:
     """
     Return the policy given all the moments sell or buy is True
 
-    :param pd.Series buy: When the buy pricinple is respected
-    :param pd.Series sell: When the sell pricinple is respected
+    :param buy: When the buy pricinple is respected, pd.Series or DataFrame with one column per pair
+    :param sell: When the sell pricinple is respected, like buy
+    :param prices: Prices of the stock, like buy
     :param float mingain: Minimum gain to sell
     :param float stoploss: Maximum percentage loss
-    :param bool accelerate: If use cython
+    :param bool accelerate: If use the NumPy state machines of utils.policy, else a pandas loop
     :param bool firstopportunity: If sell first time you have mingain, MUST USE ACCELERATE
     """
     if firstopportunity and not accelerate:
         print("Changing accelerate to True to use firstopportunity.")
         accelerate = True
+    if _missing(prices):
+        return _by_pair(getpolicy, locals())
+    if isinstance(buy, pd.DataFrame) and not (accelerate and mingain == 0 and stoploss == 0):
+        # only cycle works on all the columns at once, the gain checks go pair by pair
+        # (pairs missing candles already go pair by pair through _by_pair)
+        return pd.DataFrame({column: getpolicy(buy[column], sell[column], prices[column], mingain=mingain, stoploss=stoploss, accelerate=accelerate, firstopportunity=firstopportunity) for column in buy.columns}, index=buy.index)
     buys = buy.shift(1) != buy
     sells = sell.shift(1) != sell
-    policy = pd.Series(np.zeros(buy.size), index=buy.index)
     if accelerate:
-        buys.reset_index(drop=True, inplace=True)
-        sells.reset_index(drop=True, inplace=True)
-        index = buys[buys | sells].index.to_numpy()
+        if not prices.index.equals(buy.index):
+            # same prices as the .loc lookups of the loop
+            prices = prices.loc[buy.index]
+        buys = buys.to_numpy(dtype=bool)
+        sells = sells.to_numpy(dtype=bool)
         if mingain == 0 and stoploss == 0:
-            policy_ = ultimate_cycle.ultimate_cycle(policy.to_numpy(), buys.to_numpy(), sells.to_numpy(), index)
+            policy_values = cycle(buys, sells)
         elif not firstopportunity and stoploss == 0:
-            policy_ = ultimate_cycle.cycle_checkgain(policy.to_numpy(), buys.to_numpy(), sells.to_numpy(), index, prices.to_numpy(), mingain)
+            policy_values = cycle_checkgain(buys, sells, prices.to_numpy(), mingain)
         else:
-            policy_ = ultimate_cycle.cycle_absolutegain(policy.to_numpy(dtype=bool), buys.to_numpy(dtype=bool), buys[buys].index.to_numpy(dtype=np.int32), prices.to_numpy(dtype=np.float32), mingain, stoploss)
-        policy = pd.Series(policy_, index=policy.index)
+            policy_values = cycle_absolutegain(buys, prices.to_numpy(dtype=np.float32), mingain, stoploss)
+        return _like(policy_values, buy)
     else:
+        from tqdm.auto import tqdm
+        policy = pd.Series(np.zeros(buy.size, dtype=bool), index=buy.index)
         token = 1
         buy_price = 0
         for idx in tqdm(buys[buys | sells].index):
             if token and buys.loc[idx]:
-                policy.loc[idx] = 1
+                policy.loc[idx] = True
                 token = 0
                 buy_price = prices.loc[idx]
             elif not token and sells.loc[idx] and mingain*(prices.loc[idx]/buy_price) >= mingain*(1 + mingain):
-                policy.loc[idx] = 1
+                policy.loc[idx] = True
                 token = 1
-    return policy == 1
\ No newline at end of file
+    return policy
\ No newline at end of file
@@ -0,0 +1,183 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils import parallel, policy, sweep
+
+# The indicators of every parameter combination are computed once over the whole history
+# with sweep.signals, so a window keeps the indicator state of the rows before it instead
+# of warming up again. The buy/sell cycle of policy.cycle is also run once: restarted on a
+# window, it flips at every row where buy and sell change together (both) until the first
+# row where only one changes (reset), and from there it holds like on the whole history.
+# A window then only needs the rows of these events, shared with the workers as
+# concatenated rows and offsets per combination, and costs its trades instead of its rows.
+
+EVENTS = ("both", "reset", "policy")
+
+
+def splits(rows: int, train: int, test: int, step=None, anchored=False) -> list:
+    '''
+    Return the (train start, train end, test start, test end) rows of rolling windows, ends excluded
+
+    :param int rows: Number of rows
+    :param int train: Rows of every train window
+    :param int test: Rows of every test window, right after the train one
+    :param int step: Rows between the starts of two windows, test if None
+    :param bool anchored: If every train window starts at the first row and grows (expanding window)
+    '''
+    if train < 2 or test < 2:
+        raise ValueError("train and test need at least 2 rows.")
+    step = test if step is None else step
+    windows = []
+    start = 0
+    while start + train + test <= rows:
+        windows.append((0 if anchored else start, start + train, start + train, start + train + test))
+        start += step
+    return windows
+
+
+def events(prices, buy, sell, combos, max_cells=sweep.MAX_CELLS) -> dict:
+    '''
+    Return the rows of the both, reset and policy events of every combination of sweep.signals,
+    as {event}_rows with the rows of all the combinations and {event}_offsets where they start
+
+    :param np.ndarray prices: Prices of the stock
+    :param np.ndarray buy: Buy signals of sweep.signals
+    :param np.ndarray sell: Sell signals of sweep.signals, None for macd
+    :param np.ndarray combos: (buy column, sell column) of every combination
+    :param int max_cells: Maximum rows times combinations evaluated at once
+    '''
+    rows = np.asarray(buy).shape[0]
+    combos = np.asarray(combos)
+    batch = max(1, max_cells//max(rows, 1))
+    found = {event: [] for event in EVENTS}
+    buys = policy.edges(buy)
+    # macd flips at every change of sign
+    sells = buys if sell is None else policy.edges(sell)
+    for first in range(0, len(combos), batch):
+        b, s = combos[first:first + batch, 0], combos[first:first + batch, 1]
+        combo_buys, combo_sells = buys[:, b], sells[:, s]
+        if sell is None:
+            matrices = {"both": combo_buys, "reset": np.zeros_like(combo_buys), "policy": combo_buys}
+        else:
+            matrices = {"both": combo_buys & combo_sells, "reset": combo_buys ^ combo_sells, "policy": policy.cycle(combo_buys, combo_sells)}
+        for event, matrix in matrices.items():
+            # sorted by combination then row
+            column, row = np.nonzero(matrix.T)
+            found[event].append((column + first, row))
+    out = {}
+    for event, parts in found.items():
+        columns = np.concatenate([column for column, _ in parts])
+        out[f"{event}_rows"] = np.concatenate([row for _, row in parts]).astype(np.int64)
+        out[f"{event}_offsets"] = np.r_[0, np.cumsum(np.bincount(columns, minlength=len(combos)))]
+    return out
+
+
+def _rows(arrays, event, combo):
+    offsets = arrays[f"{event}_offsets"]
+    return arrays[f"{event}_rows"][offsets[combo]:offsets[combo + 1]]
+
+
+def evaluate_window(prices, arrays, start, end, commissions=0.005, budget=100, combos=None) -> (np.ndarray, np.ndarray):
+    '''
+    Return the winning and the number of trades of every combination on rows [start, end),
+    like sweep.evaluate, from the events of the whole history
+
+    :param np.ndarray prices: Prices of the stock
+    :param dict arrays: Events returned by events
+    :param int start: First row
+    :param int end: Row after the last one
+    :param float commissions: Percentage commissions per transaction
+    :param float budget: My budget
+    :param list combos: Combinations to evaluate, all if None
+    '''
+    combos = range(arrays["both_offsets"].size - 1) if combos is None else combos
+    diff = (prices[end - 1]/prices[start] - 1)*100
+    winning, trades = [], []
+    for combo in combos:
+        both, reset, held = (_rows(arrays, event, combo) for event in EVENTS)
+        # the first row of the window is always a both event, so it buys
+        after = np.searchsorted(reset, start, side="right")
+        first_reset = int(reset[after]) if after < reset.size and reset[after] < end else end
+        flips = both[np.searchsorted(both, start, side="right"):np.searchsorted(both, first_reset, side="left")]
+        parts = [[start], flips]
+        if first_reset < end:
+            holding = np.searchsorted(held, first_reset, side="right") % 2 == 1
+            if holding != (flips.size % 2 == 0):
+                parts.append([first_reset])
+            parts.append(held[np.searchsorted(held, first_reset, side="right"):np.searchsorted(held, end, side="left")])
+        rows = np.concatenate(parts).astype(np.int64)
+        sells = rows[1::2]
+        gain = prices[sells]/prices[rows[0::2][:sells.size]] - 1 - commissions*2
+        winning.append(gain.sum()*budget - diff)
+        trades.append(sells.size)
+    return np.array(winning), np.array(trades)
+
+
+def _evaluate_windows(windows, commissions, budget, arrays=None):
+    '''
+    Best combination on every train window and its result on the test window, the arrays of the worker if arrays is None
+    '''
+    arrays = parallel._arrays if arrays is None else arrays
+    close = arrays["close"]
+    results = []
+    for train_start, train_end, test_start, test_end in windows:
+        winning, trades = evaluate_window(close, arrays, train_start, train_end, commissions, budget)
+        best = int(np.argmax(winning))
+        test_winning, test_trades = evaluate_window(close, arrays, test_start, test_end, commissions, budget, combos=[best])
+        results.append((best, winning[best], trades[best], test_winning[0], test_trades[0]))
+    return results
+
+
+def walk_forward(strategy: str, grid: dict, close, low=None, high=None, train=100000, test=20000, step=None, anchored=False, commissions=0.005, budget=100, workers=None, max_cells=sweep.MAX_CELLS) -> pd.DataFrame:
+    '''
+    Return the walk-forward optimization of a strategy: the parameters with the best winning
+    on every train window and their winning on the following test window
+
+    Test windows never overlap their train window, so test_winning is out of sample.
+
+    :param str strategy: One of ultimate, bollinger_bands, williams, macd
+    :param dict grid: Values to try for every parameter, missing parameters use the technical defaults
+    :param close: Prices of the stock, pd.Series or np.ndarray
+    :param low: Low prices, needed by ultimate and williams
+    :param high: High prices, needed by ultimate and williams
+    :param int train: Rows of every train window
+    :param int test: Rows of every test window
+    :param int step: Rows between two windows, test if None
+    :param bool anchored: If every train window starts at the first row
+    :param float commissions: Percentage commissions per transaction
+    :param float budget: My budget
+    :param int workers: Number of processes, all the cores if None, 1 to run in this process
+    :param int max_cells: Maximum rows times combinations evaluated at once
+    :return: One row per window with its rows, the best parameters, their train and test winning and trades
+    '''
+    params, buy, sell, combos = sweep.signals(strategy, close, grid, low=low, high=high)
+    windows = splits(len(close), train, test, step=step, anchored=anchored)
+    arrays = events(close, buy, sell, combos, max_cells=max_cells)
+    arrays["close"] = sweep._check(close)
+    del buy, sell
+    if workers == 1:
+        results = _evaluate_windows(windows, commissions, budget, arrays)
+    else:
+        # a few chunks per worker balance the load without a task per window
+        size = max(1, math.ceil(len(windows)/(4*(workers or os.cpu_count() or 1))))
+        chunks = [windows[i:i + size] for i in range(0, len(windows), size)]
+        n = len(chunks)
+        with parallel.SharedPrices(arrays) as shared:
+            with ProcessPoolExecutor(max_workers=workers, initializer=parallel._attach, initargs=(shared.spec,)) as pool:
+                results = [r for chunk in pool.map(_evaluate_windows, chunks, [commissions]*n, [budget]*n) for r in chunk]
+    out = pd.DataFrame(windows, columns=["train_start", "train_end", "test_start", "test_end"])
+    if isinstance(close, pd.Series):
+        out["test_first"] = close.index[out.test_start]
+        out["test_last"] = close.index[out.test_end - 1]
+    best = [r[0] for r in results]
+    for column in params.columns:
+        out[column] = params[column].to_numpy()[best] if results else []
+    out["train_winning"] = [r[1] for r in results]
+    out["train_trades"] = [r[2] for r in results]
+    out["test_winning"] = [r[3] for r in results]
+    out["test_trades"] = [r[4] for r in results]
+    return out